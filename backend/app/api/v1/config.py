@@ -5,8 +5,10 @@ from typing import Dict, Any
 from app.core.download_config_manager import DownloadConfigManager
 from app.schemas.config import ConfigUpdate, ConfigResponse
 
+_download_config_manager = DownloadConfigManager()
+
 def get_download_config_manager():
-    return DownloadConfigManager()
+    return _download_config_manager
 
 router = APIRouter(tags=["config"])
 
@@ -42,6 +44,9 @@ async def get_config(
         "timeout": settings.timeout,
         "category_subdirs": download_config.category_subdirs if hasattr(download_config, 'category_subdirs') else True,
         "file_recognition_method": download_config.file_recognition_method if hasattr(download_config, 'file_recognition_method') else "extension",
+        "download_rate_limit": getattr(download_config, 'download_rate_limit', None) or 0,
+        "host_download_rate_limit": getattr(download_config, 'host_download_rate_limit', None) or 0,
+        "task_download_rate_limit": getattr(download_config, 'task_download_rate_limit', None) or 0,
         "bt_max_connections": settings.bt_max_connections,
         "bt_max_uploads": settings.bt_max_uploads,
         "bt_download_rate_limit": settings.bt_download_rate_limit,
@@ -76,6 +81,7 @@ async def update_config(
         if not update_data:
             update_data = DEFAULT_CONFIG
             
+        # 更新后重建配置快照，并发下载数、限速等由订阅者实时生效
         config_manager.update_config(update_data)
         
         # 返回更新后的配置
@@ -1,21 +1,28 @@
-from fastapi import APIRouter, HTTPException, Path, Query, Depends, WebSocket, Security, status
+from fastapi import APIRouter, HTTPException, Path, Query, Depends, Request, WebSocket, Security, status
 from sqlalchemy.orm import Session
 from app.utils.response import success_response, error_response
 from app.api.auth import get_current_user
 from app.db.session import get_db
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from app.core.download_manager import (
     create_download_task,
+    create_download_tasks_bulk,
     get_download_tasks,
+    get_history_tasks,
     get_download_task,
     get_task_files,
     resume_download,
     cancel_download,
-    pause_download
+    pause_download,
+    set_task_priority,
+    get_download_stats,
+    get_buffer_stats
 )
-from app.schemas.download import DownloadRequest, DownloadTaskDetail, DownloadStatus, DownloadType, DownloadTaskListResponse
+from app.schemas.download import DownloadRequest, DownloadTaskDetail, DownloadStatus, DownloadType, DownloadTaskListResponse, PriorityUpdate
 from app.schemas.file import FileListResponse
 from app.websocket_manager import websocket_manager
+from app.core.batch_ingest import iter_batch_entries
 
 router = APIRouter(tags=["downloads"])
 
@@ -42,6 +49,8 @@ async def create_download(request: DownloadRequest):
     创建新的HTTP下载任务
     
     - 可指定优先级、HTTP引用页、用户代理等
+    - 提供checksum_algorithm和checksum时边下载边计算校验和，不一致则任务失败
+    - 提供mirrors或metalink时从多个镜像并行下载不同区间，按实测速度分配
     """
     task_id = await create_download_task(
         url=request.url,
@@ -52,27 +61,115 @@ async def create_download(request: DownloadRequest):
         user_agent=request.user_agent,
         start_from=request.start_from,
         category=request.category,
-        selected_files=None
+        selected_files=None,
+        checksum_algorithm=request.checksum_algorithm,
+        expected_checksum=request.checksum,
+        mirrors=request.mirrors,
+        metalink=request.metalink
     )
     return {"task_id": task_id}
 
 
+@router.post("/batch", summary="批量创建下载任务")
+async def create_downloads_batch(
+    request: Request,
+    current_user: str = Security(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量创建下载任务
+
+    - 请求体为JSON数组或NDJSON(每行一条)，边接收边解析
+    - 每条记录为URL字符串或与单个创建接口相同的对象
+    - 与已有任务及本批次中重复的URL会被跳过
+    - 返回创建、重复、无效的数量及部分错误样例
+    """
+    result = await create_download_tasks_bulk(iter_batch_entries(request.stream()), db)
+    if "error" in result:
+        raise HTTPException(
+            status_code=400,
+            detail=error_response(result["error"], 400, details=result)
+        )
+    return success_response(result)
+
+
 @router.get("", response_model=DownloadTaskListResponse, summary="获取下载任务列表")
 async def list_downloads(
     status: Optional[DownloadStatus] = Query(None, description="按状态筛选"),
     download_type: Optional[DownloadType] = Query(None, description="按下载类型筛选"),
+    limit: int = Query(100, ge=1, le=1000, description="每页数量"),
+    offset: int = Query(0, ge=0, description="跳过的任务数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
     current_user: str = Security(get_current_user)
 ):
-    """获取下载任务列表，支持按状态和类型筛选"""
+    """获取下载任务列表，支持按状态和类型筛选，支持offset或游标分页"""
     response = await get_download_tasks(
         status=status,
-        download_type=download_type
+        download_type=download_type,
+        limit=limit,
+        offset=offset,
+        cursor=cursor
     )
     # Return the response directly without success_response wrapper
     # since DownloadTaskListResponse already includes success/error handling
     return response
 
 
+@router.get("/stats", summary="获取下载运行统计")
+async def get_downloads_stats(
+    current_user: str = Security(get_current_user)
+):
+    """
+    获取下载子系统运行统计
+    
+    - 工作池大小及忙碌/空闲工作协程数
+    - 队列中等待的任务数
+    - 共享连接池的打开/空闲/复用连接数
+    - WebSocket发送队列的丢弃/合并消息数
+    """
+    return success_response(get_download_stats())
+
+
+@router.get("/buffers", summary="获取下载缓冲区内存占用")
+async def get_downloads_buffers(
+    current_user: str = Security(get_current_user)
+):
+    """
+    获取下载缓冲区的内存占用
+
+    - used/peak: 当前/峰值未落盘数据量(字节)
+    - limit: 内存预算上限，超出时下载暂停读取连接直到数据写出
+    - waiting/waits/wait_time: 正在等待、累计等待次数和累计等待时间(秒)
+    - streams: 持有缓冲数据的写入流数
+    """
+    return success_response(get_buffer_stats())
+
+
+@router.get("/history", response_model=DownloadTaskListResponse, summary="获取下载历史")
+async def list_download_history(
+    status: Optional[DownloadStatus] = Query(None, description="按状态筛选"),
+    category: Optional[str] = Query(None, description="按文件分类筛选"),
+    since: Optional[datetime] = Query(None, description="创建时间起始(包含)"),
+    until: Optional[datetime] = Query(None, description="创建时间截止(不包含)"),
+    limit: int = Query(100, ge=1, le=1000, description="每页数量"),
+    offset: int = Query(0, ge=0, description="跳过的任务数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    current_user: str = Security(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """分页获取已完成/已取消的历史任务，最近的历史在内存中，更早的从数据库查询"""
+    return await get_history_tasks(
+        db,
+        status=status,
+        category=category,
+        since=since,
+        until=until,
+        limit=limit,
+        offset=offset,
+        cursor=cursor
+    )
+
+
 @router.get("/{task_id}", response_model=DownloadTaskDetail, summary="获取下载任务详情")
 async def get_download_detail(
     task_id: str = Path(..., description="下载任务ID"),
@@ -134,6 +231,17 @@ async def resume_download_task(
     )
 
 
+@router.post("/{task_id}/priority", response_model=Dict[str, str], summary="调整下载任务优先级")
+async def update_download_priority(
+    request: PriorityUpdate,
+    task_id: str = Path(..., description="下载任务ID"),
+    current_user: str = Security(get_current_user)
+):
+    """调整任务优先级，排队中的任务立即按新优先级调度"""
+    result = await set_task_priority(task_id, request.priority)
+    return success_response(result)
+
+
 @router.delete("/{task_id}", response_model=Dict[str, str], summary="取消/删除下载任务")
 async def cancel_download_task(
     task_id: str = Path(..., description="下载任务ID"),
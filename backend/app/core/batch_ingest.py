@@ -0,0 +1,148 @@
+"""
+批量任务导入解析模块
+增量解析JSON数组或NDJSON请求体，按条产出，
+内存中只保留当前未解析完的记录和最近读取的网络块
+"""
+
+import re
+import json
+import codecs
+from typing import Any, AsyncIterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_NUMBER = re.compile(r"[-+0-9.eE]*")
+
+
+class BatchFormatError(ValueError):
+    """请求体格式错误"""
+
+
+class _TextReader:
+    """把字节块增量解码为文本，已消费的部分在读取新块时丢弃"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    @property
+    def pending(self) -> int:
+        return len(self.text) - self.pos
+
+    async def fill(self) -> bool:
+        """读取下一块，没有更多数据时返回False"""
+        if self.exhausted:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+            final = False
+        except StopAsyncIteration:
+            chunk, final = b"", True
+            self.exhausted = True
+        try:
+            decoded = self._decoder.decode(chunk, final)
+        except UnicodeDecodeError as e:
+            raise BatchFormatError(f"请求体不是合法的UTF-8: {str(e)}")
+        self.text = self.text[self.pos:] + decoded
+        self.pos = 0
+        return not final
+
+    def skip_whitespace(self):
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+
+async def iter_batch_entries(chunks: AsyncIterator[bytes], max_entry_size: int = 65536) -> AsyncIterator[Any]:
+    """逐条产出请求体中的记录
+
+    以'['开头时按JSON数组解析，否则按每行一个JSON值的NDJSON解析
+
+    Raises:
+        BatchFormatError: JSON格式错误或单条记录超过max_entry_size
+    """
+    reader = _TextReader(chunks)
+    while True:
+        reader.skip_whitespace()
+        if reader.pending or not await reader.fill():
+            break
+    if not reader.pending:
+        return
+
+    if reader.text[reader.pos] == "[":
+        reader.pos += 1
+        entries = _iter_array(reader, max_entry_size)
+    else:
+        entries = _iter_lines(reader, max_entry_size)
+    async for entry in entries:
+        yield entry
+
+
+async def _iter_lines(reader: _TextReader, max_entry_size: int):
+    line_no = 0
+    while True:
+        newline = reader.text.find("\n", reader.pos)
+        if newline < 0:
+            if reader.pending > max_entry_size:
+                raise BatchFormatError(f"第{line_no + 1}行超过{max_entry_size}字节")
+            if await reader.fill():
+                continue
+            if not reader.pending:
+                return
+            newline = len(reader.text)
+        line = reader.text[reader.pos:newline].strip()
+        reader.pos = min(newline + 1, len(reader.text))
+        line_no += 1
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise BatchFormatError(f"第{line_no}行不是合法的JSON: {str(e)}")
+
+
+async def _iter_array(reader: _TextReader, max_entry_size: int):
+    index = 0
+    expect_value = True  # 下一个应是元素，否则应是','或']'
+    while True:
+        reader.skip_whitespace()
+        if not reader.pending:
+            if not await reader.fill() and not reader.pending:
+                raise BatchFormatError("JSON数组不完整")
+            continue
+
+        char = reader.text[reader.pos]
+        if not expect_value:
+            if char == ",":
+                reader.pos += 1
+                expect_value = True
+                continue
+            if char == "]":
+                return
+            raise BatchFormatError(f"第{index}个元素后应为','或']'")
+        if index == 0 and char == "]":
+            return
+
+        # 数字可能恰好在块边界处被截断，需读到数字之后的字符才能解析
+        if char in "-0123456789" and not reader.exhausted:
+            if _NUMBER.match(reader.text, reader.pos).end() == len(reader.text):
+                await reader.fill()
+                continue
+        try:
+            value, end = _decoder.raw_decode(reader.text, reader.pos)
+        except ValueError:
+            end = -1
+        if end >= 0:
+            reader.pos = end
+            index += 1
+            expect_value = False
+            yield value
+            continue
+        if reader.exhausted:
+            raise BatchFormatError(f"第{index + 1}个元素不是合法的JSON")
+        if reader.pending > max_entry_size:
+            raise BatchFormatError(f"第{index + 1}个元素超过{max_entry_size}字节")
+        await reader.fill()
+
+
+__all__ = ['BatchFormatError', 'iter_batch_entries']
@@ -0,0 +1,127 @@
+"""
+下载缓冲区管理模块
+每个连接按实测吞吐调整单次读取大小，慢连接读小块、快连接读大块；
+所有写入流中尚未落盘的数据计入进程级内存预算，超出时写入方等待，
+下载循环不再从连接读取，aiohttp缓冲区满后即暂停读取套接字
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+# 单次读取的下限
+MIN_READ_SIZE = 16384
+# 每次读取覆盖的目标时长(秒)
+READ_INTERVAL = 0.1
+
+
+class AdaptiveChunkSizer:
+    """按连接的实测吞吐决定下一次读取的大小
+
+    大小取吞吐 * READ_INTERVAL 并向上取整到2的幂，限制在[min_size, max_size]之间
+    """
+
+    def __init__(self, max_size: int, min_size: int = MIN_READ_SIZE):
+        self.max_size = max(max_size, 1)
+        self.min_size = min(min_size, self.max_size)
+        self.size = self.min_size
+        self._rate = 0.0
+        self._last = time.monotonic()
+
+    def observe(self, nbytes: int):
+        now = time.monotonic()
+        elapsed = max(now - self._last, 1e-6)
+        self._last = now
+        # 指数滑动平均，单次突发不会让读取大小剧烈跳动
+        instant = nbytes / elapsed
+        self._rate = instant if self._rate == 0 else self._rate * 0.8 + instant * 0.2
+        target = int(self._rate * READ_INTERVAL)
+        size = self.min_size
+        while size < target and size < self.max_size:
+            size *= 2
+        self.size = min(size, self.max_size)
+
+
+class MemoryBudget:
+    """进程级下载缓冲区预算
+
+    Args:
+        limit: 上限(字节)，0表示不限制
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = max(0, limit)
+        self.used = 0
+        self.peak = 0
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+        self._stats = {"waits": 0, "wait_time": 0.0}
+
+    def configure(self, limit: int):
+        self.limit = max(0, limit)
+        self._wake()
+
+    def _fits(self, nbytes: int) -> bool:
+        # 预算为空时总是允许，单块超过上限也不会永久阻塞
+        return not self.limit or self.used == 0 or self.used + nbytes <= self.limit
+
+    def try_acquire(self, nbytes: int) -> bool:
+        """立即占用预算，不足时返回False"""
+        if self._waiters or not self._fits(nbytes):
+            return False
+        self._take(nbytes)
+        return True
+
+    async def acquire(self, nbytes: int):
+        """占用预算，不足时按先后顺序等待释放"""
+        if self.try_acquire(nbytes):
+            return
+        self._stats["waits"] += 1
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, nbytes)
+        self._waiters.append(entry)
+        try:
+            await future
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            elif future.done() and not future.cancelled():
+                # 已分配但调用方被取消，归还预算
+                self.release(nbytes)
+            raise
+        finally:
+            self._stats["wait_time"] += time.monotonic() - started
+
+    def _take(self, nbytes: int):
+        self.used += nbytes
+        self.peak = max(self.peak, self.used)
+
+    def release(self, nbytes: int):
+        self.used = max(0, self.used - nbytes)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            future, nbytes = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                break
+            self._waiters.popleft()
+            self._take(nbytes)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "used": self.used,
+            "peak": self.peak,
+            "waiting": len(self._waiters),
+            "waits": self._stats["waits"],
+            "wait_time": round(self._stats["wait_time"], 3)
+        }
+
+
+__all__ = ['AdaptiveChunkSizer', 'MemoryBudget', 'MIN_READ_SIZE']
@@ -0,0 +1,97 @@
+"""
+流式校验和模块
+数据写盘时在I/O线程中顺带计算哈希，下载完成后直接比对，无需重新读取整个文件；
+分段下载中不在当前哈希位置的区间暂时跳过，待连续前缀推进后再从磁盘补算
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+
+SUPPORTED_ALGORITHMS = {
+    "md5": 32,
+    "sha1": 40,
+    "sha256": 64
+}
+
+# 从磁盘补算时每次读取的大小
+CATCH_UP_BLOCK = 4194304
+
+
+class ChecksumMismatch(Exception):
+    """下载完成后校验和与期望值不一致"""
+
+
+def normalize_checksum(algorithm: str, checksum: str) -> str:
+    """校验算法名和十六进制摘要格式，返回小写摘要
+
+    Raises:
+        ValueError: 算法不支持或摘要格式错误
+    """
+    algorithm = (algorithm or "").lower()
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(f"不支持的校验算法: {algorithm}")
+    checksum = (checksum or "").strip().lower()
+    if len(checksum) != SUPPORTED_ALGORITHMS[algorithm] or any(c not in "0123456789abcdef" for c in checksum):
+        raise ValueError(f"{algorithm}校验和格式错误")
+    return checksum
+
+
+class StreamingHasher:
+    """按文件偏移顺序累积的哈希
+
+    offset之前的数据已计入哈希；update_at只接受恰好从offset开始
+    (或与offset重叠)的数据，其余留待catch_up从磁盘补算。
+    标准库的哈希状态无法序列化，对象只在进程内跨暂停/重试复用，
+    进程重启后需从磁盘重新计算已下载的前缀
+    """
+
+    def __init__(self, algorithm: str):
+        self.algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+        self._lock = threading.Lock()
+        self.offset = 0
+
+    def update_at(self, offset: int, data) -> bool:
+        """把位于offset的数据计入哈希，返回是否被接受"""
+        with self._lock:
+            end = offset + len(data)
+            if offset > self.offset or end <= self.offset:
+                return False
+            self._hash.update(memoryview(data)[self.offset - offset:])
+            self.offset = end
+            return True
+
+    def rewind(self, offset: int):
+        """已下载数据被丢弃到offset时调用；哈希无法回退，只能从头重算"""
+        with self._lock:
+            if offset < self.offset:
+                self._hash = hashlib.new(self.algorithm)
+                self.offset = 0
+
+    def catch_up(self, path: Path, upto: int) -> int:
+        """从磁盘读取[offset, upto)补算哈希(在I/O线程中调用)"""
+        with open(path, "rb") as f:
+            while True:
+                with self._lock:
+                    start = self.offset
+                    if start >= upto:
+                        return start
+                    f.seek(start)
+                    data = f.read(min(CATCH_UP_BLOCK, upto - start))
+                    if not data:
+                        return start
+                    self._hash.update(data)
+                    self.offset = start + len(data)
+
+    def hexdigest(self) -> str:
+        with self._lock:
+            return self._hash.hexdigest()
+
+
+__all__ = [
+    'SUPPORTED_ALGORITHMS',
+    'ChecksumMismatch',
+    'StreamingHasher',
+    'normalize_checksum'
+]
@@ -17,12 +17,21 @@ class Settings(BaseSettings):
     websocket_reconnect_interval: int = 5  # 重连间隔(秒)
     websocket_max_connections: int = 100  # 最大连接数
     websocket_timeout: int = 60  # 超时时间(秒)
+    websocket_send_queue_size: int = 256  # 每个连接的待发送消息上限，超出时丢弃最旧消息
+    progress_tick_interval: float = 1.0  # 批量推送下载进度的周期(秒)
 
     # 路径配置
     base_dir: Path = Path(__file__).parent.parent.parent
     data_dir: Path = base_dir / "data"
     log_dir: Path = base_dir / "logs"
 
+    # 日志配置
+    log_format: str = "text"  # 日志格式: text或json(每行一个JSON对象)
+    log_max_bytes: int = 10485760  # 10MB，日志文件超过该大小后轮转
+    log_backup_count: int = 5  # 保留的轮转日志文件数
+    log_queue_size: int = 10000  # 待写入日志的队列容量，写入跟不上时丢弃新记录而不阻塞事件循环
+    log_sample_interval: float = 10.0  # 热点路径日志同一来源的最短输出间隔(秒)
+
     # 数据库配置
     database_url: str = "sqlite:///data/db.sqlite3"
     
@@ -30,12 +39,34 @@ class Settings(BaseSettings):
     download_dir: Path = base_dir / "downloads"
     max_concurrent_downloads: int = 5
     chunk_size: int = 1048576  # 1MB
+    segmented_download: bool = True  # 服务器支持Range时启用分段多连接下载
+    segment_connections: int = 4  # 单个任务的分段连接数
+    segment_min_size: int = 4194304  # 4MB，单个分段的最小大小
+    mirror_max_connections: int = 16  # 多镜像任务的总连接数上限(每个镜像最多segment_connections个)
+    mirror_max_errors: int = 3  # 镜像连续出错该次数后不再使用
+    mirror_slow_ratio: float = 0.25  # 单连接速度低于最快镜像该比例时不再分配新区间
+    http_pool_limit: int = 100  # 共享连接池的全局连接上限
+    http_pool_limit_per_host: int = 8  # 单个主机的连接上限
+    http_dns_cache_ttl: int = 300  # DNS缓存时间(秒)
+    http_keepalive_timeout: int = 30  # 空闲keep-alive连接保留时间(秒)
+    priority_aging_interval: int = 60  # 排队任务每等待该秒数，有效优先级提升一级
     resume_support: bool = True
     retry_attempts: int = 5
-    retry_delay: int = 60
-    timeout: int = 60
+    retry_delay: int = 60  # 首次重试的基准等待(秒)，之后每次翻倍并加随机抖动
+    retry_max_delay: int = 3600  # 重试等待和熔断时长的上限(秒)，服务器的Retry-After也不超过该值
+    circuit_failure_threshold: int = 5  # 同一主机连续失败该次数后熔断
+    circuit_open_time: int = 60  # 首次熔断时长(秒)，试探失败后翻倍
+    timeout: int = 60  # 读取空闲超时(秒)，超过该时间未收到数据即断开重连，不再限制整个下载的时长
+    http_connect_timeout: int = 15  # 建立连接超时(秒)
+    http_first_byte_timeout: int = 30  # 取得连接后到收到响应头的超时(秒)，等待连接池空位不计入
+    stall_min_speed: int = 1024  # 单连接速度低于该值(字节/秒)持续stall_window秒视为停滞并重新连接，0表示不检测
+    stall_window: int = 30  # 停滞检测的统计窗口(秒)
+    stall_max_reconnects: int = 5  # 连续重连都没有收到数据的次数上限，超过后按失败重试
     category_subdirs: bool = True
     file_recognition_method: str = "extension"
+    download_rate_limit: int = 0  # 全局下载限速(KB/s)，0表示无限制
+    host_download_rate_limit: int = 0  # 单主机下载限速(KB/s)，0表示无限制
+    task_download_rate_limit: int = 0  # 单任务下载限速(KB/s)，0表示无限制
     bt_listen_port: int = 6881
     bt_max_connections: int = 100
     bt_max_uploads: int = 10
@@ -46,8 +77,17 @@ class Settings(BaseSettings):
     bt_use_pex: bool = True
     bt_use_lsd: bool = True
     state_save_interval: int = 300  # 5分钟
+    task_flush_interval: int = 10  # 变更任务批量写入数据库的间隔(秒)
+    journal_fsync_interval: float = 2.0  # 进度日志落盘(fsync)间隔(秒)
+    disk_io_threads: int = 2  # 专用磁盘写入线程数
+    disk_write_buffer_size: int = 4194304  # 4MB，每个写入流合并到该大小后再落盘
+    download_memory_budget: int = 268435456  # 256MB，所有下载未落盘缓冲区的总上限，超出时暂停读取，0表示不限制
+    download_cache_enabled: bool = True  # 复用已完成的相同下载(URL经条件请求确认未变或校验和一致)
+    download_cache_max_entries: int = 10000  # 缓存索引条目上限，超出时淘汰最久未使用的
+    download_cache_digest: str = "sha256"  # 为所有下载计算的内容摘要算法，留空则只在提供期望校验和时计算
     save_history: bool = True
     history_max_count: int = 100
+    history_hot_size: int = 200  # 内存中保留的最近历史任务数，更早的历史只在数据库中
 
     class Config:
         case_sensitive = False
@@ -0,0 +1,320 @@
+"""
+磁盘写入模块
+下载数据先在内存中按顺序合并，攒够后以页对齐的大块用os.pwrite按偏移写入，
+已知大小的文件先用posix_fallocate预分配，减少碎片；
+需要校验时在写入的同一次线程调用中顺带更新哈希；
+所有任务的写操作进入同一队列，由少量专用I/O线程批量执行，
+每GB数据的系统调用和线程切换次数随合并块大小成倍减少；
+尚未落盘的数据计入共享的内存预算，超出时写入方等待
+"""
+
+import os
+import errno
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.buffers import MemoryBudget
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+WRITE_ALIGNMENT = 4096
+# 每次唤醒事件循环最多回传的完成结果数
+RESOLVE_BATCH = 64
+
+
+def _pwrite_all(fd: int, data, offset: int) -> int:
+    view = memoryview(data)
+    written = 0
+    while written < len(view):
+        written += os.pwrite(fd, view[written:], offset + written)
+    return written
+
+
+def _pwrite_hashed(fd: int, data, offset: int, hasher) -> int:
+    written = _pwrite_all(fd, data, offset)
+    hasher.update_at(offset, data)
+    return written
+
+
+def _preallocate(fd: int, size: int) -> bool:
+    """预分配文件空间，文件系统不支持时退化为扩展文件大小
+
+    Returns:
+        是否真正预分配了磁盘块
+    """
+    if os.fstat(fd).st_size > size:
+        os.ftruncate(fd, size)
+    if size <= 0:
+        return False
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return True
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+                raise
+    os.ftruncate(fd, size)
+    return False
+
+
+class DiskWriter:
+    """进程共享的磁盘写入器
+
+    Args:
+        threads: 专用I/O线程数
+        buffer_size: 每个写入流合并到多大再落盘(字节)
+        memory_budget: 所有写入流未落盘数据的上限(字节)，0表示不限制
+    """
+
+    def __init__(self, threads: int = 2, buffer_size: int = 4194304, memory_budget: int = 0):
+        self.threads = max(1, threads)
+        self.buffer_size = max(WRITE_ALIGNMENT, buffer_size)
+        self.budget = MemoryBudget(memory_budget)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queue: Deque[Tuple[asyncio.Future, Callable, tuple]] = deque()
+        self._draining = 0
+        self._stats = {
+            "writes": 0,
+            "bytes": 0,
+            "chunks": 0,
+            "batches": 0,
+            "preallocated": 0,
+            "open_files": 0,
+            "streams": 0
+        }
+
+    def _run(self, op: Callable, *args) -> asyncio.Future:
+        """把操作放入I/O队列，空闲线程不足时唤醒一个线程批量处理"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._queue.append((future, op, args))
+            start = self._draining < self.threads
+            if start:
+                self._draining += 1
+        if start:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="disk-io")
+            self._executor.submit(self._drain, loop)
+        return future
+
+    async def call(self, op: Callable, *args) -> Any:
+        """在I/O线程中执行任意阻塞文件操作"""
+        return await self._run(op, *args)
+
+    def _drain(self, loop: asyncio.AbstractEventLoop):
+        """I/O线程：连续执行队列中的操作，成批回传结果"""
+        done: List[Tuple[asyncio.Future, Any, Optional[BaseException]]] = []
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._draining -= 1
+                    break
+                future, op, args = self._queue.popleft()
+            try:
+                done.append((future, op(*args), None))
+            except BaseException as e:
+                done.append((future, None, e))
+            if len(done) >= RESOLVE_BATCH:
+                loop.call_soon_threadsafe(self._resolve, done)
+                done = []
+        if done:
+            loop.call_soon_threadsafe(self._resolve, done)
+
+    def _resolve(self, done):
+        self._stats["batches"] += 1
+        for future, result, error in done:
+            if future.cancelled():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def open(self, path: Path, size: int = 0, truncate: bool = False) -> "WriterFile":
+        """打开(或创建)文件用于按偏移写入
+
+        Args:
+            size: 已知的最终大小，大于0时预分配
+            truncate: 是否丢弃已有内容
+        """
+        flags = os.O_RDWR | os.O_CREAT | (os.O_TRUNC if truncate else 0)
+        opening = self._run(os.open, str(path), flags, 0o644)
+        try:
+            fd = await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            # I/O线程中的open仍会完成，等它结束后关闭，
+            # 避免泄漏文件描述符，也避免调用方清理后文件被重新创建
+            try:
+                os.close(await opening)
+            except Exception:
+                pass
+            raise
+        handle = WriterFile(self, fd, Path(path))
+        self._stats["open_files"] += 1
+        if size > 0:
+            try:
+                await handle.preallocate(size)
+            except BaseException:
+                await handle.close()
+                raise
+        return handle
+
+    async def shutdown(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            **self._stats,
+            "threads": self.threads,
+            "buffer_size": self.buffer_size,
+            "queued": queued,
+            "memory": self.budget.stats()
+        }
+
+
+class WriterFile:
+    """DiskWriter打开的文件，可同时有多个从不同偏移顺序写入的流"""
+
+    def __init__(self, writer: DiskWriter, fd: int, path: Path):
+        self.writer = writer
+        self.fd = fd
+        self.path = path
+        self._closed = False
+
+    async def preallocate(self, size: int):
+        if await self.writer._run(_preallocate, self.fd, size):
+            self.writer._stats["preallocated"] += 1
+
+    async def pwrite(self, offset: int, data, hasher=None) -> int:
+        if hasher is not None:
+            written = await self.writer._run(_pwrite_hashed, self.fd, data, offset, hasher)
+        else:
+            written = await self.writer._run(_pwrite_all, self.fd, data, offset)
+        self.writer._stats["writes"] += 1
+        self.writer._stats["bytes"] += written
+        return written
+
+    def stream(
+        self,
+        offset: int,
+        on_flushed: Optional[Callable[[int, int], None]] = None,
+        hasher=None
+    ) -> "WriteStream":
+        return WriteStream(self, offset, on_flushed, hasher)
+
+    async def close(self):
+        if not self._closed:
+            self._closed = True
+            self.writer._stats["open_files"] -= 1
+            await self.writer._run(os.close, self.fd)
+
+    async def __aenter__(self) -> "WriterFile":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class WriteStream:
+    """从指定偏移开始的顺序写入流
+
+    小块数据先合并到缓冲区，超过buffer_size时写出对齐到WRITE_ALIGNMENT的部分，
+    写出期间继续接收下一批数据；每段数据真正写入后通过on_flushed回调报告区间，
+    传入hasher(StreamingHasher)时写入线程按偏移顺序更新哈希。
+    缓冲区和写出中的数据占用DiskWriter的内存预算，预算不足时先写出自己的缓冲区再等待
+    """
+
+    def __init__(
+        self,
+        file: WriterFile,
+        offset: int,
+        on_flushed: Optional[Callable[[int, int], None]] = None,
+        hasher=None
+    ):
+        self.file = file
+        self.on_flushed = on_flushed
+        self.hasher = hasher
+        self._offset = offset  # 缓冲区起始偏移
+        self._buffer = bytearray()
+        self._inflight: Optional[asyncio.Future] = None
+        self._inflight_range: Optional[Tuple[int, int]] = None
+        self._open = False
+
+    @property
+    def position(self) -> int:
+        """下一字节的写入偏移"""
+        return self._offset + len(self._buffer)
+
+    @property
+    def buffered(self) -> int:
+        """占用内存预算的字节数(缓冲区及写出中的数据)"""
+        inflight = self._inflight_range[1] - self._inflight_range[0] if self._inflight else 0
+        return len(self._buffer) + inflight
+
+    async def write(self, data: bytes):
+        writer = self.file.writer
+        if not writer.budget.try_acquire(len(data)):
+            await self.flush()
+            await writer.budget.acquire(len(data))
+        if not self._open:
+            self._open = True
+            writer._stats["streams"] += 1
+        writer._stats["chunks"] += 1
+        self._buffer += data
+        if len(self._buffer) >= self.file.writer.buffer_size:
+            # 只写出对齐边界之前的数据，剩余部分留到下一批
+            end = (self.position // WRITE_ALIGNMENT) * WRITE_ALIGNMENT
+            if end > self._offset:
+                await self._submit(end - self._offset)
+
+    async def _submit(self, length: int):
+        """等待上一批写完后提交新的一批"""
+        await self._wait_inflight()
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        start = self._offset
+        self._offset += length
+        self._inflight_range = (start, start + length)
+        self._inflight = asyncio.ensure_future(self.file.pwrite(start, data, self.hasher))
+
+    async def _wait_inflight(self):
+        if self._inflight is None:
+            return
+        inflight, self._inflight = self._inflight, None
+        start, end = self._inflight_range
+        try:
+            await inflight
+        finally:
+            self.file.writer.budget.release(end - start)
+        if self.on_flushed:
+            self.on_flushed(start, end)
+
+    async def flush(self):
+        """写出缓冲区中的全部数据并等待完成"""
+        try:
+            if self._buffer:
+                await self._submit(len(self._buffer))
+            await self._wait_inflight()
+        except BaseException:
+            # 写入失败的流不再使用，归还未写出数据占用的预算
+            self.file.writer.budget.release(len(self._buffer))
+            self._buffer.clear()
+            raise
+        finally:
+            if self._open and not self._buffer and self._inflight is None:
+                self._open = False
+                self.file.writer._stats["streams"] -= 1
+
+
+__all__ = ['DiskWriter', 'WriterFile', 'WriteStream', 'WRITE_ALIGNMENT']
@@ -0,0 +1,289 @@
+"""
+已完成下载缓存模块
+按规范化URL和内容摘要索引已完成的下载。同一URL再次提交时带If-None-Match/If-Modified-Since
+向服务器确认内容未变(304)，或期望校验和与已有文件的摘要一致时，
+直接以reflink/硬链接复用本地文件，不再重新下载
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import aiohttp
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.download import CachedDownload
+from app.utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = setup_logger(__name__)
+
+# Linux ioctl FICLONE：在btrfs/xfs等文件系统上创建共享数据块的写时复制副本
+FICLONE = 0x40049409
+
+
+def validators_from_headers(headers) -> Tuple[Optional[str], Optional[str]]:
+    """从响应头取出(ETag, Last-Modified)"""
+    return headers.get('etag') or None, headers.get('last-modified') or None
+
+
+def link_file(src: Path, dst: Path) -> str:
+    """在dst创建src的副本，依次尝试reflink、硬链接、复制(在I/O线程中调用)
+
+    先写入临时名再替换，dst已存在(如未完成的.part)时直接覆盖
+    Returns:
+        实际使用的方式: reflink、hardlink或copy
+    """
+    tmp = dst.with_name(dst.name + ".cache")
+    tmp.unlink(missing_ok=True)
+    method = None
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            with open(src, "rb") as source, open(tmp, "wb") as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            method = "reflink"
+        except OSError:
+            tmp.unlink(missing_ok=True)
+    if method is None:
+        try:
+            os.link(src, tmp)
+            method = "hardlink"
+        except OSError:
+            pass
+    if method is None:
+        shutil.copyfile(src, tmp)
+        method = "copy"
+    os.replace(tmp, dst)
+    return method
+
+
+@dataclass
+class CacheEntry:
+    """一次已完成的下载"""
+    url_key: str
+    url: str
+    file_path: str
+    size: int
+    mtime: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    checksum_algorithm: Optional[str] = None
+    digest: Optional[str] = None
+
+    @property
+    def conditional_headers(self) -> Dict[str, str]:
+        """向服务器确认内容未变的条件请求头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_valid(self) -> bool:
+        """文件仍存在且大小、修改时间未变"""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+
+async def revalidate(
+    session: aiohttp.ClientSession,
+    url: str,
+    entry: CacheEntry,
+    headers: Optional[Dict[str, str]] = None
+) -> bool:
+    """用条件请求确认远端内容与缓存一致
+
+    附带 Range: bytes=0-0，内容已变化时服务器最多返回1字节而不是整个文件；
+    服务器忽略条件请求时，返回的强ETag与缓存一致同样视为未变
+    """
+    request_headers = dict(headers or {})
+    request_headers.update(entry.conditional_headers)
+    request_headers['Range'] = 'bytes=0-0'
+    try:
+        async with session.get(url, headers=request_headers) as response:
+            if response.status == 304:
+                return True
+            etag, _ = validators_from_headers(response.headers)
+            return (
+                response.status in (200, 206)
+                and entry.etag is not None
+                and etag == entry.etag
+                and not etag.startswith('W/')
+            )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"缓存确认请求失败 {url}: {str(e)}")
+        return False
+
+
+class DownloadCache:
+    """已完成下载的索引
+
+    内存中按URL(最近使用的在后)和(算法, 摘要)索引，条目同时写入download_cache表，
+    启动时加载；超出max_entries时淘汰最久未使用的条目(只删除索引，不删除文件)；
+    文件被删除或改动的条目在查找时丢弃
+    """
+
+    def __init__(self, max_entries: int = 10000, session_factory: Callable[[], Session] = SessionLocal):
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_digest: Dict[Tuple[str, str], str] = {}
+        self._session_factory = session_factory
+        self.max_entries = max_entries
+        self.enabled = True
+        self._stats = {
+            "revalidated_hits": 0,
+            "digest_hits": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+            "evicted": 0
+        }
+
+    def configure(self, enabled: bool, max_entries: int):
+        self.enabled = enabled
+        self.max_entries = max(0, max_entries)
+        self._evict()
+
+    def load(self, db: Session):
+        """从数据库加载缓存索引"""
+        self._entries.clear()
+        self._by_digest.clear()
+        rows = db.query(CachedDownload).order_by(CachedDownload.last_used_at).all()
+        for row in rows:
+            self._index(CacheEntry(
+                url_key=row.url_key,
+                url=row.url,
+                file_path=row.file_path,
+                size=row.size or 0,
+                mtime=row.mtime or 0.0,
+                etag=row.etag,
+                last_modified=row.last_modified,
+                checksum_algorithm=row.checksum_algorithm,
+                digest=row.digest
+            ))
+        logger.info(f"已加载{len(self._entries)}条下载缓存")
+
+    def _index(self, entry: CacheEntry):
+        self._entries[entry.url_key] = entry
+        self._entries.move_to_end(entry.url_key)
+        if entry.checksum_algorithm and entry.digest:
+            self._by_digest[(entry.checksum_algorithm, entry.digest)] = entry.url_key
+
+    def lookup(self, url_key: str) -> Optional[CacheEntry]:
+        """按规范化URL查找，文件已失效的条目被丢弃"""
+        entry = self._entries.get(url_key)
+        if entry is not None and not entry.is_valid():
+            self.forget(url_key)
+            return None
+        return entry
+
+    def lookup_digest(self, algorithm: str, digest: str) -> Optional[CacheEntry]:
+        """按内容摘要查找，内容相同的文件可跨URL复用"""
+        url_key = self._by_digest.get((algorithm, digest))
+        entry = self.lookup(url_key) if url_key else None
+        if entry is not None and (entry.checksum_algorithm, entry.digest) != (algorithm, digest):
+            return None
+        return entry
+
+    def record(self, entry: CacheEntry):
+        """记录一次已完成的下载，同一URL的旧条目被替换"""
+        old = self._entries.pop(entry.url_key, None)
+        if old is not None:
+            self._unindex_digest(old)
+        self._index(entry)
+        now = datetime.now()
+        db = self._session_factory()
+        try:
+            db.merge(CachedDownload(
+                url_key=entry.url_key,
+                url=entry.url,
+                file_path=entry.file_path,
+                size=entry.size,
+                mtime=entry.mtime,
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+                checksum_algorithm=entry.checksum_algorithm,
+                digest=entry.digest,
+                created_at=now,
+                last_used_at=now
+            ))
+            db.commit()
+        finally:
+            db.close()
+        self._evict()
+
+    def mark_hit(self, entry: CacheEntry, reason: str):
+        """记录命中，reason为revalidated或digest"""
+        self._stats[f"{reason}_hits"] += 1
+        self._stats["bytes_saved"] += entry.size
+        if entry.url_key in self._entries:
+            self._entries.move_to_end(entry.url_key)
+        db = self._session_factory()
+        try:
+            db.query(CachedDownload).filter(CachedDownload.url_key == entry.url_key).update(
+                {CachedDownload.last_used_at: datetime.now()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def mark_miss(self):
+        self._stats["misses"] += 1
+
+    def forget(self, url_key: str):
+        entry = self._entries.pop(url_key, None)
+        if entry is None:
+            return
+        self._unindex_digest(entry)
+        self._delete_rows([url_key])
+
+    def _unindex_digest(self, entry: CacheEntry):
+        key = (entry.checksum_algorithm, entry.digest)
+        if self._by_digest.get(key) == entry.url_key:
+            del self._by_digest[key]
+
+    def _evict(self):
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            url_key, entry = self._entries.popitem(last=False)
+            self._unindex_digest(entry)
+            evicted.append(url_key)
+        if evicted:
+            self._stats["evicted"] += len(evicted)
+            self._delete_rows(evicted)
+
+    def _delete_rows(self, url_keys):
+        db = self._session_factory()
+        try:
+            db.query(CachedDownload).filter(CachedDownload.url_key.in_(url_keys)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "enabled": self.enabled, "entries": len(self._entries)}
+
+
+__all__ = [
+    'CacheEntry',
+    'DownloadCache',
+    'link_file',
+    'revalidate',
+    'validators_from_headers'
+]
@@ -1,75 +1,183 @@
-from typing import Dict, Any
+"""
+下载配置管理模块
+进程内只保留一份不可变、带版本号的下载配置快照，
+首次使用时从数据库加载，之后只有update_config会重建快照并通知订阅者，
+读取配置不再访问数据库
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
 from pathlib import Path
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.config import DownloadConfig
+from app.utils.logger import setup_logger
 
-class DownloadConfigManager:
-    """下载配置管理器"""
-    
-    def __init__(self):
-        self._config = None
-        self._load_config()
-
-    def _load_config(self):
-        """从数据库加载下载配置"""
-        db = SessionLocal()
+logger = setup_logger(__name__)
+
+
+class ConfigSnapshot:
+    """不可变的下载配置快照，按属性名读取DownloadConfig各列的值"""
+
+    __slots__ = ("version", "_values")
+
+    def __init__(self, version: int, values: Dict[str, Any]):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "_values", dict(values))
+
+    @classmethod
+    def from_model(cls, config: DownloadConfig, version: int) -> "ConfigSnapshot":
+        return cls(version, {
+            column.name: getattr(config, column.name)
+            for column in DownloadConfig.__table__.columns
+        })
+
+    def __getattr__(self, name: str) -> Any:
         try:
-            self._config = db.query(DownloadConfig).first()
-            if not self._config:
-                self._config = self._initialize_default_config(db)
-            # 确保会话保持打开状态以便后续使用
-            self._db = db
-        except Exception as e:
-            db.close()
-            raise e
-
-    def _initialize_default_config(self, db: Session) -> DownloadConfig:
-        """初始化默认下载配置"""
-        default_config = DownloadConfig(
-            download_dir=str(Path(__file__).parent.parent.parent / "downloads"),
-            max_concurrent_downloads=5,
-            chunk_size=1048576,
-            resume_support=True,
-            retry_attempts=5,
-            retry_delay=60,
-            timeout=60,
-            category_subdirs=True,
-            file_recognition_method="extension",
-            bt_listen_port=6881,
-            bt_max_connections=100,
-            bt_max_uploads=10,
-            bt_download_rate_limit=0,
-            bt_upload_rate_limit=0,
-            bt_seed_time=3600,
-            bt_use_dht=True,
-            bt_use_pex=True,
-            bt_use_lsd=True,
-            state_save_interval=300,
-            save_history=True,
-            history_max_count=100
-        )
-        db.add(default_config)
-        db.commit()
-        return default_config
-
-    def get_config(self) -> DownloadConfig:
-        """获取当前下载配置"""
-        return self._config
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
-    def update_config(self, update_data: Dict[str, Any]):
-        """更新下载配置"""
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("配置快照不可修改，请通过update_config更新")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self._values)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(version={self.version})"
+
+
+ConfigSubscriber = Callable[[ConfigSnapshot], None]
+
+_lock = threading.Lock()
+_snapshot: Optional[ConfigSnapshot] = None
+_subscribers: List[ConfigSubscriber] = []
+
+
+def _initialize_default_config(db: Session) -> DownloadConfig:
+    """初始化默认下载配置"""
+    default_config = DownloadConfig(
+        download_dir=str(Path(__file__).parent.parent.parent / "downloads"),
+        max_concurrent_downloads=5,
+        chunk_size=1048576,
+        resume_support=True,
+        retry_attempts=5,
+        retry_delay=60,
+        timeout=60,
+        category_subdirs=True,
+        file_recognition_method="extension",
+        download_rate_limit=0,
+        host_download_rate_limit=0,
+        task_download_rate_limit=0,
+        bt_listen_port=6881,
+        bt_max_connections=100,
+        bt_max_uploads=10,
+        bt_download_rate_limit=0,
+        bt_upload_rate_limit=0,
+        bt_seed_time=3600,
+        bt_use_dht=True,
+        bt_use_pex=True,
+        bt_use_lsd=True,
+        state_save_interval=300,
+        save_history=True,
+        history_max_count=100
+    )
+    db.add(default_config)
+    db.commit()
+    # 提交后属性会过期，刷新以便读取
+    db.refresh(default_config)
+    return default_config
+
+
+def get_download_config() -> ConfigSnapshot:
+    """获取当前配置快照，仅首次调用时查询数据库"""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        if _snapshot is None:
+            db = SessionLocal()
+            try:
+                config = db.query(DownloadConfig).first()
+                if not config:
+                    config = _initialize_default_config(db)
+                _snapshot = ConfigSnapshot.from_model(config, version=1)
+            finally:
+                db.close()
+        return _snapshot
+
+
+def update_download_config(update_data: Dict[str, Any]) -> ConfigSnapshot:
+    """写入配置并重建快照，随后通知所有订阅者"""
+    global _snapshot
+    with _lock:
         db = SessionLocal()
         try:
             config = db.query(DownloadConfig).first()
             if not config:
-                config = self._initialize_default_config(db)
-            
+                config = _initialize_default_config(db)
+
             for key, value in update_data.items():
                 if hasattr(config, key):
                     setattr(config, key, value)
-            
+
             db.commit()
-            self._config = config
+            db.refresh(config)
+            version = _snapshot.version + 1 if _snapshot is not None else 1
+            snapshot = _snapshot = ConfigSnapshot.from_model(config, version)
         finally:
             db.close()
+        subscribers = list(_subscribers)
+
+    for callback in subscribers:
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.error(f"应用配置变更失败({getattr(callback, '__name__', callback)}): {str(e)}")
+    return snapshot
+
+
+def subscribe_config(callback: ConfigSubscriber):
+    """订阅配置变更，配置更新后以新快照调用callback"""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def unsubscribe_config(callback: ConfigSubscriber):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def invalidate_download_config():
+    """丢弃缓存的快照，下次读取时重新从数据库加载"""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+class DownloadConfigManager:
+    """下载配置管理器，读写进程内共享的配置快照"""
+
+    def get_config(self) -> ConfigSnapshot:
+        """获取当前下载配置"""
+        return get_download_config()
+
+    def update_config(self, update_data: Dict[str, Any]) -> ConfigSnapshot:
+        """更新下载配置"""
+        return update_download_config(update_data)
+
+
+__all__ = [
+    'ConfigSnapshot',
+    'DownloadConfigManager',
+    'DownloadConfig',
+    'get_download_config',
+    'update_download_config',
+    'subscribe_config',
+    'unsubscribe_config',
+    'invalidate_download_config'
+]
@@ -12,41 +12,69 @@ import json
 import shutil
 import asyncio
 import aiohttp
-import aiofiles
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, List
 import logging
 from fastapi import HTTPException, Depends
 from sqlalchemy.orm import Session
 import urllib
 
 from app.core.config import settings
-from app.core.config_manager import ConfigManager
-from app.core.download_config_manager import DownloadConfigManager, DownloadConfig
+from app.core.download_config_manager import ConfigSnapshot, get_download_config, subscribe_config
+from app.core.segmented_download import RangeProbe, SegmentedDownloader, probe_range_support
+from app.core.mirrors import MirrorPool
+from app.core.metalink import parse_metalink
+from app.core.scheduler import PriorityTaskQueue
+from app.core.transport import DownloadTransport
+from app.core.worker_pool import DownloadWorkerPool
+from app.core.disk_writer import DiskWriter
+from app.core.buffers import AdaptiveChunkSizer
+from app.core.download_cache import CacheEntry, DownloadCache, link_file, revalidate, validators_from_headers
+from app.core.checksum import ChecksumMismatch, StreamingHasher, normalize_checksum
+from app.core.file_types import (
+    FILE_CATEGORIES, DEFAULT_CATEGORY, ContentSniffer,
+    category_from_extension, resolve_category, file_type_for_category
+)
+from app.core.rate_limiter import BandwidthLimiter
+from app.core.task_persistence import TaskPersistence
+from app.core.progress_journal import ProgressJournal, journal_path
+from app.core.stall import PhaseTimeouts, StallDetector, StallError, open_response
+from app.core.retry import CircuitBreakers, RetryScheduler, backoff_delay, classify_error
+from app.core.transfers import TransferRegistry
+from app.core.progress_ticker import ProgressTicker
+from app.core.task_store import TaskStore
+from app.core.inflight import InflightRegistry
+from app.core.batch_ingest import BatchFormatError
+from app.core.history_store import HistoryStore
 from app.db.session import get_db
 from app.schemas.download import (
-    DownloadTask, DownloadStatus, DownloadType,
-    DownloadTaskDetail, DownloadTaskListResponse
+    DownloadTask, DownloadStatus, DownloadType, PriorityLevel,
+    DownloadTaskDetail, DownloadTaskListResponse, DownloadRequest
 )
 from app.schemas.file import FileInfo, FileListResponse
-from app.utils.logger import setup_logger
+from app.utils.logger import SampledLogger, logging_stats, setup_logger
 from app.websocket_manager import websocket_manager
 
 logger = setup_logger(__name__)
+# 重试、重连和推送失败在故障时可能成批出现，按来源限频输出
+sampled_logger = SampledLogger(logger)
+
+# 批量创建时每批入队和写库的任务数
+BULK_INSERT_SIZE = 1000
+# 批量创建结果中最多返回的错误样例数
+BULK_ERROR_SAMPLES = 20
 
-# 文件分类常量
-FILE_CATEGORIES = {
-    "video": [".mp4", ".avi", ".mkv", ".mov", ".wmv"],
-    "audio": [".mp3", ".wav", ".flac", ".aac", ".ogg"],
-    "image": [".jpg", ".jpeg", ".png", ".gif", ".bmp"],
-    "document": [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt"],
-    "archive": [".zip", ".rar", ".7z", ".tar", ".gz"],
-    "executable": [".exe", ".msi", ".dmg", ".pkg", ".deb"],
-    "other": []
-}
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+# 单连接下载遇到这些错误时从已落盘的位置重新连接，其余错误交给任务级重试
+_RECONNECT_ERRORS = (
+    StallError,
+    aiohttp.ClientPayloadError,
+    aiohttp.ServerDisconnectedError,
+    aiohttp.ServerTimeoutError
+)
 
-DEFAULT_CATEGORY = "other"
 
 class DownloadManager:
     """单例下载管理器"""
@@ -60,40 +88,118 @@ class DownloadManager:
     
     def _init_manager(self):
         """初始化管理器状态"""
-        self.download_tasks: Dict[str, DownloadTask] = {}
-        self.history_tasks: Dict[str, DownloadTask] = {}
-        self.download_queue: Optional[asyncio.Queue] = None
+        self.download_tasks = TaskStore()
+        self.history_tasks = HistoryStore(settings.history_hot_size)
+        self.download_queue: Optional[PriorityTaskQueue] = None
         self.task_locks: Dict[str, asyncio.Lock] = {}
-        self._last_notify_time: Dict[str, float] = {}  # 任务ID: 上次通知时间戳
+        self.hashers: Dict[str, StreamingHasher] = {}  # 跨暂停/重试复用的校验和状态
+        self.inflight = InflightRegistry()  # 相同URL的下载合并为一次传输
+        self.transfers = TransferRegistry()  # 运行中传输的取消句柄
+        self.worker_pool: Optional[DownloadWorkerPool] = None
+        self.transport = DownloadTransport(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            dns_cache_ttl=settings.http_dns_cache_ttl,
+            keepalive_timeout=settings.http_keepalive_timeout
+        )
+        self.rate_limiter = BandwidthLimiter()
+        self.disk_writer = DiskWriter(
+            settings.disk_io_threads,
+            settings.disk_write_buffer_size,
+            settings.download_memory_budget
+        )
+        self.cache = DownloadCache(settings.download_cache_max_entries)
+        self.cache.enabled = settings.download_cache_enabled
+        self.persistence = TaskPersistence()
+        self.progress_ticker: Optional[ProgressTicker] = None
+        self.retry_scheduler = RetryScheduler(lambda task_id: _requeue_retry(task_id))  # 失败任务按退避时间重新入队
+        self.breakers = CircuitBreakers(
+            settings.circuit_failure_threshold,
+            settings.circuit_open_time,
+            settings.retry_max_delay
+        )
         self._initialized = False
-        self._notify_interval = 3  # 默认3秒推送间隔
 
 # 创建单例实例
 download_manager = DownloadManager()
 
 async def init_download_manager():
     """初始化下载管理器
-    1. 创建任务队列
-    2. 启动后台处理任务
+    1. 创建优先级任务队列
+    2. 按max_concurrent_downloads启动下载工作池
     """
-    logger.debug(f"初始化前download_manager状态: {download_manager.__dict__}")
+    logger.debug("初始化前download_manager状态: %s", download_manager.__dict__)
     
-    download_manager.download_queue = asyncio.Queue()
-    download_manager.download_tasks = {}
-    download_manager.history_tasks = {}
+    download_manager.download_queue = PriorityTaskQueue(settings.priority_aging_interval)
+    download_manager.download_tasks = TaskStore()
+    download_manager.history_tasks = HistoryStore(settings.history_hot_size)
     download_manager.task_locks = {}
+    download_manager.inflight.clear()
     
-    asyncio.create_task(process_download_queue())
+    download_manager.progress_ticker = ProgressTicker(
+        settings.progress_tick_interval,
+        _progress_snapshot,
+        _publish_progress
+    )
+    download_manager.progress_ticker.start()
+    download_manager.retry_scheduler.start()
+    
+    process_download_queue()
     download_manager._initialized = True
     logger.info("下载管理器初始化完成")
-    logger.debug(f"初始化后download_manager状态: {download_manager.__dict__}")
+    logger.debug("初始化后download_manager状态: %s", download_manager.__dict__)
 
 async def load_tasks_on_startup(db: Session):
     """应用启动时加载任务"""
+    try:
+        download_manager.persistence.migrate_legacy(db)
+    except Exception as e:
+        logger.error(f"迁移旧版任务数据失败: {str(e)}")
+    try:
+        download_manager.cache.load(db)
+    except Exception as e:
+        logger.error(f"加载下载缓存失败: {str(e)}")
     await _load_history(db)
     await _load_active_tasks(db)
+    await _resume_interrupted_tasks()
     asyncio.create_task(_save_task_state_periodically(db))
 
+def _build_task(url: str, **kwargs) -> DownloadTask:
+    """校验参数并构造新的排队任务
+    Raises:
+        ValueError: 参数不合法
+    """
+    # 确保download_type只传递一次
+    download_type = kwargs.pop("download_type", None) or DownloadType.HTTP
+    # Metalink提供镜像列表，以及未指定时的文件名和校验和
+    metalink = kwargs.pop("metalink", None)
+    mirrors = list(kwargs.pop("mirrors", None) or [])
+    if metalink:
+        document = parse_metalink(metalink)
+        url = url or document.urls[0]
+        mirrors += document.urls
+        kwargs["filename"] = kwargs.get("filename") or document.name
+        if document.checksum and not kwargs.get("expected_checksum"):
+            kwargs["checksum_algorithm"], kwargs["expected_checksum"] = document.checksum
+    if not url:
+        raise ValueError("需要提供url或metalink")
+    kwargs["mirrors"] = _distinct_mirrors(url, mirrors)
+    
+    # 期望校验和需同时提供算法和摘要
+    algorithm = kwargs.get("checksum_algorithm")
+    if algorithm or kwargs.get("expected_checksum"):
+        kwargs["expected_checksum"] = normalize_checksum(
+            getattr(algorithm, 'value', algorithm), kwargs.get("expected_checksum")
+        )
+    return DownloadTask(
+        id=str(uuid.uuid4()),
+        url=url,
+        download_type=download_type,
+        status=DownloadStatus.QUEUED,
+        created_at=time.time(),
+        **kwargs
+    )
+
 async def create_download_task(url: str, **kwargs) -> str:
     """创建新的下载任务
     Args:
@@ -102,50 +208,188 @@ async def create_download_task(url: str, **kwargs) -> str:
     Returns:
         任务ID
     """
-    task_id = str(uuid.uuid4())
-    # 确保download_type只传递一次
-    download_type = kwargs.pop("download_type", DownloadType.HTTP)
-    task = DownloadTask(
-        id=task_id,
-        url=url,
-        download_type=download_type,
-        status=DownloadStatus.QUEUED,
-        **kwargs
-    )
+    try:
+        task = _build_task(url, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    task_id = task.id
     download_manager.download_tasks[task_id] = task
     download_manager.task_locks[task_id] = asyncio.Lock()
-    await download_manager.download_queue.put(task_id)
+    await _schedule_task(task)
     await _notify_task_update(task_id)
     return task_id
 
+def _distinct_mirrors(url: str, mirrors: List[str]) -> List[str]:
+    """去掉与主URL或彼此重复的镜像，只接受HTTP(S)地址"""
+    seen = {_normalize_url(url)}
+    distinct = []
+    for mirror in mirrors:
+        if not isinstance(mirror, str) or not mirror.strip().lower().startswith(("http://", "https://")):
+            raise ValueError(f"镜像地址无效: {mirror}")
+        key = _normalize_url(mirror)
+        if key not in seen:
+            seen.add(key)
+            distinct.append(mirror.strip())
+    return distinct
+
+def _request_kwargs(request: DownloadRequest) -> Dict[str, Any]:
+    """DownloadRequest转换为创建任务的参数"""
+    return {
+        "download_type": request.download_type or DownloadType.HTTP,
+        "filename": request.filename,
+        "priority": request.priority,
+        "referer": request.referer,
+        "user_agent": request.user_agent,
+        "start_from": request.start_from,
+        "category": request.category,
+        "checksum_algorithm": request.checksum_algorithm,
+        "expected_checksum": request.checksum,
+        "mirrors": request.mirrors,
+        "metalink": request.metalink
+    }
+
+def _normalize_url(url: str) -> str:
+    """规范化URL用于去重：协议和主机名小写，去掉默认端口和片段"""
+    url = url.strip()
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        host = f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        host = f"{userinfo}@{host}"
+    return urllib.parse.urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+async def create_download_tasks_bulk(entries: AsyncIterator[Any], db: Session) -> Dict[str, Any]:
+    """批量创建下载任务
+
+    每条记录为URL字符串或DownloadRequest格式的对象；
+    按规范化URL去重(包括已有的活跃任务)，每BULK_INSERT_SIZE条批量入队并写库，
+    全部完成后只发送一次汇总通知。请求体格式错误时保留已创建的任务并在结果中返回error
+    """
+    seen = {_normalize_url(task.url) for task in download_manager.download_tasks.values()}
+    result: Dict[str, Any] = {"received": 0, "created": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    pending: List[DownloadTask] = []
+    
+    try:
+        async for entry in entries:
+            result["received"] += 1
+            try:
+                if isinstance(entry, str):
+                    request = DownloadRequest(url=entry)
+                elif isinstance(entry, dict):
+                    request = DownloadRequest(**entry)
+                else:
+                    raise ValueError("记录应为URL字符串或对象")
+                task = _build_task(request.url, **_request_kwargs(request))
+                key = _normalize_url(task.url)
+                if key in seen:
+                    result["duplicates"] += 1
+                    continue
+            except ValueError as e:
+                result["invalid"] += 1
+                if len(result["errors"]) < BULK_ERROR_SAMPLES:
+                    result["errors"].append({"index": result["received"] - 1, "error": str(e)})
+                continue
+            
+            seen.add(key)
+            pending.append(task)
+            if len(pending) >= BULK_INSERT_SIZE:
+                result["created"] += await _insert_tasks(pending, db)
+                pending = []
+    except BatchFormatError as e:
+        result["error"] = str(e)
+    finally:
+        if pending:
+            result["created"] += await _insert_tasks(pending, db)
+    
+    logger.info(
+        f"批量创建任务: 收到{result['received']}条，创建{result['created']}个，"
+        f"重复{result['duplicates']}条，无效{result['invalid']}条"
+    )
+    await websocket_manager.broadcast({"type": "downloads_created", "payload": {
+        key: result[key] for key in ("created", "duplicates", "invalid")
+    }})
+    if websocket_manager.has_aggregate_subscribers:
+        await websocket_manager.publish_summary(_download_summary())
+    return result
+
+async def _insert_tasks(tasks: List[DownloadTask], db: Session) -> int:
+    """一批任务一次性加入内存、队列和数据库，不逐个通知"""
+    for task in tasks:
+        download_manager.download_tasks[task.id] = task
+        download_manager.task_locks[task.id] = asyncio.Lock()
+        # 批量创建时已与活跃任务去重，每个任务都是独立的传输
+        download_manager.inflight.register(_normalize_url(task.url), task.id)
+    download_manager.persistence.mark_all_dirty(task.id for task in tasks)
+    await download_manager.download_queue.put_many((task.id, task.priority) for task in tasks)
+    await _flush_task_state(db)
+    return len(tasks)
+
 async def get_download_tasks(
     status: Optional[DownloadStatus] = None,
     download_type: Optional[DownloadType] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
+) -> DownloadTaskListResponse:
+    """获取下载任务列表
+    按开始/创建时间倒序，通过索引只取出当前页；
+    传入上一页返回的next_cursor可稳定翻页，不受新任务插入影响
+    """
+    store = download_manager.download_tasks
+    try:
+        tasks, next_cursor = store.page(status, download_type, limit, offset, cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return DownloadTaskListResponse(
+        items=[DownloadTaskDetail.from_task(t) for t in tasks],
+        total=store.count(status, download_type),
+        next_cursor=next_cursor
+    )
+
+async def get_history_tasks(
+    db: Session,
+    status: Optional[DownloadStatus] = None,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None
 ) -> DownloadTaskListResponse:
-    """获取下载任务列表"""
-    tasks = list(download_manager.download_tasks.values())
-    if status:
-        tasks = [t for t in tasks if t.status == status]
-    if download_type:
-        tasks = [t for t in tasks if t.download_type == download_type]
-    tasks.sort(key=lambda t: t.start_time or 0, reverse=True)
+    """分页查询历史任务，支持按状态、分类和创建时间范围筛选"""
+    # 先写入未保存的变更，保证数据库中的历史是最新的
+    await _flush_task_state(db)
+    try:
+        tasks, total, next_cursor = download_manager.history_tasks.query(
+            db, status, category, since, until, limit, offset, cursor
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
     return DownloadTaskListResponse(
-        items=[DownloadTaskDetail.from_task(t) for t in tasks[offset:offset+limit]],
-        total=len(tasks)
+        items=[DownloadTaskDetail.from_task(t) for t in tasks],
+        total=total,
+        next_cursor=next_cursor
     )
 
 async def get_download_task(task_id: str) -> DownloadTaskDetail:
     """获取单个任务详情"""
-    task = download_manager.download_tasks.get(task_id) or download_manager.history_tasks.get(task_id)
+    task = download_manager.download_tasks.get(task_id) or download_manager.history_tasks.lookup(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     return DownloadTaskDetail(**task.dict())
 
 async def get_task_files(task_id: str) -> FileListResponse:
     """获取任务文件列表"""
-    task = download_manager.download_tasks.get(task_id) or download_manager.history_tasks.get(task_id)
+    task = download_manager.download_tasks.get(task_id) or download_manager.history_tasks.lookup(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     return FileListResponse(files=[FileInfo(
@@ -162,8 +406,7 @@ async def resume_download(task_id: str) -> Dict[str, str]:
         raise HTTPException(status_code=404, detail="任务不存在")
     if task.status not in [DownloadStatus.PAUSED, DownloadStatus.FAILED]:
         raise HTTPException(status_code=400, detail="任务状态不支持恢复")
-    task.status = DownloadStatus.QUEUED
-    await download_manager.download_queue.put(task_id)
+    await _schedule_task(task)
     await _notify_task_update(task_id)
     return {
         "success": "true",
@@ -171,17 +414,38 @@ async def resume_download(task_id: str) -> Dict[str, str]:
         "data": json.dumps({"message": "任务已恢复"})
     }
 
+async def set_task_priority(task_id: str, priority: PriorityLevel) -> Dict[str, str]:
+    """调整任务优先级，已排队任务原地调整，不重新入队"""
+    task = download_manager.download_tasks.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    task.priority = priority.value if isinstance(priority, PriorityLevel) else priority
+    requeued = download_manager.download_queue.reprioritize(task_id, task.priority)
+    await _notify_task_update(task_id)
+    
+    return {
+        "success": "true",
+        "code": "200",
+        "data": json.dumps({"message": "任务优先级已更新", "queued": requeued})
+    }
+
 async def pause_download(task_id: str, db: Session = Depends(get_db)) -> Dict[str, str]:
     """暂停下载任务"""
     task = download_manager.download_tasks.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
-    if task.status != DownloadStatus.DOWNLOADING:
-        raise HTTPException(status_code=400, detail="只有正在下载的任务可以暂停")
+    if task.status not in (DownloadStatus.DOWNLOADING, DownloadStatus.QUEUED):
+        raise HTTPException(status_code=400, detail="只有排队或正在下载的任务可以暂停")
     
+    # 跟随任务脱离共享的传输，不影响主任务和其他跟随任务
+    _detach_follower(task)
     task.status = DownloadStatus.PAUSED
+    _withdraw_task(task_id)
+    # 立即中断传输，已收到的数据落盘后保留进度
+    download_manager.transfers.abort(task_id)
     await _notify_task_update(task_id)
-    await _save_active_tasks(db)
+    await _flush_task_state(db)
     
     return {
         "success": "true",
@@ -196,50 +460,184 @@ async def cancel_download(task_id: str, db: Session = Depends(get_db)) -> Dict[s
         raise HTTPException(status_code=404, detail="任务不存在")
     
     task.status = DownloadStatus.CANCELLED
-    task.end_time = datetime.now()
+    task.end_time = time.time()
+    _withdraw_task(task_id)
+    # 立即中断传输，释放连接和带宽
+    handle = download_manager.transfers.get(task_id)
+    running = handle is not None and not handle.runner.done()
+    freed_bandwidth = int(download_manager.rate_limiter.task_throughput(task_id)) if running else 0
+    freed_connections = download_manager.transfers.abort(task_id)
     
-    # 清理临时文件
-    temp_file = getattr(task, 'temp_file', None)
-    if temp_file and os.path.exists(temp_file):
-        try:
-            os.remove(temp_file)
-        except Exception as e:
-            logger.error(f"删除临时文件失败: {str(e)}")
+    # 传输中的任务由传输协程收尾后清理临时文件，避免收尾时的写入重新创建文件
+    if not running:
+        _remove_partial_files(task)
     
+    download_manager.hashers.pop(task_id, None)
     # 移动到历史记录
     download_manager.history_tasks[task_id] = task
     download_manager.download_tasks.pop(task_id, None)
     
+    _detach_follower(task)
+    # 主任务未在下载时立即由跟随任务接替，下载中的主任务在传输停止后接替
+    lock = download_manager.task_locks.get(task_id)
+    if lock is None or not lock.locked():
+        await _promote_follower(task)
+    
     await _notify_task_update(task_id)
-    await _save_history(db)
+    await _flush_task_state(db)
     
     return {
         "success": "true",
         "code": "200",
-        "data": json.dumps({"message": "任务已取消"})
+        "data": json.dumps({
+            "message": "任务已取消",
+            "freed_bandwidth": freed_bandwidth,
+            "freed_connections": freed_connections
+        })
     }
 
+def _remove_partial_files(task: DownloadTask):
+    """删除取消任务的临时文件及进度日志"""
+    temp_file = getattr(task, 'temp_file', None)
+    if temp_file:
+        for path in (temp_file, journal_path(temp_file)):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    logger.error(f"删除临时文件失败: {str(e)}")
+
 async def cleanup_resources(db: Session = Depends(get_db)):
     """清理资源并保存状态"""
-    await _save_active_tasks(db)
-    await _save_history(db)
+    await _flush_task_state(db)
+
+def process_download_queue():
+    """启动下载工作池处理队列中的任务(公共方法)，重复调用无副作用"""
+    if download_manager.worker_pool is not None:
+        return download_manager.worker_pool
+    
+    config = None
+    try:
+        config = get_download_config()
+    except Exception as e:
+        logger.warning(f"读取下载配置失败，使用默认值: {str(e)}")
+    
+    download_manager.worker_pool = DownloadWorkerPool(
+        download_manager.download_queue.get,
+        _process_task
+    )
+    download_manager.worker_pool.start(
+        getattr(config, 'max_concurrent_downloads', None) or settings.max_concurrent_downloads
+    )
+    if config is not None:
+        apply_runtime_config(config)
+    # 配置更新后由配置快照推送到工作池、限速器等运行中组件
+    subscribe_config(apply_runtime_config)
+    return download_manager.worker_pool
+
+def apply_runtime_config(config: ConfigSnapshot):
+    """配置变更时实时调整并发下载数、限速和历史保留策略"""
+    if download_manager.worker_pool is not None and config.max_concurrent_downloads:
+        download_manager.worker_pool.resize(config.max_concurrent_downloads)
+    download_manager.rate_limiter.configure(
+        global_rate=getattr(config, 'download_rate_limit', None) or 0,
+        host_rate=getattr(config, 'host_download_rate_limit', None) or 0,
+        task_rate=getattr(config, 'task_download_rate_limit', None) or 0
+    )
+    save_history = getattr(config, 'save_history', None)
+    history_max_count = getattr(config, 'history_max_count', None)
+    download_manager.history_tasks.configure(
+        hot_size=settings.history_hot_size,
+        max_count=history_max_count if history_max_count is not None else settings.history_max_count,
+        enabled=save_history if save_history is not None else settings.save_history
+    )
+
+def get_download_stats() -> Dict[str, Any]:
+    """获取下载子系统运行统计"""
+    pool = download_manager.worker_pool
+    return {
+        "workers": pool.stats() if pool else {},
+        "queued": download_manager.download_queue.qsize() if download_manager.download_queue else 0,
+        "queued_by_priority": download_manager.download_queue.stats() if download_manager.download_queue else {},
+        "connections": download_manager.transport.stats(),
+        "rate_limit": download_manager.rate_limiter.stats(),
+        "disk": download_manager.disk_writer.stats(),
+        "websocket": websocket_manager.stats(),
+        "progress_ticker": download_manager.progress_ticker.stats() if download_manager.progress_ticker else {},
+        "history": download_manager.history_tasks.stats(),
+        "inflight": download_manager.inflight.stats(),
+        "cache": download_manager.cache.stats(),
+        "logging": logging_stats(),
+        "retry": download_manager.retry_scheduler.stats(),
+        "transfers": download_manager.transfers.stats(),
+        "circuits": download_manager.breakers.stats(),
+        "config_version": get_download_config().version,
+        "active_tasks": len(download_manager.download_tasks)
+    }
+
+def get_buffer_stats() -> Dict[str, Any]:
+    """下载缓冲区的内存占用和预算"""
+    writer = download_manager.disk_writer
+    return {
+        **writer.budget.stats(),
+        "streams": writer.stats()["streams"],
+        "write_buffer_size": writer.buffer_size,
+        "max_read_size": get_download_config().chunk_size
+    }
+
+async def shutdown_download_manager():
+    """停止下载工作池、关闭连接池和进度节拍器"""
+    if download_manager.worker_pool is not None:
+        await download_manager.worker_pool.stop()
+        download_manager.worker_pool = None
+    await download_manager.transport.close()
+    await download_manager.disk_writer.shutdown()
+    if download_manager.progress_ticker is not None:
+        await download_manager.progress_ticker.stop()
+    await download_manager.retry_scheduler.stop()
 
 # 私有方法
-async def process_download_queue():
-    """处理下载队列中的任务(公共方法)"""
-    while True:
-        task_id = await download_manager.download_queue.get()
-        async with download_manager.task_locks[task_id]:
-            await _download_file(task_id)
+async def _process_task(task_id: str):
+    """工作协程处理单个任务；主机熔断中的任务推迟到熔断到期，不占用工作协程
+
+    下载在独立的协程中运行并登记取消句柄，暂停或取消时立即中止
+    """
+    task = download_manager.download_tasks.get(task_id)
+    if task is None or task.status != DownloadStatus.QUEUED:
+        # 出队前已被取消或暂停
+        return
+    host = _circuit_host(task)
+    wait = download_manager.breakers.blocked_for(host) if host else 0
+    if wait > 0:
+        _schedule_retry(task, wait)
+        return
+    async with download_manager.task_locks[task_id]:
+        runner = asyncio.ensure_future(_download_file(task_id))
+        handle = download_manager.transfers.register(task_id, runner)
+        try:
+            await runner
+        except asyncio.CancelledError:
+            # 被暂停或取消的传输已在_download_file中收尾，工作协程继续处理下一个任务
+            if not handle.aborted:
+                raise
+        finally:
+            download_manager.transfers.discard(handle)
+            if handle.aborted and task.status == DownloadStatus.CANCELLED:
+                # 传输协程在开始执行前或收尾途中被取消时_download_file的清理没有完成，
+                # 传输已完全停止，这里补做(可重复执行)
+                _remove_partial_files(task)
+                await _promote_follower(task)
 
 async def _download_file(task_id: str):
     """实际下载文件实现"""
     task = download_manager.download_tasks[task_id]
-    config = DownloadConfigManager().get_config()
+    # 任务开始时取一次配置快照，分块大小等新配置对之后启动的任务立即生效
+    config = get_download_config()
+    journal = None
     
     try:
         task.status = DownloadStatus.DOWNLOADING
-        task.start_time = datetime.now()
+        task.start_time = time.time()
         await _notify_task_update(task_id)
         
         # 创建下载目录
@@ -250,106 +648,697 @@ async def _download_file(task_id: str):
         # 获取文件名
         filename = task.filename or extract_filename_from_url(task.url)
         file_path = download_dir / filename
+        sniffer = _content_sniffer(task, filename, config)
         
-        # 断点续传支持
+        # 断点续传支持：以进度日志记录的已完成区间为准
         temp_file = file_path.with_suffix('.part')
-        downloaded_bytes = temp_file.stat().st_size if temp_file.exists() else 0
+        task.temp_file = str(temp_file)
+        journal = await ProgressJournal(temp_file, fsync_interval=settings.journal_fsync_interval).load()
+        if not temp_file.exists():
+            await journal.reset()
+        elif not journal.exists:
+            # 没有进度日志的旧版.part文件，按文件大小视为已完成的前缀
+            journal.record(0, temp_file.stat().st_size)
+        downloaded_bytes = journal.completed_bytes
+        # 哈希只能覆盖仍保留的连续前缀，超出部分被丢弃时从头重算
+        hasher = _task_hasher(task)
+        if hasher is not None:
+            hasher.rewind(journal.completed.contiguous_prefix())
         
         # 设置HTTP头
         headers = {}
-        if downloaded_bytes > 0:
-            headers['Range'] = f'bytes={downloaded_bytes}-'
         
-        # 下载参数
-        timeout = aiohttp.ClientTimeout(total=config.timeout)
-        connector = aiohttp.TCPConnector(limit=config.max_concurrent_downloads)
+        # 下载参数：分阶段超时，不限制整个下载的时长
+        timeouts = PhaseTimeouts(
+            connect=settings.http_connect_timeout,
+            first_byte=settings.http_first_byte_timeout,
+            read_idle=config.timeout
+        )
+        timeout = timeouts.client_timeout()
+        
+        # 相同的下载已完成过且内容未变时直接复用本地文件
+        cached = await _find_cached_download(task, headers, timeout)
+        if cached is not None:
+            await _complete_from_cache(task, cached, temp_file, file_path)
+            return
+        
+        progress = _ProgressUpdater(task_id, downloaded_bytes)
+        host = urllib.parse.urlparse(task.url).hostname or ""
         
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-            async with session.get(task.url, headers=headers) as response:
-                if response.status not in (200, 206):
-                    raise HTTPException(
-                        status_code=response.status,
-                        detail=f"下载失败: HTTP {response.status}"
-                    )
-                
-                # 获取文件总大小
-                total_size = int(response.headers.get('content-length', 0)) + downloaded_bytes
-                task.total_size = total_size
-                
-                # 分块下载
-                chunk_size = config.chunk_size
-                last_update_time = time.time()
-                last_downloaded_bytes = downloaded_bytes
-                async with aiofiles.open(temp_file, 'ab') as f:
-                    async for chunk in response.content.iter_chunked(chunk_size):
-                        await f.write(chunk)
-                        downloaded_bytes += len(chunk)
-                        
-                        # 计算下载速度 (字节/秒)
-                        now = time.time()
-                        time_diff = now - last_update_time
-                        if time_diff > 0.5:  # 每0.5秒更新一次速度
-                            speed = (downloaded_bytes - last_downloaded_bytes) / time_diff
-                            task.download_speed = int(speed)  # 使用schema中定义的download_speed字段
-                            last_update_time = now
-                            last_downloaded_bytes = downloaded_bytes
-                        
-                        task.progress = int((downloaded_bytes / total_size) * 100)
-                        await _notify_task_update(task_id)
-                        
-                        # 检查任务是否被取消或暂停
-                        if task.status != DownloadStatus.DOWNLOADING:
-                            return
+        async def throttle(nbytes: int, chunk_host: Optional[str] = None):
+            await download_manager.rate_limiter.consume(nbytes, chunk_host or host, task_id)
+        
+        # 有镜像时各区间按实测吞吐分配到不同镜像
+        mirrors = None
+        connections = settings.segment_connections
+        if task.mirrors:
+            mirrors = MirrorPool(
+                [task.url] + task.mirrors,
+                connections_per_mirror=settings.segment_connections,
+                max_errors=settings.mirror_max_errors,
+                slow_ratio=settings.mirror_slow_ratio
+            )
+            progress.mirrors = mirrors
+            connections = min(settings.segment_connections * len(mirrors), settings.mirror_max_connections)
+        
+        async with download_manager.transport.session(timeout=timeout) as session:
+            # 服务器支持Range时使用分段多连接下载，只拉取日志中缺失的区间
+            probe = None
+            if settings.segmented_download and connections > 1:
+                probe = await _probe_sources(session, task, headers)
+            
+            if probe and probe.accept_ranges and probe.total_size >= settings.segment_min_size * 2:
+                if journal.total_size != probe.total_size:
+                    # 此前为单连接下载时保留连续前缀，远端文件大小变化则全部重新下载
+                    prefix = 0 if journal.total_size else min(journal.completed.contiguous_prefix(), probe.total_size)
+                    await journal.reset(probe.total_size, prefix)
+                    if hasher is not None:
+                        hasher.rewind(prefix)
+                task.total_size = probe.total_size
+                task.etag, task.last_modified = probe.etag, probe.last_modified
+                downloader = SegmentedDownloader(
+                    session,
+                    task.url,
+                    temp_file,
+                    probe.total_size,
+                    headers=headers,
+                    connections=connections,
+                    chunk_size=config.chunk_size,
+                    min_segment_size=settings.segment_min_size,
+                    on_progress=progress.report,
+                    throttle=throttle,
+                    should_continue=lambda: task.status == DownloadStatus.DOWNLOADING,
+                    journal=journal,
+                    writer=download_manager.disk_writer,
+                    hasher=hasher,
+                    sniffer=sniffer,
+                    mirrors=mirrors,
+                    timeouts=timeouts,
+                    stall_min_speed=settings.stall_min_speed,
+                    stall_window=settings.stall_window,
+                    max_reconnects=settings.stall_max_reconnects,
+                    on_reconnect=lambda error: _count_reconnect(task, error)
+                )
+                handle = download_manager.transfers.get(task_id)
+                if handle is not None:
+                    handle.connections = lambda: downloader.active_connections
+                try:
+                    completed = await downloader.run()
+                finally:
+                    if mirrors is not None:
+                        task.mirror_stats = mirrors.stats()
+            else:
+                completed = await _download_single_stream(
+                    session, task, temp_file, journal, headers, config.chunk_size, progress, throttle,
+                    hasher, sniffer, timeouts
+                )
+            
+            # 任务被取消或暂停
+            if not completed:
+                return
+        
+        # 文件小于识别所需长度时用已收到的数据识别
+        if sniffer is not None:
+            sniffer.finish()
+        
+        if hasher is not None:
+            await _verify_checksum(task, hasher, temp_file)
         
         # 下载完成，重命名临时文件
         temp_file.rename(file_path)
         task.file_path = str(file_path)
         task.status = DownloadStatus.COMPLETED
-        task.end_time = datetime.now()
+        task.end_time = time.time()
+        # 重试成功后不再保留此前失败的错误信息
+        task.error = None
+        
+    except ChecksumMismatch as e:
+        # 数据本身有误，重试或续传都无意义，丢弃已下载内容
+        task.status = DownloadStatus.FAILED
+        task.error = str(e)
+        task.end_time = time.time()
+        download_manager.hashers.pop(task_id, None)
+        temp_file.unlink(missing_ok=True)
+        journal.remove()
+        journal = None
+        logger.error(f"任务{task_id}: {str(e)}")
         
     except Exception as e:
+        if task.status in (DownloadStatus.CANCELLED, DownloadStatus.PAUSED):
+            # 用户已取消或暂停，中止传输时引发的错误不计为失败
+            return
         task.status = DownloadStatus.FAILED
         task.error = str(e)
         
-        # 自动重试逻辑
-        if task.retry_count < config.retry_attempts:
+        # 自动重试：按错误类型决定是否重试，退避期间不占用工作协程
+        decision = classify_error(e)
+        circuit_host = _circuit_host(task)
+        if circuit_host and decision.host_failure:
+            download_manager.breakers.record_failure(circuit_host)
+        if circuit_host and decision.retry_after:
+            download_manager.breakers.hold(circuit_host, min(decision.retry_after, settings.retry_max_delay))
+        if decision.retryable and task.retry_count < config.retry_attempts:
             task.retry_count += 1
-            await asyncio.sleep(config.retry_delay)
-            task.status = DownloadStatus.QUEUED
-            await download_manager.download_queue.put(task_id)
+            delay = backoff_delay(task.retry_count, config.retry_delay, settings.retry_max_delay)
+            if decision.retry_after:
+                delay = max(delay, min(decision.retry_after, settings.retry_max_delay))
+            _schedule_retry(task, delay)
+            sampled_logger.info(
+                circuit_host or task.url,
+                "任务%s第%d次重试将在%.1f秒后开始: %s", task_id, task.retry_count, delay, task.error
+            )
         else:
-            # 重试次数用完，标记为失败
+            # 不可重试的错误或重试次数用完，标记为失败
             task.status = DownloadStatus.FAILED
         
     finally:
-        await _notify_task_update(task_id)
+        download_manager.rate_limiter.release_task(task_id)
+        if task.status == DownloadStatus.CANCELLED:
+            # 传输已停止，所有写入完成后再删除临时文件及进度日志
+            _remove_partial_files(task)
+        elif journal is not None:
+            if task.status == DownloadStatus.COMPLETED:
+                journal.remove()
+            else:
+                journal.record_state(retry_count=task.retry_count, download_speed=task.download_speed)
+                await journal.checkpoint()
         if task.status == DownloadStatus.COMPLETED:
-            # 移动到历史记录
+            download_manager.hashers.pop(task_id, None)
+            circuit_host = _circuit_host(task)
+            if circuit_host:
+                download_manager.breakers.record_success(circuit_host)
+            # 分类文件后移动到历史记录，通知中带上最终路径和分类
+            try:
+                await _categorize_file(task, config)
+            except Exception as e:
+                logger.error(f"分类文件失败: {str(e)}")
+            try:
+                _record_cached_download(task)
+            except Exception as e:
+                logger.error(f"记录下载缓存失败: {str(e)}")
             download_manager.history_tasks[task_id] = task
             download_manager.download_tasks.pop(task_id, None)
-            
-            # 分类文件
-            await _categorize_file(task, config)
+            await _complete_followers(task, config)
+        elif task.status == DownloadStatus.FAILED:
+            await _fail_followers(task)
+        elif task.status == DownloadStatus.CANCELLED:
+            await _promote_follower(task)
+        await _notify_task_update(task_id)
+
+class _ProgressUpdater:
+    """根据已下载字节数更新任务进度和速度"""
+
+    def __init__(self, task_id: str, downloaded_bytes: int = 0):
+        self.task_id = task_id
+        self.last_update_time = time.time()
+        self.last_downloaded_bytes = downloaded_bytes
+        self.mirrors: Optional[MirrorPool] = None  # 多镜像任务随速度一起更新各镜像统计
+
+    def update(self, downloaded_bytes: int):
+        task = download_manager.download_tasks.get(self.task_id)
+        if not task:
+            return
+        task.downloaded_size = downloaded_bytes
+
+        # 计算下载速度 (字节/秒)
+        now = time.time()
+        time_diff = now - self.last_update_time
+        if time_diff > 0.5:  # 每0.5秒更新一次速度
+            speed = (downloaded_bytes - self.last_downloaded_bytes) / time_diff
+            task.download_speed = int(speed)  # 使用schema中定义的download_speed字段
+            self.last_update_time = now
+            self.last_downloaded_bytes = downloaded_bytes
+            if self.mirrors is not None:
+                task.mirror_stats = self.mirrors.stats()
+
+        if task.total_size:
+            task.progress = int((downloaded_bytes / task.total_size) * 100)
+        
+        for follower_id in download_manager.inflight.followers(self.task_id):
+            follower = download_manager.download_tasks.get(follower_id)
+            if follower is not None:
+                _mirror_leader(task, follower)
+                _touch_task_progress(follower_id)
 
-async def _categorize_file(task: DownloadTask, config: DownloadConfig):
-    """根据配置分类文件"""
-    if not config.category_subdirs or not task.file_path:
+    async def report(self, downloaded_bytes: int):
+        """更新进度，由节拍器批量推送"""
+        self.update(downloaded_bytes)
+        _touch_task_progress(self.task_id)
+
+async def _probe_sources(
+    session: aiohttp.ClientSession,
+    task: DownloadTask,
+    headers: Dict[str, str]
+) -> RangeProbe:
+    """探测主URL的Range支持，不支持时依次探测镜像"""
+    probe = await probe_range_support(session, task.url, headers)
+    for mirror in task.mirrors:
+        if probe.accept_ranges:
+            break
+        probe = await probe_range_support(session, mirror, headers)
+    return probe
+
+def _count_reconnect(task: DownloadTask, error: BaseException):
+    """累计任务的停滞和重连次数"""
+    if isinstance(error, StallError):
+        task.stall_count += 1
+    task.reconnect_count += 1
+    _touch_task_progress(task.id)
+
+async def _download_single_stream(
+    session: aiohttp.ClientSession,
+    task: DownloadTask,
+    temp_file: Path,
+    journal: ProgressJournal,
+    headers: Dict[str, str],
+    chunk_size: int,
+    progress: _ProgressUpdater,
+    throttle: Callable[[int], Awaitable[None]],
+    hasher: Optional[StreamingHasher] = None,
+    sniffer: Optional[ContentSniffer] = None,
+    timeouts: Optional[PhaseTimeouts] = None
+) -> bool:
+    """单连接顺序下载，连接停滞或中途断开时从已落盘的位置重新连接
+    Returns:
+        是否下载完成(被暂停/取消时返回False)
+    """
+    timeouts = timeouts or PhaseTimeouts()
+    # 连续没有收到数据的重连次数，有进展的重连不计入上限
+    idle_reconnects = 0
+    while True:
+        offset = journal.completed.contiguous_prefix()
+        try:
+            return await _stream_once(
+                session, task, temp_file, journal, headers, chunk_size, progress, throttle,
+                hasher, sniffer, timeouts
+            )
+        except _RECONNECT_ERRORS as e:
+            _count_reconnect(task, e)
+            idle_reconnects = 0 if journal.completed.contiguous_prefix() > offset else idle_reconnects + 1
+            if idle_reconnects > settings.stall_max_reconnects or task.status != DownloadStatus.DOWNLOADING:
+                raise
+            sampled_logger.info(
+                task.id, "任务%s: 连接中断，从 %d 处重新连接: %s", task.id, journal.completed.contiguous_prefix(), e
+            )
+
+async def _stream_once(
+    session: aiohttp.ClientSession,
+    task: DownloadTask,
+    temp_file: Path,
+    journal: ProgressJournal,
+    headers: Dict[str, str],
+    chunk_size: int,
+    progress: _ProgressUpdater,
+    throttle: Callable[[int], Awaitable[None]],
+    hasher: Optional[StreamingHasher],
+    sniffer: Optional[ContentSniffer],
+    timeouts: PhaseTimeouts
+) -> bool:
+    """单个连接的顺序下载，从进度日志记录的连续前缀处续传"""
+    # 只能从连续前缀续传，前缀之后的数据不再可信
+    downloaded_bytes = journal.completed.contiguous_prefix()
+    await journal.reset(prefix=downloaded_bytes)
+    
+    headers = dict(headers)
+    if downloaded_bytes > 0:
+        headers['Range'] = f'bytes={downloaded_bytes}-'
+    
+    response = await open_response(session, task.url, timeouts.first_byte, headers=headers)
+    async with response:
+        if response.status not in (200, 206):
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=f"下载失败: HTTP {response.status}",
+                headers=response.headers
+            )
+        
+        task.etag, task.last_modified = validators_from_headers(response.headers)
+        
+        # 服务器忽略Range时从头开始
+        if response.status == 200 and downloaded_bytes > 0:
+            downloaded_bytes = 0
+            await journal.reset()
+            if hasher is not None:
+                hasher.rewind(0)
+        
+        # 获取文件总大小
+        content_length = int(response.headers.get('content-length', 0))
+        total_size = content_length + downloaded_bytes
+        task.total_size = total_size
+        
+        # 已知大小时预分配整个文件，未知时截到已完成前缀后顺序写入
+        handle = await download_manager.disk_writer.open(
+            temp_file,
+            size=total_size if content_length else downloaded_bytes,
+            truncate=downloaded_bytes == 0
+        )
+        async with handle:
+            stream = handle.stream(downloaded_bytes, on_flushed=journal.record, hasher=hasher)
+            try:
+                # 按连接实测吞吐调整每次读取的大小，chunk_size为上限
+                sizer = AdaptiveChunkSizer(chunk_size)
+                detector = StallDetector(timeouts.read_idle, settings.stall_min_speed, settings.stall_window)
+                while True:
+                    chunk = await detector.read(response.content, sizer.size)
+                    if not chunk:
+                        break
+                    sizer.observe(len(chunk))
+                    if sniffer is not None:
+                        sniffer.feed(downloaded_bytes, chunk)
+                    await stream.write(chunk)
+                    await journal.maybe_checkpoint()
+                    downloaded_bytes += len(chunk)
+                    await progress.report(downloaded_bytes)
+                    await throttle(len(chunk))
+                    
+                    # 检查任务是否被取消或暂停
+                    if task.status != DownloadStatus.DOWNLOADING:
+                        return False
+            finally:
+                await stream.flush()
+    
+    # 预分配后文件大小不再反映实际下载量，数据不足时不能当作完成
+    if content_length and downloaded_bytes < total_size:
+        raise aiohttp.ClientPayloadError(f"响应提前结束: {downloaded_bytes}/{total_size}")
+    return True
+
+def _task_hasher(task: DownloadTask) -> Optional[StreamingHasher]:
+    """返回任务的流式哈希
+
+    提供了期望校验和时使用其算法，否则在启用下载缓存时按download_cache_digest计算内容摘要；
+    都不需要时返回None
+    """
+    if task.checksum_algorithm and task.expected_checksum:
+        algorithm = getattr(task.checksum_algorithm, 'value', task.checksum_algorithm)
+    elif download_manager.cache.enabled and settings.download_cache_digest:
+        algorithm = settings.download_cache_digest
+    else:
+        return None
+    hasher = download_manager.hashers.get(task.id)
+    if hasher is None:
+        # 进程重启后哈希状态无法恢复，已下载的前缀会在续传时从磁盘补算
+        hasher = StreamingHasher(algorithm)
+        download_manager.hashers[task.id] = hasher
+    return hasher
+
+async def _verify_checksum(task: DownloadTask, hasher: StreamingHasher, temp_file: Path):
+    """补算尚未计入的区间后比对校验和"""
+    size = task.total_size or temp_file.stat().st_size
+    await download_manager.disk_writer.call(hasher.catch_up, temp_file, size)
+    task.actual_checksum = hasher.hexdigest()
+    task.checksum_algorithm = hasher.algorithm
+    if not task.expected_checksum:
+        return
+    task.checksum_verified = task.actual_checksum == task.expected_checksum
+    if not task.checksum_verified:
+        raise ChecksumMismatch(
+            f"{hasher.algorithm}校验失败: 期望{task.expected_checksum}，实际{task.actual_checksum}"
+        )
+
+async def _find_cached_download(
+    task: DownloadTask,
+    headers: Dict[str, str],
+    timeout: aiohttp.ClientTimeout
+) -> Optional[CacheEntry]:
+    """查找可直接复用的已完成下载
+
+    1. 提供了期望校验和且已有摘要相同的文件：无需访问网络
+    2. 同一URL下载过：带If-None-Match/If-Modified-Since确认服务器上的内容未变
+    """
+    cache = download_manager.cache
+    if not cache.enabled:
+        return None
+    algorithm = getattr(task.checksum_algorithm, 'value', task.checksum_algorithm)
+    if task.expected_checksum:
+        entry = cache.lookup_digest(algorithm, task.expected_checksum)
+        if entry is not None:
+            cache.mark_hit(entry, "digest")
+            task.cache_hit = "digest"
+            return entry
+    
+    entry = cache.lookup(_normalize_url(task.url))
+    if entry is None or not entry.conditional_headers:
+        cache.mark_miss()
+        return None
+    if task.expected_checksum and not await _cached_file_matches(entry, algorithm, task.expected_checksum):
+        cache.mark_miss()
+        return None
+    async with download_manager.transport.session(timeout=timeout) as session:
+        fresh = await revalidate(session, task.url, entry, headers)
+    if not fresh:
+        cache.mark_miss()
+        return None
+    cache.mark_hit(entry, "revalidated")
+    task.cache_hit = "revalidated"
+    return entry
+
+async def _cached_file_matches(entry: CacheEntry, algorithm: str, expected: str) -> bool:
+    """缓存文件是否符合期望校验和，摘要算法不同时从磁盘计算"""
+    if entry.checksum_algorithm == algorithm and entry.digest:
+        return entry.digest == expected
+    hasher = StreamingHasher(algorithm)
+    await download_manager.disk_writer.call(hasher.catch_up, Path(entry.file_path), entry.size)
+    return hasher.hexdigest() == expected
+
+async def _complete_from_cache(task: DownloadTask, entry: CacheEntry, temp_file: Path, file_path: Path):
+    """以reflink/硬链接复用缓存的文件完成任务，未完成的.part被替换"""
+    method = "existing"
+    if not (file_path.exists() and os.path.samefile(file_path, entry.file_path)):
+        method = await download_manager.disk_writer.call(link_file, Path(entry.file_path), temp_file)
+        temp_file.rename(file_path)
+    download_manager.hashers.pop(task.id, None)
+    
+    task.file_path = str(file_path)
+    task.total_size = task.downloaded_size = entry.size
+    task.progress = 100
+    task.etag, task.last_modified = entry.etag, entry.last_modified
+    if task.expected_checksum:
+        # 摘要命中或已由_cached_file_matches比对过
+        task.actual_checksum = task.expected_checksum
+        task.checksum_verified = True
+    elif entry.digest:
+        task.checksum_algorithm = entry.checksum_algorithm
+        task.actual_checksum = entry.digest
+    task.status = DownloadStatus.COMPLETED
+    task.end_time = time.time()
+    task.error = None
+    logger.info(f"任务{task.id}复用已下载的文件{entry.file_path}({task.cache_hit}, {method})")
+
+def _record_cached_download(task: DownloadTask):
+    """下载完成后记入缓存索引，没有可用于确认的ETag/Last-Modified或摘要时不记录"""
+    cache = download_manager.cache
+    if not cache.enabled or not task.file_path:
+        return
+    if not (task.etag or task.last_modified or task.actual_checksum):
+        return
+    cache.record(_cache_entry_for(task))
+
+def _cache_entry_for(task: DownloadTask) -> CacheEntry:
+    """已完成任务的文件描述"""
+    stat = os.stat(task.file_path)
+    return CacheEntry(
+        url_key=_normalize_url(task.url),
+        url=task.url,
+        file_path=task.file_path,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        etag=task.etag,
+        last_modified=task.last_modified,
+        checksum_algorithm=getattr(task.checksum_algorithm, 'value', task.checksum_algorithm) if task.actual_checksum else None,
+        digest=task.actual_checksum
+    )
+
+def _circuit_host(task: DownloadTask) -> Optional[str]:
+    """熔断按主机统计；有镜像的任务失败不能归因到单个主机，不参与熔断"""
+    if task.mirrors:
+        return None
+    parsed = urllib.parse.urlparse(task.url)
+    if not parsed.hostname:
+        return None
+    try:
+        port = parsed.port or DEFAULT_PORTS.get(parsed.scheme)
+    except ValueError:
+        port = None
+    return f"{parsed.hostname}:{port}" if port else parsed.hostname
+
+def _withdraw_task(task_id: str):
+    """把暂停或取消的任务移出下载队列和重试等待，O(1)"""
+    download_manager.download_queue.remove(task_id)
+    download_manager.retry_scheduler.cancel(task_id)
+    task = download_manager.download_tasks.get(task_id)
+    if task is not None:
+        task.next_retry_at = None
+
+def _schedule_retry(task: DownloadTask, delay: float):
+    """任务保持排队状态，delay秒后由重试调度器重新入队"""
+    task.status = DownloadStatus.QUEUED
+    task.next_retry_at = time.time() + delay
+    download_manager.retry_scheduler.schedule(task.id, delay)
+    download_manager.persistence.mark_dirty(task.id)
+
+async def _requeue_retry(task_id: str):
+    """重试等待到期，仍在等待的任务重新入队"""
+    task = download_manager.download_tasks.get(task_id)
+    if task is None or task.status != DownloadStatus.QUEUED:
+        return
+    task.next_retry_at = None
+    await download_manager.download_queue.put(task_id, task.priority)
+    await _notify_task_update(task_id)
+
+async def _schedule_task(task: DownloadTask):
+    """任务排队下载；同一URL已有进行中的下载时附着为跟随任务，不再重复传输"""
+    _detach_follower(task)
+    download_manager.retry_scheduler.cancel(task.id)
+    task.next_retry_at = None
+    url_key = _normalize_url(task.url)
+    leader = _inflight_leader(url_key, task)
+    if leader is None:
+        download_manager.inflight.register(url_key, task.id)
+        task.status = DownloadStatus.QUEUED
+        await download_manager.download_queue.put(task.id, task.priority)
+        return
+    
+    _attach_follower(leader, task)
+    if leader.status == DownloadStatus.PAUSED:
+        # 恢复跟随任务即恢复共享的传输
+        leader.status = DownloadStatus.QUEUED
+        await download_manager.download_queue.put(leader.id, leader.priority)
+        await _notify_task_update(leader.id)
+    logger.info(f"任务{task.id}与进行中的任务{leader.id}下载同一URL，合并为一次传输")
+
+def _inflight_leader(url_key: str, task: DownloadTask) -> Optional[DownloadTask]:
+    """返回该URL正在排队、下载或暂停中的主任务"""
+    leader_id = download_manager.inflight.leader_for(url_key)
+    if leader_id is None or leader_id == task.id:
+        return None
+    leader = download_manager.download_tasks.get(leader_id)
+    if leader is None or leader.status not in (
+        DownloadStatus.QUEUED, DownloadStatus.DOWNLOADING, DownloadStatus.PAUSED
+    ):
+        return None
+    return leader
+
+def _attach_follower(leader: DownloadTask, task: DownloadTask):
+    task.leader_id = leader.id
+    download_manager.inflight.attach(leader.id, task.id)
+    _mirror_leader(leader, task)
+
+def _detach_follower(task: DownloadTask):
+    if task.leader_id:
+        download_manager.inflight.detach(task.id)
+        task.leader_id = None
+
+def _mirror_leader(leader: DownloadTask, follower: DownloadTask):
+    """跟随任务共享主任务的状态和进度"""
+    follower.status = leader.status
+    follower.progress = leader.progress
+    follower.downloaded_size = leader.downloaded_size
+    follower.total_size = leader.total_size
+    follower.download_speed = leader.download_speed
+    follower.start_time = leader.start_time
+    # 状态和开始时间是任务索引的排序键
+    download_manager.download_tasks.reindex(follower.id)
+
+async def _complete_followers(leader: DownloadTask, config: ConfigSnapshot):
+    """主任务完成后，跟随任务以链接方式得到各自的文件"""
+    follower_ids = download_manager.inflight.release(leader.id)
+    if not follower_ids:
+        return
+    entry = _cache_entry_for(leader)
+    download_dir = Path(config.download_dir)
+    for follower_id in follower_ids:
+        follower = download_manager.download_tasks.get(follower_id)
+        if follower is None:
+            continue
+        follower.leader_id = None
+        follower.cache_hit = "coalesced"
+        try:
+            algorithm = getattr(follower.checksum_algorithm, 'value', follower.checksum_algorithm)
+            if follower.expected_checksum and not await _cached_file_matches(entry, algorithm, follower.expected_checksum):
+                raise ChecksumMismatch(f"{algorithm}校验失败: 期望{follower.expected_checksum}")
+            file_path = download_dir / (follower.filename or extract_filename_from_url(follower.url))
+            await _complete_from_cache(follower, entry, file_path.with_suffix('.part'), file_path)
+            follower.category = follower.category or leader.category
+            await _categorize_file(follower, config)
+        except Exception as e:
+            follower.status = DownloadStatus.FAILED
+            follower.error = str(e)
+            follower.end_time = time.time()
+            logger.error(f"跟随任务{follower_id}获取文件失败: {str(e)}")
+        else:
+            download_manager.history_tasks[follower_id] = follower
+            download_manager.download_tasks.pop(follower_id, None)
+        await _notify_task_update(follower_id)
+
+async def _fail_followers(leader: DownloadTask):
+    """共享的传输最终失败，跟随任务随之失败，可单独恢复"""
+    for follower_id in download_manager.inflight.release(leader.id):
+        follower = download_manager.download_tasks.get(follower_id)
+        if follower is None:
+            continue
+        follower.leader_id = None
+        follower.status = DownloadStatus.FAILED
+        follower.error = leader.error
+        follower.end_time = time.time()
+        await _notify_task_update(follower_id)
+
+async def _promote_follower(leader: DownloadTask):
+    """主任务被取消时由最早的跟随任务接替传输"""
+    follower_ids = [
+        follower_id for follower_id in download_manager.inflight.release(leader.id)
+        if follower_id in download_manager.download_tasks
+    ]
+    if not follower_ids:
+        return
+    new_leader = download_manager.download_tasks[follower_ids[0]]
+    new_leader.leader_id = None
+    download_manager.inflight.register(_normalize_url(new_leader.url), new_leader.id)
+    for follower_id in follower_ids[1:]:
+        _attach_follower(new_leader, download_manager.download_tasks[follower_id])
+    new_leader.status = DownloadStatus.QUEUED
+    await download_manager.download_queue.put(new_leader.id, new_leader.priority)
+    await _notify_task_update(new_leader.id)
+    logger.info(f"任务{leader.id}已取消，由跟随任务{new_leader.id}接替下载")
+
+def _content_sniffer(task: DownloadTask, filename: str, config: ConfigSnapshot) -> Optional[ContentSniffer]:
+    """按file_recognition_method创建内容识别器，不需要检查文件头时返回None"""
+    method = getattr(config, 'file_recognition_method', None) or "extension"
+    if method == "extension" or task.category:
+        return None
+    if method == "extension_and_content" and category_from_extension(filename):
+        return None
+    
+    def on_detect(detected: Optional[str]):
+        task.category = resolve_category(filename, detected, method)
+        task.file_type = file_type_for_category(task.category).value
+        download_manager.persistence.mark_dirty(task.id)
+    
+    return ContentSniffer(on_detect)
+
+async def _categorize_file(task: DownloadTask, config: ConfigSnapshot):
+    """根据配置分类文件，下载中已按内容识别出的分类优先"""
+    if not task.file_path:
         return
         
     file_path = Path(task.file_path)
-    ext = file_path.suffix.lower()
-    category = DEFAULT_CATEGORY
+    if not task.category:
+        method = getattr(config, 'file_recognition_method', None) or "extension"
+        task.category = resolve_category(file_path.name, None, method)
+    task.file_type = file_type_for_category(task.category).value
+    if not config.category_subdirs:
+        return
     
-    for cat, exts in FILE_CATEGORIES.items():
-        if ext in exts:
-            category = cat
-            break
-            
-    category_dir = file_path.parent / category
+    category_dir = file_path.parent / task.category
     category_dir.mkdir(exist_ok=True)
     
     new_path = category_dir / file_path.name
-    shutil.move(str(file_path), str(new_path))
+    if new_path.exists() and os.path.samefile(file_path, new_path):
+        # 从缓存硬链接而来，目标位置已是同一文件
+        file_path.unlink()
+    else:
+        shutil.move(str(file_path), str(new_path))
     task.file_path = str(new_path)
 
 def extract_filename_from_url(url: str) -> str:
@@ -362,171 +1351,212 @@ def extract_filename_from_url(url: str) -> str:
     except:
         return "unnamed"
 
+def _progress_snapshot(task_id: str) -> Optional[Dict[str, Any]]:
+    """节拍器推送的进度字段"""
+    task = download_manager.download_tasks.get(task_id)
+    if not task:
+        return None
+    return {
+        "progress": task.progress,
+        "speed": task.download_speed,
+        "download_speed": task.download_speed,
+        "downloaded_size": task.downloaded_size,
+        "total_size": task.total_size
+    }
+
+def _task_payload(task: DownloadTask) -> Dict[str, Any]:
+    """任务状态变化时推送的完整字段"""
+    payload = {
+        "task_id": task.id,
+        "status": getattr(task.status, 'value', task.status),
+        "progress": task.progress,
+        "speed": task.download_speed,
+        "download_speed": task.download_speed,
+        "downloaded_size": task.downloaded_size,
+        "total_size": task.total_size
+    }
+    
+    # 转换时间字段
+    if task.start_time:
+        payload["start_time"] = datetime.fromtimestamp(task.start_time).isoformat()
+    if task.end_time:
+        payload["end_time"] = datetime.fromtimestamp(task.end_time).isoformat()
+    return payload
+
+def _touch_task_progress(task_id: str):
+    """下载循环中标记进度变化，由节拍器批量推送"""
+    download_manager.persistence.mark_dirty(task_id)
+    if download_manager.progress_ticker is not None:
+        download_manager.progress_ticker.touch(task_id)
+
+def _download_summary() -> Dict[str, Any]:
+    """汇总订阅推送的全局统计"""
+    status_counts: Dict[str, int] = {}
+    total_speed = 0
+    for task in download_manager.download_tasks.values():
+        task_status = getattr(task.status, 'value', task.status)
+        status_counts[task_status] = status_counts.get(task_status, 0) + 1
+        if task_status == DownloadStatus.DOWNLOADING.value:
+            total_speed += task.download_speed
+    return {
+        "active": len(download_manager.download_tasks),
+        "history": download_manager.history_tasks.total,
+        "statuses": status_counts,
+        "download_speed": total_speed,
+        "queued": download_manager.download_queue.qsize() if download_manager.download_queue else 0
+    }
+
+async def _publish_progress(deltas: List[Dict[str, Any]], timestamp: float):
+    """节拍器回调：按订阅推送进度增量和汇总"""
+    await websocket_manager.publish_progress_batch(deltas, timestamp)
+    if websocket_manager.has_aggregate_subscribers:
+        await websocket_manager.publish_summary(_download_summary())
+
 async def _notify_task_update(task_id: str):
-    """发送WebSocket通知，限制推送频率"""
+    """任务状态变化时立即发送WebSocket通知"""
     task = download_manager.download_tasks.get(task_id) or download_manager.history_tasks.get(task_id)
     if not task:
         return
-        
-    current_time = time.time()
-    last_notify = download_manager._last_notify_time.get(task_id, 0)
-    
-    # 状态变化(如完成/失败)立即通知，否则检查间隔
-    status_changed = (
-        task.status in (DownloadStatus.COMPLETED, DownloadStatus.FAILED, DownloadStatus.CANCELLED) or
-        (task_id in download_manager._last_notify_time and 
-         task.status != download_manager.download_tasks.get(task_id, task).status)
-    )
+    download_manager.download_tasks.reindex(task_id)
+    download_manager.persistence.mark_dirty(task_id)
+    
+    # 跟随任务与主任务同步状态
+    for follower_id in list(download_manager.inflight.followers(task_id)):
+        follower = download_manager.download_tasks.get(follower_id)
+        if follower is not None:
+            _mirror_leader(task, follower)
+            await _notify_task_update(follower_id)
     
-    if status_changed or current_time - last_notify >= download_manager._notify_interval:
-        logger.info(f"Sending WebSocket update for task {task_id}: status={task.status}, progress={task.progress}, speed={getattr(task, 'download_speed', 0)}")
-        try:
-            # 准备payload数据
-            payload = {
-                "task_id": task_id,
-                "status": str(task.status),
-                "progress": task.progress,
-                "speed": getattr(task, 'download_speed', 0),
-                "download_speed": getattr(task, 'download_speed', 0)
-            }
-            
-            # 转换datetime字段
-            if task.start_time:
-                payload["start_time"] = task.start_time.isoformat()
-            if task.end_time:
-                payload["end_time"] = task.end_time.isoformat()
-                
-            await websocket_manager.broadcast({
-                "type": "downloads",
-                "payload": payload
-            })
-            
-            # 更新最后通知时间
-            download_manager._last_notify_time[task_id] = current_time
-        except Exception as e:
-            logger.error(f"Failed to send WebSocket update for task {task_id}: {str(e)}")
-
-def _convert_datetime(obj):
-    """递归转换datetime对象为字符串"""
-    if isinstance(obj, dict):
-        return {k: _convert_datetime(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [_convert_datetime(v) for v in obj]
-    elif isinstance(obj, datetime):
-        return obj.isoformat()
-    return obj
-
-async def _save_active_tasks(db: Session):
-    """保存活跃任务到数据库"""
     try:
-        config_manager = ConfigManager(db)
-        tasks_data = {
-            k: _convert_datetime(v.dict()) 
-            for k, v in download_manager.download_tasks.items()
-        }
-        config_manager.set("active_download_tasks", tasks_data, "当前活跃下载任务")
-        logger.info(f"成功保存{len(tasks_data)}个活跃任务")
+        payload = _task_payload(task)
+        await websocket_manager.publish_task_update(
+            {"type": "downloads", "payload": payload},
+            task_id,
+            payload["status"]
+        )
+        
+        ticker = download_manager.progress_ticker
+        if ticker is not None:
+            if task_id in download_manager.download_tasks:
+                ticker.remember(task_id, payload)
+            else:
+                ticker.forget(task_id)
     except Exception as e:
-        logger.error(f"保存活跃任务失败: {str(e)}")
+        sampled_logger.error("websocket", "Failed to send WebSocket update for task %s: %s", task_id, e)
+
+def _resolve_task_row(task_id: str):
+    """返回任务及其是否已归档，供持久化层使用"""
+    task = download_manager.download_tasks.get(task_id)
+    if task is not None:
+        return task, False
+    task = download_manager.history_tasks.get(task_id)
+    if task is not None:
+        return task, True
+    return None
 
-async def _save_history(db: Session):
-    """保存历史记录到数据库"""
+async def _flush_task_state(db: Session):
+    """将变更过的任务批量写入数据库"""
     try:
-        config_manager = ConfigManager(db)
-        history_data = {k: v.dict() for k, v in download_manager.history_tasks.items()}
-        config_manager.set("download_history", history_data, "下载历史记录")
-        logger.info(f"成功保存{len(history_data)}条历史记录")
+        count = download_manager.persistence.flush(db, _resolve_task_row)
+        if count:
+            logger.debug(f"成功保存{count}个变更任务")
     except Exception as e:
-        logger.error(f"保存历史记录失败: {str(e)}")
+        logger.error(f"保存任务状态失败: {str(e)}")
+    
+    # 已落库的历史任务才能移出内存
+    history = download_manager.history_tasks
+    history.trim(download_manager.persistence.is_dirty)
+    try:
+        history.enforce_retention(db)
+    except Exception as e:
+        logger.error(f"清理历史记录失败: {str(e)}")
 
 async def _load_active_tasks(db: Session):
     """从数据库加载活跃任务"""
     try:
-        config_manager = ConfigManager(db)
-        data = config_manager.get("active_download_tasks", {})
-        loaded_count = 0
         # 清空现有任务避免重复
         download_manager.download_tasks.clear()
         download_manager.task_locks.clear()
         
-        for task_id, task_data in data.items():
-            try:
-                # 确保task_data是字典且包含必要字段
-                if not isinstance(task_data, dict):
-                    logger.warning(f"任务{task_id}数据格式无效: {type(task_data)}")
-                    continue
-                    
-                # 转换数据为DownloadTask
-                logger.debug(f"正在加载任务{task_id}数据: {task_data}")
-                logger.debug(f"DownloadTask模型字段: {DownloadTask.__fields__.keys()}")
-                logger.debug(f"任务数据字段: {task_data.keys()}")
-                
-                # 检查缺失字段
-                missing_fields = set(DownloadTask.__fields__.keys()) - set(task_data.keys())
-                if missing_fields:
-                    logger.warning(f"任务{task_id}缺失字段: {missing_fields}")
-                    # 为缺失字段设置默认值
-                    for field in missing_fields:
-                        task_data[field] = None
-                
-                # 转换时间字段
-                if 'start_time' in task_data and isinstance(task_data['start_time'], str):
-                    try:
-                        task_data['start_time'] = datetime.fromisoformat(task_data['start_time']).timestamp()
-                    except:
-                        task_data['start_time'] = None
-                
-                if 'end_time' in task_data and isinstance(task_data['end_time'], str):
-                    try:
-                        task_data['end_time'] = datetime.fromisoformat(task_data['end_time']).timestamp()
-                    except:
-                        task_data['end_time'] = None
-                
-                task = DownloadTask(**task_data)
-                download_manager.download_tasks[task_id] = task
-                download_manager.task_locks[task_id] = asyncio.Lock()
-                loaded_count += 1
-                logger.debug(f"成功加载任务{task_id}: {task}")
-                logger.debug(f"当前download_tasks内容: {download_manager.download_tasks}")
-            except Exception as e:
-                logger.error(f"加载任务{task_id}失败: {str(e)}")
-                logger.debug(f"失败的任务数据: {task_data}")
-                logger.debug(f"DownloadTask模型字段: {DownloadTask.__fields__.keys()}")
-                
-        logger.info(f"成功加载{loaded_count}/{len(data)}个活跃任务")
-        if loaded_count != len(data):
-            logger.warning(f"有{len(data)-loaded_count}个任务加载失败")
+        for task in download_manager.persistence.load(db, archived=False):
+            download_manager.download_tasks[task.id] = task
+            download_manager.task_locks[task.id] = asyncio.Lock()
+        logger.info(f"成功加载{len(download_manager.download_tasks)}个活跃任务")
     except Exception as e:
         logger.error(f"加载活跃任务失败: {str(e)}")
 
+async def _resume_interrupted_tasks():
+    """根据进度日志恢复上次运行中断的任务并重新入队
+
+    先恢复实际传输的主任务，再把跟随任务附着到仍在进行的主任务上
+    """
+    tasks = sorted(download_manager.download_tasks.items(), key=lambda item: item[1].leader_id is not None)
+    for task_id, task in tasks:
+        if task.temp_file and journal_path(task.temp_file).exists():
+            try:
+                journal = await ProgressJournal(Path(task.temp_file)).load()
+                task.retry_count = max(task.retry_count, int(journal.state.get("retry_count", 0)))
+                task.downloaded_size = journal.completed_bytes
+                if journal.total_size:
+                    task.total_size = journal.total_size
+                    task.progress = int(journal.completed_bytes / journal.total_size * 100)
+            except Exception as e:
+                logger.error(f"读取任务{task_id}进度日志失败: {str(e)}")
+        
+        if task.status == DownloadStatus.QUEUED and task.next_retry_at:
+            # 上次运行时处于重试等待的任务，按剩余等待时间重新定时
+            download_manager.inflight.register(_normalize_url(task.url), task_id)
+            _schedule_retry(task, max(0.0, task.next_retry_at - time.time()))
+        elif task.status in (DownloadStatus.QUEUED, DownloadStatus.DOWNLOADING):
+            await _schedule_task(task)
+            download_manager.download_tasks.reindex(task_id)
+            download_manager.persistence.mark_dirty(task_id)
+        elif task.status == DownloadStatus.PAUSED:
+            url_key = _normalize_url(task.url)
+            leader = _inflight_leader(url_key, task) if task.leader_id else None
+            if leader is not None:
+                _attach_follower(leader, task)
+            else:
+                task.leader_id = None
+                download_manager.inflight.register(url_key, task_id)
+        else:
+            task.leader_id = None
+
 async def _load_history(db: Session):
-    """从数据库加载历史记录"""
+    """从数据库加载最近的历史记录，更早的历史按需分页查询"""
     try:
-        config_manager = ConfigManager(db)
-        data = config_manager.get("download_history", {})
-        download_manager.history_tasks.update({k: DownloadTask(**v) for k, v in data.items()})
-        logger.info(f"成功加载{len(data)}条历史记录")
+        history = download_manager.history_tasks
+        history.load_recent(db)
+        history.enforce_retention(db)
+        logger.info(f"成功加载{len(history)}条最近历史记录(共{history.total}条)")
     except Exception as e:
         logger.error(f"加载历史记录失败: {str(e)}")
 
 async def _save_task_state_periodically(db: Session = Depends(get_db)):
-    """定期保存任务状态"""
+    """定期保存变更过的任务状态"""
     while True:
-        await asyncio.sleep(60)
-        await _save_active_tasks(db)
+        await asyncio.sleep(settings.task_flush_interval)
+        await _flush_task_state(db)
 
 # 导出接口
 __all__ = [
     'init_download_manager',
     'cleanup_resources',
     'get_download_tasks',
+    'get_history_tasks',
     'get_download_task',
     'get_task_files',
     'resume_download',
     'pause_download',
+    'set_task_priority',
     'cancel_download',
     'create_download_task',
+    'create_download_tasks_bulk',
     'process_download_queue',
+    'apply_runtime_config',
+    'get_download_stats',
+    'get_buffer_stats',
+    'shutdown_download_manager',
     'FILE_CATEGORIES',
     'DEFAULT_CATEGORY'
 ]
@@ -1,7 +1,7 @@
 import logging
 import asyncio
 from fastapi import FastAPI
-from app.core.download_manager import init_download_manager, cleanup_resources
+from app.core.download_manager import init_download_manager, cleanup_resources, shutdown_download_manager
 from app.utils.logger import setup_logger
 
 # 初始化日志
@@ -12,6 +12,10 @@ async def startup_event(app: FastAPI):
     """应用启动时执行的事件"""
     logger.info("应用启动中...")
     
+    # 确保数据表存在
+    from app.db.init_db import init_db
+    init_db()
+    
     # 初始化下载管理器
     await init_download_manager()
     
@@ -21,12 +25,6 @@ async def startup_event(app: FastAPI):
     from app.core.download_manager import load_tasks_on_startup
     await load_tasks_on_startup(db)
     
-    # 用当前事件循环启动下载队列处理器，避免loop冲突
-    import asyncio
-    from app.core.download_manager import process_download_queue
-    loop = asyncio.get_running_loop()
-    loop.create_task(process_download_queue())
-    
     logger.info("应用启动完成")
 
 
@@ -34,6 +32,9 @@ async def shutdown_event(app: FastAPI):
     """应用关闭时执行的事件"""
     logger.info("应用关闭中...")
     
+    # 停止下载工作池
+    await shutdown_download_manager()
+    
     # 清理资源
     from app.db.session import get_db
     db = next(get_db())
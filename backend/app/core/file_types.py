@@ -0,0 +1,154 @@
+"""
+文件类型识别模块
+扩展名分类使用预先构建的扩展名->分类映射，查找为O(1)；
+内容识别在下载流经过时检查文件开头的魔数，无需重新打开或读取文件
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.schemas.download import FileType
+
+# 文件分类常量
+FILE_CATEGORIES = {
+    "video": [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm"],
+    "audio": [".mp3", ".wav", ".flac", ".aac", ".ogg"],
+    "image": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"],
+    "document": [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt"],
+    "archive": [".zip", ".rar", ".7z", ".tar", ".gz"],
+    "executable": [".exe", ".msi", ".dmg", ".pkg", ".deb"],
+    "other": []
+}
+
+DEFAULT_CATEGORY = "other"
+
+EXTENSION_CATEGORIES: Dict[str, str] = {
+    ext: category
+    for category, exts in FILE_CATEGORIES.items()
+    for ext in exts
+}
+
+# 分类到FileType的映射，没有对应类型的分类归为other
+CATEGORY_FILE_TYPES: Dict[str, FileType] = {
+    "video": FileType.VIDEO,
+    "audio": FileType.AUDIO,
+    "image": FileType.IMAGE,
+    "document": FileType.DOCUMENT,
+    "archive": FileType.ARCHIVE
+}
+
+# 魔数签名: (偏移, 字节, 分类)，按顺序匹配
+MAGIC_SIGNATURES: List[Tuple[int, bytes, str]] = [
+    (0, b"%PDF-", "document"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "document"),  # OLE复合文档(doc/xls/ppt)
+    (0, b"\x89PNG\r\n\x1a\n", "image"),
+    (0, b"\xff\xd8\xff", "image"),
+    (0, b"GIF87a", "image"),
+    (0, b"GIF89a", "image"),
+    (0, b"BM", "image"),
+    (8, b"WEBP", "image"),
+    (4, b"ftyp", "video"),  # MP4/MOV
+    (0, b"\x1a\x45\xdf\xa3", "video"),  # MKV/WebM
+    (8, b"AVI ", "video"),
+    (0, b"FLV", "video"),
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "video"),  # ASF/WMV
+    (8, b"WAVE", "audio"),
+    (0, b"ID3", "audio"),
+    (0, b"fLaC", "audio"),
+    (0, b"OggS", "audio"),
+    (0, b"\xff\xfb", "audio"),
+    (0, b"\xff\xf3", "audio"),
+    (0, b"\xff\xf2", "audio"),
+    (0, b"\xff\xf1", "audio"),  # AAC ADTS
+    (0, b"\xff\xf9", "audio"),
+    (0, b"PK\x03\x04", "archive"),
+    (0, b"Rar!\x1a\x07", "archive"),
+    (0, b"7z\xbc\xaf\x27\x1c", "archive"),
+    (0, b"\x1f\x8b", "archive"),
+    (0, b"BZh", "archive"),
+    (0, b"\xfd7zXZ\x00", "archive"),
+    (257, b"ustar", "archive"),
+    (0, b"!<arch>\ndebian", "executable"),
+    (0, b"MZ", "executable"),
+    (0, b"\x7fELF", "executable"),
+]
+
+# 识别所需的最大文件头长度
+SNIFF_SIZE = max(offset + len(magic) for offset, magic, _ in MAGIC_SIGNATURES)
+
+
+def category_from_extension(filename: Optional[str]) -> Optional[str]:
+    """按扩展名返回分类，未知扩展名返回None"""
+    if not filename or "." not in filename:
+        return None
+    return EXTENSION_CATEGORIES.get("." + filename.rsplit(".", 1)[-1].lower())
+
+
+def sniff_category(head: bytes) -> Optional[str]:
+    """按文件头魔数返回分类，无法识别时返回None"""
+    for offset, magic, category in MAGIC_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return category
+    return None
+
+
+def resolve_category(filename: Optional[str], detected: Optional[str], method: str) -> str:
+    """按file_recognition_method合并扩展名与内容识别结果
+
+    - extension: 只看扩展名
+    - content: 内容识别优先，无法识别时退回扩展名
+    - extension_and_content: 扩展名优先，未知扩展名时使用内容识别
+    """
+    by_extension = category_from_extension(filename)
+    if method == "content":
+        category = detected or by_extension
+    elif method == "extension_and_content":
+        category = by_extension or detected
+    else:
+        category = by_extension
+    return category or DEFAULT_CATEGORY
+
+
+def file_type_for_category(category: Optional[str]) -> FileType:
+    return CATEGORY_FILE_TYPES.get(category, FileType.OTHER)
+
+
+class ContentSniffer:
+    """收集流经的文件开头数据，够长或流结束时识别一次
+
+    Args:
+        on_detect: 识别完成时以分类(无法识别为None)调用
+    """
+
+    def __init__(self, on_detect: Callable[[Optional[str]], None]):
+        self._on_detect = on_detect
+        self._head = bytearray()
+        self.done = False
+
+    def feed(self, offset: int, data: bytes):
+        """传入位于offset的数据，只使用紧接已收集部分的数据"""
+        if self.done or offset != len(self._head):
+            return
+        self._head += data[:SNIFF_SIZE - len(self._head)]
+        if len(self._head) >= SNIFF_SIZE:
+            self.finish()
+
+    def finish(self):
+        """数据流结束时调用，文件不足SNIFF_SIZE时用已有数据识别"""
+        if self.done:
+            return
+        self.done = True
+        if self._head:
+            self._on_detect(sniff_category(bytes(self._head)))
+
+
+__all__ = [
+    'FILE_CATEGORIES',
+    'DEFAULT_CATEGORY',
+    'EXTENSION_CATEGORIES',
+    'SNIFF_SIZE',
+    'ContentSniffer',
+    'category_from_extension',
+    'sniff_category',
+    'resolve_category',
+    'file_type_for_category'
+]
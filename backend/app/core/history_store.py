@@ -0,0 +1,244 @@
+"""
+下载历史分层存储模块
+最近完成的任务保留在内存热集合中(有上限)，
+更早的历史只存在于download_tasks表(archived=True)，
+按状态、分类和时间范围分页查询，并按history_max_count/save_history淘汰
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.download import DownloadTask as DownloadTaskModel
+from app.schemas.download import DownloadTask
+from app.core.task_persistence import payload_to_task
+from app.core.task_store import encode_cursor, decode_cursor
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class HistoryStore:
+    """历史任务存储：内存热集合 + 数据库冷数据
+
+    热集合按归档先后排列，超出上限时淘汰最早归档的任务；
+    淘汰只在任务已写入数据库后进行(见trim)，避免丢失未保存的变更
+    """
+
+    def __init__(self, hot_size: int = 100, session_factory: Callable[[], Session] = SessionLocal):
+        self._hot: "OrderedDict[str, DownloadTask]" = OrderedDict()
+        self._session_factory = session_factory
+        self.hot_size = hot_size
+        self.max_count = hot_size
+        self.enabled = True
+        self.total = 0  # 数据库与内存中的历史任务总数(近似值，用于汇总推送)
+        self.evicted = 0
+
+    def configure(self, hot_size: int, max_count: int, enabled: bool):
+        """按配置调整热集合上限和保留策略"""
+        self.max_count = max(0, max_count or 0)
+        self.hot_size = max(0, min(hot_size, self.max_count))
+        self.enabled = enabled
+
+    # 热集合(字典接口)
+    def __setitem__(self, task_id: str, task: DownloadTask):
+        if task_id not in self._hot:
+            self.total += 1
+        self._hot[task_id] = task
+        self._hot.move_to_end(task_id)
+
+    def __getitem__(self, task_id: str) -> DownloadTask:
+        return self._hot[task_id]
+
+    def __contains__(self, task_id) -> bool:
+        return task_id in self._hot
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._hot)
+
+    def get(self, task_id: str, default=None) -> Optional[DownloadTask]:
+        return self._hot.get(task_id, default)
+
+    def values(self):
+        return self._hot.values()
+
+    def items(self):
+        return self._hot.items()
+
+    def pop(self, task_id: str, default=None) -> Optional[DownloadTask]:
+        return self._hot.pop(task_id, default)
+
+    def clear(self):
+        self._hot.clear()
+        self.total = 0
+
+    def trim(self, is_dirty: Callable[[str], bool]) -> int:
+        """淘汰超出上限的热数据，跳过尚未写入数据库的任务"""
+        evicted = 0
+        if len(self._hot) <= self.hot_size:
+            return evicted
+        for task_id in list(self._hot):
+            if len(self._hot) <= self.hot_size:
+                break
+            if is_dirty(task_id):
+                continue
+            del self._hot[task_id]
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    # 冷数据
+    def lookup(self, task_id: str) -> Optional[DownloadTask]:
+        """按ID查找历史任务，热集合未命中时查询数据库"""
+        task = self._hot.get(task_id)
+        if task is not None:
+            return task
+        db = self._session_factory()
+        try:
+            payload = (
+                db.query(DownloadTaskModel.payload)
+                .filter(DownloadTaskModel.id == task_id, DownloadTaskModel.archived.is_(True))
+                .scalar()
+            )
+            return payload_to_task(payload) if payload else None
+        except Exception as e:
+            logger.error(f"查询历史任务{task_id}失败: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def load_recent(self, db: Session):
+        """启动时只加载最近归档的热数据"""
+        self._hot.clear()
+        self.total = (
+            db.query(func.count(DownloadTaskModel.id))
+            .filter(DownloadTaskModel.archived.is_(True))
+            .scalar() or 0
+        )
+        if self.hot_size <= 0:
+            return
+        rows = (
+            db.query(DownloadTaskModel.id, DownloadTaskModel.payload)
+            .filter(DownloadTaskModel.archived.is_(True))
+            .order_by(DownloadTaskModel.created_at.desc(), DownloadTaskModel.id)
+            .limit(self.hot_size)
+            .all()
+        )
+        # 热集合按从旧到新排列
+        for task_id, payload in reversed(rows):
+            try:
+                self._hot[task_id] = payload_to_task(payload)
+            except Exception as e:
+                logger.error(f"加载历史任务{task_id}失败: {str(e)}")
+
+    def query(
+        self,
+        db: Session,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[DownloadTask], int, Optional[str]]:
+        """分页查询历史任务，按创建时间倒序
+
+        Returns:
+            (本页任务, 符合条件的总数, 下一页游标)
+        """
+        conditions = [DownloadTaskModel.archived.is_(True)]
+        if status:
+            conditions.append(DownloadTaskModel.status == getattr(status, 'value', status))
+        if category:
+            conditions.append(DownloadTaskModel.category == category)
+        if since:
+            conditions.append(DownloadTaskModel.created_at >= since)
+        if until:
+            conditions.append(DownloadTaskModel.created_at < until)
+
+        total = db.query(func.count(DownloadTaskModel.id)).filter(*conditions).scalar() or 0
+
+        query = db.query(DownloadTaskModel.id, DownloadTaskModel.created_at, DownloadTaskModel.payload).filter(*conditions)
+        if cursor:
+            created_at, task_id = decode_cursor(cursor)
+            created_at = datetime.fromisoformat(created_at)
+            query = query.filter(or_(
+                DownloadTaskModel.created_at < created_at,
+                and_(DownloadTaskModel.created_at == created_at, DownloadTaskModel.id > task_id)
+            ))
+        rows = (
+            query.order_by(DownloadTaskModel.created_at.desc(), DownloadTaskModel.id)
+            .offset(offset)
+            .limit(limit + 1)
+            .all()
+        )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_id, last_created, _ = rows[-1]
+            next_cursor = encode_cursor(last_created.isoformat(), last_id)
+
+        tasks = []
+        for task_id, _, payload in rows:
+            try:
+                tasks.append(payload_to_task(payload))
+            except Exception as e:
+                logger.error(f"解析历史任务{task_id}失败: {str(e)}")
+        return tasks, total, next_cursor
+
+    def enforce_retention(self, db: Session) -> int:
+        """按history_max_count/save_history删除超出保留范围的历史记录"""
+        keep = self.max_count if self.enabled else 0
+        if self.total <= keep:
+            return 0
+
+        archived = DownloadTaskModel.archived.is_(True)
+        query = db.query(DownloadTaskModel.id).filter(archived)
+        if keep:
+            kept_ids = (
+                db.query(DownloadTaskModel.id)
+                .filter(archived)
+                .order_by(DownloadTaskModel.created_at.desc(), DownloadTaskModel.id)
+                .limit(keep)
+                .subquery()
+            )
+            query = query.filter(DownloadTaskModel.id.notin_(db.query(kept_ids.c.id)))
+        expired = [task_id for (task_id,) in query]
+
+        if expired:
+            try:
+                db.query(DownloadTaskModel).filter(
+                    DownloadTaskModel.id.in_(expired)
+                ).delete(synchronize_session=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            for task_id in expired:
+                self._hot.pop(task_id, None)
+            logger.info(f"已按保留策略删除{len(expired)}条历史记录")
+        while len(self._hot) > keep:
+            self._hot.popitem(last=False)
+        self.total = db.query(func.count(DownloadTaskModel.id)).filter(archived).scalar() or 0
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hot": len(self._hot),
+            "hot_size": self.hot_size,
+            "total": self.total,
+            "max_count": self.max_count if self.enabled else 0,
+            "evicted": self.evicted
+        }
+
+
+__all__ = ['HistoryStore']
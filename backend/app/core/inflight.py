@@ -0,0 +1,72 @@
+"""
+进行中下载登记模块
+同一规范化URL同时只有一个任务(主任务)实际传输，
+之后提交的相同下载作为跟随任务附着其上，共享进度，
+主任务完成后以链接方式得到各自的文件
+"""
+
+from typing import Dict, List, Optional
+
+
+class InflightRegistry:
+    """规范化URL -> 主任务，主任务 -> 跟随任务(按附着先后)"""
+
+    def __init__(self):
+        self._leaders: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._followers: Dict[str, List[str]] = {}
+        self._leader_of: Dict[str, str] = {}
+
+    def leader_for(self, url_key: str) -> Optional[str]:
+        return self._leaders.get(url_key)
+
+    def leader_of(self, follower_id: str) -> Optional[str]:
+        return self._leader_of.get(follower_id)
+
+    def register(self, url_key: str, leader_id: str):
+        """登记主任务，该URL原先登记的主任务(已结束)被替换"""
+        old = self._leaders.get(url_key)
+        if old is not None and old != leader_id:
+            self._keys.pop(old, None)
+        self._leaders[url_key] = leader_id
+        self._keys[leader_id] = url_key
+
+    def attach(self, leader_id: str, follower_id: str):
+        self._followers.setdefault(leader_id, []).append(follower_id)
+        self._leader_of[follower_id] = leader_id
+
+    def detach(self, follower_id: str) -> Optional[str]:
+        """跟随任务脱离主任务，返回原主任务ID"""
+        leader_id = self._leader_of.pop(follower_id, None)
+        if leader_id is not None:
+            followers = self._followers.get(leader_id, [])
+            if follower_id in followers:
+                followers.remove(follower_id)
+            if not followers:
+                self._followers.pop(leader_id, None)
+        return leader_id
+
+    def followers(self, leader_id: str) -> List[str]:
+        return self._followers.get(leader_id, [])
+
+    def release(self, leader_id: str) -> List[str]:
+        """主任务结束：注销登记并返回(移除)其全部跟随任务"""
+        url_key = self._keys.pop(leader_id, None)
+        if url_key is not None and self._leaders.get(url_key) == leader_id:
+            del self._leaders[url_key]
+        followers = self._followers.pop(leader_id, [])
+        for follower_id in followers:
+            self._leader_of.pop(follower_id, None)
+        return followers
+
+    def clear(self):
+        self._leaders.clear()
+        self._keys.clear()
+        self._followers.clear()
+        self._leader_of.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"transfers": len(self._keys), "followers": len(self._leader_of)}
+
+
+__all__ = ['InflightRegistry']
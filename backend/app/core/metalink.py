@@ -0,0 +1,118 @@
+"""
+Metalink解析模块
+支持Metalink 4(RFC 5854, .meta4)和Metalink 3(.metalink)文档，
+取第一个文件的文件名、大小、摘要和按优先级排列的HTTP(S)镜像URL
+"""
+
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional
+
+from app.core.checksum import SUPPORTED_ALGORITHMS
+
+# Metalink中的摘要类型名 -> 校验算法，按强度从高到低
+HASH_TYPES = {
+    "sha-256": "sha256",
+    "sha256": "sha256",
+    "sha-1": "sha1",
+    "sha1": "sha1",
+    "md5": "md5"
+}
+_ALGORITHM_ORDER = ["sha256", "sha1", "md5"]
+
+
+@dataclass
+class MetalinkFile:
+    name: Optional[str] = None
+    size: Optional[int] = None
+    urls: List[str] = field(default_factory=list)
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def checksum(self) -> Optional[tuple]:
+        """最强的可用摘要 (算法, 十六进制值)"""
+        for algorithm in _ALGORITHM_ORDER:
+            if algorithm in self.hashes and algorithm in SUPPORTED_ALGORITHMS:
+                return algorithm, self.hashes[algorithm]
+        return None
+
+
+def _local(tag: str) -> str:
+    """去掉命名空间"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _children(element, name: str):
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _find(element, *path: str):
+    for name in path:
+        found = _children(element, name)
+        if not found:
+            return None
+        element = found[0]
+    return element
+
+
+def _nested(element, container: str, name: str):
+    """container子元素下名为name的子元素"""
+    parent = _find(element, container)
+    return _children(parent, name) if parent is not None else []
+
+
+def parse_metalink(document: str) -> MetalinkFile:
+    """解析Metalink文档
+
+    Raises:
+        ValueError: 文档格式错误或没有可用的HTTP(S)地址
+    """
+    try:
+        root = ET.fromstring(document)
+    except ET.ParseError as e:
+        raise ValueError(f"Metalink文档格式错误: {str(e)}")
+    if _local(root.tag) != "metalink":
+        raise ValueError("不是Metalink文档")
+
+    # Metalink 4: metalink/file；Metalink 3: metalink/files/file
+    files = _children(root, "file") or _nested(root, "files", "file")
+    if not files:
+        raise ValueError("Metalink文档中没有文件")
+    element = files[0]
+
+    result = MetalinkFile()
+    name = element.get("name")
+    if name:
+        # 只取文件名部分，忽略目录
+        result.name = PurePosixPath(name.replace("\\", "/")).name or None
+    size = _find(element, "size")
+    if size is not None and (size.text or "").strip().isdigit():
+        result.size = int(size.text.strip())
+
+    hashes = _children(element, "hash") + _nested(element, "verification", "hash")
+    for item in hashes:
+        algorithm = HASH_TYPES.get((item.get("type") or "").lower())
+        if algorithm and item.text:
+            result.hashes.setdefault(algorithm, item.text.strip().lower())
+
+    # Metalink 4的priority越小越优先，Metalink 3的preference越大越优先
+    ranked = []
+    for index, item in enumerate(_children(element, "url") + _nested(element, "resources", "url")):
+        url = (item.text or "").strip()
+        if not url.lower().startswith(("http://", "https://")):
+            continue
+        if item.get("priority", "").isdigit():
+            rank = int(item.get("priority"))
+        elif item.get("preference", "").isdigit():
+            rank = 100 - int(item.get("preference"))
+        else:
+            rank = 999999
+        ranked.append((rank, index, url))
+    result.urls = [url for _, _, url in sorted(ranked)]
+    if not result.urls:
+        raise ValueError("Metalink文档中没有可用的HTTP(S)地址")
+    return result
+
+
+__all__ = ['MetalinkFile', 'parse_metalink']
@@ -0,0 +1,180 @@
+"""
+多镜像源选择模块
+同一文件的多个镜像按单连接实测吞吐评分，新区间优先分配给最快且连接未满的镜像；
+明显慢于最快镜像的镜像不再分配新区间，连续出错或内容不一致的镜像被停用
+"""
+
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Any
+
+# 吞吐统计窗口(连接·秒)，超过后统计值减半，使评分跟随近期表现
+RATE_WINDOW = 8.0
+# 至少累计该连接·秒数后才参与快慢比较
+MIN_MEASURE_TIME = 1.0
+
+
+class Mirror:
+    """单个镜像源的状态和统计"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.host = urllib.parse.urlparse(url).hostname or ""
+        self.state = "active"  # active, slow, failed
+        self.active = 0  # 当前连接数
+        self.bytes = 0
+        self.errors = 0  # 连续出错次数
+        self.last_error: Optional[str] = None
+        self._rate_bytes = 0.0
+        self._rate_time = 0.0
+        self._speed = 0.0
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+
+    @property
+    def measured(self) -> bool:
+        return self._rate_time >= MIN_MEASURE_TIME
+
+    @property
+    def rate(self) -> Optional[float]:
+        """单连接吞吐(字节/秒)，测量不足时为None"""
+        return self._rate_bytes / self._rate_time if self.measured else None
+
+    def _record(self, nbytes: int, elapsed: float, now: float):
+        self.bytes += nbytes
+        self._rate_bytes += nbytes
+        self._rate_time += elapsed
+        if self._rate_time > RATE_WINDOW:
+            self._rate_bytes /= 2
+            self._rate_time /= 2
+        self._window_bytes += nbytes
+        if now - self._window_start >= 1.0:
+            self._speed = self._window_bytes / (now - self._window_start)
+            self._window_bytes = 0
+            self._window_start = now
+
+    def speed(self, now: float) -> float:
+        """该镜像所有连接的合计速度(字节/秒)"""
+        return 0.0 if now - self._window_start > 2.0 else self._speed
+
+
+class MirrorLease:
+    """一个连接对镜像的占用，记录两次上报之间的耗时"""
+
+    __slots__ = ("mirror", "_last")
+
+    def __init__(self, mirror: Mirror):
+        self.mirror = mirror
+        self._last = time.monotonic()
+
+
+class MirrorPool:
+    """镜像选择器
+
+    Args:
+        urls: 镜像URL，按优先级排列
+        connections_per_mirror: 单个镜像的连接上限
+        max_errors: 连续出错该次数后停用镜像
+        slow_ratio: 单连接吞吐低于最快镜像该比例时视为慢速
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        connections_per_mirror: int = 4,
+        max_errors: int = 3,
+        slow_ratio: float = 0.25
+    ):
+        self.mirrors = [Mirror(url) for url in dict.fromkeys(urls)]
+        self.connections_per_mirror = max(1, connections_per_mirror)
+        self.max_errors = max(1, max_errors)
+        self.slow_ratio = slow_ratio
+        self.last_error: Optional[BaseException] = None
+
+    def __len__(self) -> int:
+        return len(self.mirrors)
+
+    @property
+    def usable(self) -> List[Mirror]:
+        return [mirror for mirror in self.mirrors if mirror.state != "failed"]
+
+    @property
+    def best_rate(self) -> Optional[float]:
+        rates = [mirror.rate for mirror in self.usable if mirror.rate]
+        return max(rates) if rates else None
+
+    def _preferred(self) -> List[Mirror]:
+        usable = self.usable
+        return [mirror for mirror in usable if mirror.state != "slow"] or usable
+
+    def acquire(self) -> Optional[MirrorLease]:
+        """为新区间选择镜像：未测量的镜像按乐观速度计，按速度/(连接数+1)取最高
+
+        Returns:
+            所选镜像的占用，可用镜像的连接都已满时返回None
+        """
+        candidates = [mirror for mirror in self._preferred() if mirror.active < self.connections_per_mirror]
+        if not candidates:
+            return None
+        optimistic = self.best_rate or 1.0
+        mirror = max(candidates, key=lambda m: (m.rate or optimistic) / (m.active + 1))
+        mirror.active += 1
+        return MirrorLease(mirror)
+
+    def record(self, lease: MirrorLease, nbytes: int):
+        """记录一个连接收到的数据"""
+        now = time.monotonic()
+        lease.mirror._record(nbytes, now - lease._last, now)
+        lease._last = now
+        self._classify()
+
+    def release(self, lease: MirrorLease, error: Optional[BaseException] = None, fatal: bool = False):
+        """连接结束使用镜像；出错时累计错误，达到上限或fatal时停用"""
+        mirror = lease.mirror
+        mirror.active = max(0, mirror.active - 1)
+        if error is None:
+            mirror.errors = 0
+            return
+        self.last_error = error
+        mirror.errors += 1
+        mirror.last_error = str(error) or type(error).__name__
+        if fatal or mirror.errors >= self.max_errors:
+            mirror.state = "failed"
+            self._classify()
+
+    def should_abandon(self, lease: MirrorLease) -> bool:
+        """慢速镜像上的连接在有更快的镜像空闲时放弃当前区间"""
+        if lease.mirror.state != "slow":
+            return False
+        return any(
+            mirror.state == "active" and mirror.active < self.connections_per_mirror
+            for mirror in self.mirrors
+        )
+
+    def _classify(self):
+        best = self.best_rate
+        if not best:
+            return
+        for mirror in self.mirrors:
+            if mirror.state == "failed" or not mirror.measured:
+                continue
+            mirror.state = "slow" if mirror.rate < best * self.slow_ratio else "active"
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": mirror.url,
+                "state": mirror.state,
+                "connections": mirror.active,
+                "downloaded": mirror.bytes,
+                "speed": int(mirror.speed(now)),
+                "connection_speed": int(mirror.rate or 0),
+                "errors": mirror.errors,
+                "last_error": mirror.last_error
+            }
+            for mirror in self.mirrors
+        ]
+
+
+__all__ = ['Mirror', 'MirrorLease', 'MirrorPool']
@@ -0,0 +1,251 @@
+"""
+下载进度日志模块
+每个.part文件旁维护一个只追加的.journal侧车文件，
+记录文件总大小、已完成的字节区间和重试次数等状态，
+按配置的间隔先fsync数据文件再fsync日志，崩溃后可精确续传缺失区间
+"""
+
+import os
+import json
+import time
+import bisect
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+
+
+async def _finish_in_thread(func, *args):
+    """在线程中写日志文件；调用方被取消时先等写入完成再传播取消，
+    避免取消任务后删除的日志又被仍在进行的写入重新创建
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.gather(future, return_exceptions=True)
+        raise
+
+
+class RangeSet:
+    """有序且互不重叠的半开区间集合 [start, end)"""
+
+    def __init__(self, ranges: Optional[List[Tuple[int, int]]] = None):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        for start, end in ranges or []:
+            self.add(start, end)
+
+    def add(self, start: int, end: int):
+        """加入区间并与相邻/重叠区间合并"""
+        if end <= start:
+            return
+        # 找到所有与[start, end]相交或相邻的区间
+        lo = bisect.bisect_left(self._ends, start)
+        hi = bisect.bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def clear(self):
+        self._starts.clear()
+        self._ends.clear()
+
+    @property
+    def covered(self) -> int:
+        """已覆盖的总字节数"""
+        return sum(end - start for start, end in self)
+
+    def contiguous_prefix(self) -> int:
+        """从0开始连续覆盖的字节数"""
+        if self._starts and self._starts[0] == 0:
+            return self._ends[0]
+        return 0
+
+    def missing(self, total_size: int) -> List[Tuple[int, int]]:
+        """[0, total_size)中尚未覆盖的区间"""
+        gaps = []
+        pos = 0
+        for start, end in self:
+            if start >= total_size:
+                break
+            if start > pos:
+                gaps.append((pos, start))
+            pos = max(pos, end)
+        if pos < total_size:
+            gaps.append((pos, total_size))
+        return gaps
+
+
+class ProgressJournal:
+    """单个下载任务的进度日志
+
+    日志每行一条JSON记录：
+    - {"t": "meta", "size": 总大小}
+    - {"t": "r", "s": 起始偏移, "e": 结束偏移}
+    - {"t": "state", ...任务状态}
+    加载时忽略崩溃留下的不完整末行
+    """
+
+    def __init__(self, data_file: Path, fsync_interval: float = 2.0):
+        self.data_file = Path(data_file)
+        self.path = self.data_file.with_name(self.data_file.name + JOURNAL_SUFFIX)
+        self.fsync_interval = fsync_interval
+        self.total_size = 0
+        self.state: Dict[str, Any] = {}
+        self.completed = RangeSet()
+        self._pending = RangeSet()  # 上次检查点之后完成的区间
+        self._pending_lines: List[str] = []
+        self._last_checkpoint = time.monotonic()
+        self._checkpoint_lock = asyncio.Lock()
+        self._record_count = 0
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def completed_bytes(self) -> int:
+        return self.completed.covered
+
+    async def load(self) -> "ProgressJournal":
+        """读取日志，恢复总大小、已完成区间和任务状态"""
+        self.total_size = 0
+        self.state = {}
+        self.completed.clear()
+        self._record_count = 0
+        records = await asyncio.to_thread(self._read_records)
+        for record in records:
+            kind = record.get("t")
+            if kind == "meta":
+                self.total_size = int(record.get("size", 0))
+            elif kind == "r":
+                self.completed.add(int(record["s"]), int(record["e"]))
+            elif kind == "state":
+                self.state.update({k: v for k, v in record.items() if k != "t"})
+        self._record_count = len(records)
+
+        # 记录过多时压缩
+        if self._record_count > len(self.completed) * 2 + 64:
+            await self._rewrite()
+        return self
+
+    def _read_records(self) -> List[Dict[str, Any]]:
+        records = []
+        if not self.path.exists():
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 末行可能在崩溃时写了一半
+                    logger.warning(f"进度日志存在不完整记录，已忽略: {self.path}")
+                    break
+        return records
+
+    async def reset(self, total_size: int = 0, prefix: int = 0):
+        """丢弃已有进度，只保留[0, prefix)并重新开始记录
+
+        日志已恰好是该状态时(如断线重连)不重写文件
+        """
+        expected = [(0, prefix)] if prefix > 0 else []
+        if self.total_size == total_size and list(self.completed) == expected:
+            return
+        self.total_size = total_size
+        self.completed.clear()
+        self.completed.add(0, prefix)
+        self._pending.clear()
+        self._pending_lines.clear()
+        await self._rewrite()
+
+    def record(self, start: int, end: int):
+        """记录一段已写入数据文件的区间(检查点前不落盘)"""
+        self.completed.add(start, end)
+        self._pending.add(start, end)
+
+    def record_state(self, **state):
+        """记录任务状态(重试次数、速度等)"""
+        self.state.update(state)
+        self._pending_lines.append(json.dumps({"t": "state", **state}, separators=(",", ":")))
+
+    async def maybe_checkpoint(self):
+        """距离上次检查点超过fsync_interval时落盘"""
+        if time.monotonic() - self._last_checkpoint >= self.fsync_interval:
+            await self.checkpoint()
+
+    async def checkpoint(self):
+        """先fsync数据文件，再追加并fsync日志，保证日志中的区间已持久化"""
+        async with self._checkpoint_lock:
+            self._last_checkpoint = time.monotonic()
+            lines = [
+                json.dumps({"t": "r", "s": start, "e": end}, separators=(",", ":"))
+                for start, end in self._pending
+            ] + self._pending_lines
+            self._pending = RangeSet()
+            self._pending_lines = []
+            if lines:
+                await _finish_in_thread(self._append_durable, lines)
+                self._record_count += len(lines)
+
+    def _append_durable(self, lines: List[str]):
+        if self.data_file.exists():
+            fd = os.open(self.data_file, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _rewrite(self):
+        """以合并后的区间重写日志(原子替换)"""
+        lines = [json.dumps({"t": "meta", "size": self.total_size}, separators=(",", ":"))]
+        lines += [
+            json.dumps({"t": "r", "s": start, "e": end}, separators=(",", ":"))
+            for start, end in self.completed
+        ]
+        if self.state:
+            lines.append(json.dumps({"t": "state", **self.state}, separators=(",", ":")))
+        # 与检查点互斥，避免追加写到被替换掉的旧文件
+        async with self._checkpoint_lock:
+            await _finish_in_thread(self._replace_durable, lines)
+        self._record_count = len(lines)
+
+    def _replace_durable(self, lines: List[str]):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        """下载完成或取消后删除日志"""
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"删除进度日志失败: {str(e)}")
+
+
+def journal_path(data_file) -> Path:
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.name + JOURNAL_SUFFIX)
+
+
+__all__ = ['RangeSet', 'ProgressJournal', 'journal_path', 'JOURNAL_SUFFIX']
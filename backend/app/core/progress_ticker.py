@@ -0,0 +1,107 @@
+"""
+进度推送节拍器模块
+下载循环只更新内存中的任务计数并标记变更，
+节拍器每个周期把所有变更任务的增量合并成一条downloads_batch消息推送，
+推送开销与周期数相关而不随活跃任务数和分块数增长
+"""
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ProgressTicker:
+    """批量进度推送
+
+    Args:
+        interval: 推送周期(秒)
+        snapshot: 根据任务ID返回需要推送的字段，任务不存在时返回None
+        send: 发送增量的协程函数，参数为(增量列表, 时间戳)
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        snapshot: Callable[[str], Optional[Dict[str, Any]]],
+        send: Callable[[List[Dict[str, Any]], float], Awaitable[None]]
+    ):
+        self.interval = interval
+        self._snapshot = snapshot
+        self._send = send
+        self._changed: Set[str] = set()
+        self._last_sent: Dict[str, Dict[str, Any]] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self.batches = 0
+
+    def touch(self, task_id: str):
+        """标记任务进度已变化，等待下个周期推送"""
+        self._changed.add(task_id)
+
+    def remember(self, task_id: str, payload: Dict[str, Any]):
+        """记录已立即推送的完整状态，作为后续增量的基准"""
+        self._changed.discard(task_id)
+        self._last_sent[task_id] = dict(payload)
+
+    def forget(self, task_id: str):
+        """任务结束后释放基准状态"""
+        self._changed.discard(task_id)
+        self._last_sent.pop(task_id, None)
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """收集变更任务相对上次推送的增量字段"""
+        changed, self._changed = self._changed, set()
+        deltas = []
+        for task_id in changed:
+            payload = self._snapshot(task_id)
+            if payload is None:
+                self._last_sent.pop(task_id, None)
+                continue
+            last = self._last_sent.get(task_id, {})
+            delta = {k: v for k, v in payload.items() if last.get(k) != v}
+            if delta:
+                delta["task_id"] = task_id
+                deltas.append(delta)
+                last.update(payload)
+                self._last_sent[task_id] = last
+        return deltas
+
+    async def tick(self):
+        """推送一个周期内的所有增量"""
+        deltas = self._collect()
+        if not deltas:
+            return
+        self.batches += 1
+        await self._send(deltas, time.time())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"批量推送进度失败: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "interval": self.interval,
+            "pending": len(self._changed),
+            "tracked": len(self._last_sent),
+            "batches": self.batches
+        }
+
+
+__all__ = ['ProgressTicker']
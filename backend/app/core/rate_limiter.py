@@ -0,0 +1,177 @@
+"""
+下载带宽限速模块
+全局 -> 主机 -> 任务 三级令牌桶，在分块读取循环中按实际读到的字节数扣减令牌，
+令牌不足时等待补充，限速值可在运行时通过配置更新调整
+"""
+
+import time
+import asyncio
+from typing import Dict, Optional, Set
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 任务实测速率的统计窗口(秒)
+RATE_WINDOW = 5.0
+
+
+class TokenBucket:
+    """令牌桶，rate为每秒字节数，0表示不限速
+
+    允许令牌透支：先扣减再按欠额计算等待时间，
+    因此单次读取大于桶容量时也能平滑限速
+    """
+
+    def __init__(self, rate: float = 0, burst_seconds: float = 1.0):
+        self.rate = max(float(rate), 0.0)
+        self.burst_seconds = burst_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return self.rate * self.burst_seconds
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        """调整速率，已累积的令牌不超过新容量"""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(float(rate), 0.0)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def reserve(self, nbytes: int, now: Optional[float] = None) -> float:
+        """扣减令牌，返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= nbytes
+        return max(0.0, -self.tokens / self.rate)
+
+
+class BandwidthLimiter:
+    """三级带宽限速器(全局/主机/任务)
+
+    限速值单位为KB/s，0表示该层不限速。
+    主机令牌桶按使用它的任务计数，最后一个任务结束时随之释放
+    """
+
+    def __init__(self, global_rate: int = 0, host_rate: int = 0, task_rate: int = 0):
+        self.global_rate = global_rate
+        self.host_rate = host_rate
+        self.task_rate = task_rate
+        self._global = TokenBucket(global_rate * 1024)
+        self._hosts: Dict[str, TokenBucket] = {}
+        self._tasks: Dict[str, TokenBucket] = {}
+        self._host_users: Dict[str, int] = {}  # 主机: 使用该主机令牌桶的任务数
+        self._task_hosts: Dict[str, Set[str]] = {}  # 任务ID: 任务读取过的主机
+        self._task_meters: Dict[str, list] = {}  # 任务ID: [窗口开始时间, 窗口内字节数, 上一窗口速率(首个窗口为None)]
+        self.throttled_seconds = 0.0
+
+    def configure(
+        self,
+        global_rate: Optional[int] = None,
+        host_rate: Optional[int] = None,
+        task_rate: Optional[int] = None
+    ):
+        """运行时调整各层限速值"""
+        if global_rate is not None and global_rate != self.global_rate:
+            self.global_rate = global_rate
+            self._global.set_rate(global_rate * 1024)
+        if host_rate is not None and host_rate != self.host_rate:
+            self.host_rate = host_rate
+            for bucket in self._hosts.values():
+                bucket.set_rate(host_rate * 1024)
+        if task_rate is not None and task_rate != self.task_rate:
+            self.task_rate = task_rate
+            for bucket in self._tasks.values():
+                bucket.set_rate(task_rate * 1024)
+        logger.info(
+            f"下载限速已更新: 全局={self.global_rate}KB/s, "
+            f"主机={self.host_rate}KB/s, 任务={self.task_rate}KB/s"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.global_rate or self.host_rate or self.task_rate)
+
+    async def consume(self, nbytes: int, host: str, task_id: str):
+        """按读取的字节数扣减各层令牌，必要时等待；不限速时也统计任务的实测速率"""
+        self._meter(task_id, nbytes)
+        if not self.enabled:
+            return
+
+        host_bucket = self._hosts.get(host)
+        if host_bucket is None:
+            host_bucket = self._hosts[host] = TokenBucket(self.host_rate * 1024)
+        task_hosts = self._task_hosts.setdefault(task_id, set())
+        if host not in task_hosts:
+            task_hosts.add(host)
+            self._host_users[host] = self._host_users.get(host, 0) + 1
+        task_bucket = self._tasks.get(task_id)
+        if task_bucket is None:
+            task_bucket = self._tasks[task_id] = TokenBucket(self.task_rate * 1024)
+
+        now = time.monotonic()
+        delay = max(
+            self._global.reserve(nbytes, now),
+            host_bucket.reserve(nbytes, now),
+            task_bucket.reserve(nbytes, now)
+        )
+        if delay > 0:
+            self.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def _meter(self, task_id: str, nbytes: int):
+        now = time.monotonic()
+        meter = self._task_meters.get(task_id)
+        if meter is None:
+            self._task_meters[task_id] = [now, nbytes, None]
+            return
+        meter[1] += nbytes
+        elapsed = now - meter[0]
+        if elapsed >= RATE_WINDOW:
+            meter[:] = [now, 0, meter[1] / elapsed]
+
+    def task_throughput(self, task_id: str) -> float:
+        """任务最近RATE_WINDOW秒左右的实测速率(字节/秒)，没有读取过数据时为0"""
+        meter = self._task_meters.get(task_id)
+        if meter is None:
+            return 0.0
+        elapsed = time.monotonic() - meter[0]
+        if meter[2] is None or elapsed >= RATE_WINDOW:
+            return meter[1] / elapsed if elapsed > 0 else 0.0
+        # 当前窗口不足RATE_WINDOW秒时，剩余部分按上一窗口的速率补足
+        return (meter[1] + meter[2] * (RATE_WINDOW - elapsed)) / RATE_WINDOW
+
+    def release_task(self, task_id: str):
+        """任务结束后释放其令牌桶，主机不再有任务使用时一并释放主机令牌桶"""
+        self._tasks.pop(task_id, None)
+        self._task_meters.pop(task_id, None)
+        for host in self._task_hosts.pop(task_id, ()):
+            users = self._host_users.get(host, 0) - 1
+            if users > 0:
+                self._host_users[host] = users
+            else:
+                self._host_users.pop(host, None)
+                self._hosts.pop(host, None)
+
+    def stats(self) -> Dict[str, float]:
+        """限速器统计信息"""
+        return {
+            "global_rate": self.global_rate,
+            "host_rate": self.host_rate,
+            "task_rate": self.task_rate,
+            "hosts": len(self._hosts),
+            "tasks": len(self._tasks),
+            "throttled_seconds": round(self.throttled_seconds, 3)
+        }
+
+
+__all__ = ['TokenBucket', 'BandwidthLimiter']
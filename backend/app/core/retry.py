@@ -0,0 +1,265 @@
+"""
+下载重试调度模块
+失败任务不再在工作协程中等待，由定时堆在指数退避(带随机抖动)后重新入队；
+按错误类型决定是否重试并遵守Retry-After，
+单个主机连续失败时熔断，熔断期间该主机的任务不占用工作协程
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import aiohttp
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 4xx中属于暂时性错误、可以重试的状态码
+RETRYABLE_CLIENT_STATUSES = {408, 429}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After(秒数或HTTP日期)，返回需等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float, max_delay: float) -> float:
+    """第attempt次重试前的等待时间
+
+    base * 2^(attempt-1)，不超过max_delay；取其一半加上另一半范围内的随机抖动，
+    避免同时失败的任务同时重试
+    """
+    delay = min(max_delay, base * (2 ** max(attempt - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class RetryDecision:
+    """下载失败的分类结果"""
+    retryable: bool = True
+    retry_after: Optional[float] = None  # 服务器通过Retry-After要求的等待时间
+    host_failure: bool = False  # 主机不可达或服务端错误，计入熔断
+
+
+def classify_error(error: BaseException) -> RetryDecision:
+    """4xx(408、429除外)不重试；5xx、网络错误和其他异常重试，
+    其中连接错误、超时和5xx计为主机故障
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+        retry_after = parse_retry_after(error.headers.get("Retry-After")) if error.headers else None
+        if 400 <= status < 500:
+            return RetryDecision(
+                retryable=status in RETRYABLE_CLIENT_STATUSES,
+                retry_after=retry_after,
+                host_failure=status == 429
+            )
+        return RetryDecision(retry_after=retry_after, host_failure=status >= 500)
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return RetryDecision(host_failure=True)
+    return RetryDecision()
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "open_until", "open_time")
+
+    def __init__(self, open_time: float):
+        self.state = "closed"  # closed, open, half_open
+        self.failures = 0  # 连续失败次数
+        self.open_until = 0.0
+        self.open_time = open_time
+
+
+class CircuitBreakers:
+    """按主机的熔断器
+
+    连续threshold次主机故障后熔断open_time秒；到期后放行一个试探任务(半开)，
+    试探成功恢复，失败则熔断时间翻倍(不超过max_open_time)。
+    试探任务在一个熔断周期内没有结果时再放行下一个
+
+    Args:
+        threshold: 触发熔断的连续失败次数
+        open_time: 首次熔断时长(秒)
+        max_open_time: 熔断时长上限(秒)
+    """
+
+    def __init__(self, threshold: int = 5, open_time: float = 60, max_open_time: float = 3600):
+        self.threshold = max(1, threshold)
+        self.base_open_time = open_time
+        self.max_open_time = max(max_open_time, open_time)
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def _circuit(self, host: str) -> _Circuit:
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit(self.base_open_time)
+        return circuit
+
+    def blocked_for(self, host: str) -> float:
+        """主机熔断剩余的秒数，0表示可以下载(熔断到期时本次调用即为试探)"""
+        circuit = self._circuits.get(host)
+        if circuit is None or circuit.state == "closed":
+            return 0.0
+        now = time.monotonic()
+        if now < circuit.open_until:
+            return circuit.open_until - now
+        circuit.state = "half_open"
+        circuit.open_until = now + circuit.open_time
+        logger.info(f"主机 {host} 熔断到期，放行一个试探任务")
+        return 0.0
+
+    def hold(self, host: str, seconds: float):
+        """服务器要求暂停请求(Retry-After)时，该主机的所有任务至少等待seconds秒"""
+        circuit = self._circuit(host)
+        if circuit.state == "closed":
+            circuit.state = "open"
+        circuit.open_until = max(circuit.open_until, time.monotonic() + seconds)
+
+    def record_failure(self, host: str):
+        circuit = self._circuit(host)
+        circuit.failures += 1
+        if circuit.state == "half_open":
+            circuit.open_time = min(circuit.open_time * 2, self.max_open_time)
+        elif circuit.failures < self.threshold or circuit.state == "open":
+            return
+        circuit.state = "open"
+        circuit.open_until = time.monotonic() + circuit.open_time
+        logger.warning(f"主机 {host} 连续失败{circuit.failures}次，熔断{circuit.open_time:g}秒")
+
+    def record_success(self, host: str):
+        circuit = self._circuits.pop(host, None)
+        if circuit is not None and circuit.state != "closed":
+            logger.info(f"主机 {host} 已恢复")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """处于熔断或半开状态的主机"""
+        now = time.monotonic()
+        return {
+            host: {
+                "state": circuit.state,
+                "failures": circuit.failures,
+                "retry_in": round(max(0.0, circuit.open_until - now), 1)
+            }
+            for host, circuit in self._circuits.items()
+            if circuit.state != "closed"
+        }
+
+
+class RetryScheduler:
+    """延迟重新入队的定时堆
+
+    单个后台协程等待堆顶到期，到期的任务交给callback重新入队；
+    同一任务只保留一个定时，取消或改期时旧堆项失效，出堆时跳过
+
+    Args:
+        callback: 到期时调用的协程函数，参数为任务ID
+    """
+
+    def __init__(self, callback: Callable[[str], Awaitable[None]]):
+        self._callback = callback
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}  # task_id: [due, seq, task_id]
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self.fired = 0
+
+    def schedule(self, task_id: str, delay: float):
+        """delay秒后重新入队，已有定时的任务改期"""
+        self.cancel(task_id)
+        entry = [time.monotonic() + max(0.0, delay), next(self._counter), task_id]
+        self._entries[task_id] = entry
+        heapq.heappush(self._heap, entry)
+        if self._wakeup is not None and self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, task_id: str) -> bool:
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        # 失效项过多时重建堆
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+        return True
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self):
+        if self._runner is None:
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+            self._wakeup = None
+
+    def _pop_due(self, now: float) -> List[str]:
+        due = []
+        while self._heap and (self._heap[0][2] is None or self._heap[0][0] <= now):
+            entry = heapq.heappop(self._heap)
+            task_id = entry[2]
+            if task_id is not None:
+                del self._entries[task_id]
+                due.append(task_id)
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            for task_id in self._pop_due(time.monotonic()):
+                self.fired += 1
+                try:
+                    await self._callback(task_id)
+                except Exception as e:
+                    logger.error(f"任务{task_id}重新入队失败: {str(e)}")
+            timeout = max(0.0, self._heap[0][0] - time.monotonic()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        next_due = min((entry[0] for entry in self._entries.values()), default=None)
+        return {
+            "scheduled": len(self._entries),
+            "fired": self.fired,
+            "next_in": round(max(0.0, next_due - time.monotonic()), 1) if next_due is not None else None
+        }
+
+
+__all__ = [
+    'CircuitBreakers',
+    'RetryDecision',
+    'RetryScheduler',
+    'backoff_delay',
+    'classify_error',
+    'parse_retry_after'
+]
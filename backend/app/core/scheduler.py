@@ -0,0 +1,147 @@
+"""
+优先级任务调度模块
+按PriorityLevel出队并带老化机制，避免低优先级任务饿死
+
+老化规则：任务每等待aging_interval秒，有效优先级提升一级。
+由于所有任务以相同速率老化，两任务的先后关系与当前时间无关，
+排序键可固定为 入队时间 - 优先级 * aging_interval，用堆即可O(log n)出队
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Dict, List, Optional
+
+from app.schemas.download import PriorityLevel
+
+PRIORITY_WEIGHTS = {
+    PriorityLevel.LOW.value: 0,
+    PriorityLevel.NORMAL.value: 1,
+    PriorityLevel.HIGH.value: 2
+}
+
+
+def _priority_weight(priority) -> int:
+    value = priority.value if isinstance(priority, PriorityLevel) else priority
+    return PRIORITY_WEIGHTS.get(value, PRIORITY_WEIGHTS[PriorityLevel.NORMAL.value])
+
+
+class PriorityTaskQueue:
+    """带老化的异步优先级队列
+
+    接口与asyncio.Queue保持一致(put/get/qsize/empty)，
+    同一任务ID在队列中只保留一份；调整优先级时使旧堆项失效并压入新项，
+    保留原入队时间，因此不会丢失已累积的等待时长；
+    移除任务同样只使堆项失效，O(1)完成
+    """
+
+    def __init__(self, aging_interval: float = 60.0):
+        self.aging_interval = max(float(aging_interval), 0.001)
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}  # task_id: [key, seq, task_id, priority, enqueued_at]
+        self._counter = itertools.count()
+        self._not_empty = asyncio.Condition()
+
+    def _push(self, task_id: str, priority, enqueued_at: float):
+        key = enqueued_at - _priority_weight(priority) * self.aging_interval
+        entry = [key, next(self._counter), task_id, priority, enqueued_at]
+        self._entries[task_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _invalidate(self, task_id: str) -> Optional[list]:
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            entry[2] = None  # 堆中残留项在出队时跳过
+        return entry
+
+    def _pop(self) -> str:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            task_id = entry[2]
+            if task_id is not None:
+                del self._entries[task_id]
+                return task_id
+        raise asyncio.QueueEmpty()
+
+    async def put(self, task_id: str, priority=PriorityLevel.NORMAL):
+        """入队；任务已在队列中时只更新其优先级"""
+        async with self._not_empty:
+            if task_id in self._entries:
+                self.reprioritize(task_id, priority)
+                return
+            self._push(task_id, priority, time.monotonic())
+            self._not_empty.notify()
+
+    async def put_many(self, items) -> int:
+        """批量入队，只获取一次锁并一次性唤醒等待者
+
+        Args:
+            items: (task_id, priority) 序列
+        Returns:
+            新入队的任务数
+        """
+        added = 0
+        async with self._not_empty:
+            now = time.monotonic()
+            for task_id, priority in items:
+                if task_id in self._entries:
+                    self.reprioritize(task_id, priority)
+                    continue
+                self._push(task_id, priority, now)
+                added += 1
+            if added:
+                self._not_empty.notify(added)
+        return added
+
+    async def get(self) -> str:
+        """取出有效优先级最高的任务，队列为空时等待"""
+        async with self._not_empty:
+            while not self._entries:
+                await self._not_empty.wait()
+            return self._pop()
+
+    def reprioritize(self, task_id: str, priority) -> bool:
+        """调整已排队任务的优先级，不改变其入队时间"""
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return False
+        if _priority_weight(entry[3]) == _priority_weight(priority):
+            return True
+        self._invalidate(task_id)
+        self._push(task_id, priority, entry[4])
+        self._compact()
+        return True
+
+    def remove(self, task_id: str) -> bool:
+        """从队列中移除任务(暂停、取消)，任务不在队列中时返回False"""
+        if self._invalidate(task_id) is None:
+            return False
+        self._compact()
+        return True
+
+    def _compact(self):
+        # 失效项过多时重建堆，避免频繁调整后堆无限膨胀
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def empty(self) -> bool:
+        return not self._entries
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        """按优先级统计排队任务数"""
+        result = {level.value: 0 for level in PriorityLevel}
+        for entry in self._entries.values():
+            priority = entry[3].value if isinstance(entry[3], PriorityLevel) else entry[3]
+            result[priority] = result.get(priority, 0) + 1
+        return result
+
+
+__all__ = ['PriorityTaskQueue', 'PRIORITY_WEIGHTS']
@@ -0,0 +1,375 @@
+"""
+分段多连接下载模块
+探测服务器Range支持后，将文件切分为多个字节区间并行拉取，
+各区间按自身偏移写入同一个.part文件，
+连接提前空闲时拆分预计最晚完成的区间以重新平衡负载；
+有多个镜像时各区间分别从不同镜像拉取，由MirrorPool按实测吞吐分配；
+停滞或断开的连接放弃当前区间，剩余部分退回队列重新连接
+"""
+
+import re
+import asyncio
+import aiohttp
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.buffers import AdaptiveChunkSizer
+from app.core.checksum import StreamingHasher
+from app.core.download_cache import validators_from_headers
+from app.core.disk_writer import DiskWriter, WriterFile
+from app.core.file_types import ContentSniffer
+from app.core.mirrors import MirrorLease, MirrorPool
+from app.core.progress_journal import ProgressJournal
+from app.core.stall import PhaseTimeouts, StallDetector, StallError, open_response
+from app.utils.logger import SampledLogger, setup_logger
+
+logger = setup_logger(__name__)
+# 拆分和重连随连接数成批出现，按URL限频输出
+sampled_logger = SampledLogger(logger)
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class MirrorMismatch(aiohttp.ClientError):
+    """镜像返回的文件与其他镜像不一致"""
+
+
+@dataclass
+class RangeProbe:
+    """Range探测结果"""
+    total_size: int = 0
+    accept_ranges: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+@dataclass
+class Segment:
+    """字节区间 [start, end)，pos为下一个待写入的偏移"""
+    start: int
+    end: int
+    pos: int
+    lease: Optional[MirrorLease] = field(default=None, compare=False, repr=False)  # 正在拉取该区间的镜像连接
+
+    @property
+    def remaining(self) -> int:
+        return max(self.end - self.pos, 0)
+
+    @property
+    def done(self) -> bool:
+        return self.pos >= self.end
+
+
+async def probe_range_support(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: Optional[Dict[str, str]] = None
+) -> RangeProbe:
+    """探测服务器是否支持字节区间请求及文件总大小
+
+    先发送HEAD检查Accept-Ranges/Content-Length，
+    不明确时再用 Range: bytes=0-0 的GET请求确认
+    """
+    headers = dict(headers or {})
+    probe = RangeProbe()
+
+    try:
+        async with session.head(url, headers=headers, allow_redirects=True) as response:
+            if response.status == 200:
+                probe.total_size = int(response.headers.get('content-length', 0) or 0)
+                probe.accept_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+                probe.etag, probe.last_modified = validators_from_headers(response.headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.debug(f"HEAD探测失败 {url}: {str(e)}")
+
+    if probe.accept_ranges and probe.total_size > 0:
+        return probe
+
+    # HEAD不可用或信息不全时，用单字节Range请求确认
+    headers['Range'] = 'bytes=0-0'
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status in (200, 206):
+                probe.etag, probe.last_modified = validators_from_headers(response.headers)
+            if response.status == 206:
+                match = _CONTENT_RANGE_RE.match(response.headers.get('content-range', ''))
+                if match and match.group(3) != '*':
+                    probe.total_size = int(match.group(3))
+                    probe.accept_ranges = True
+            elif response.status == 200:
+                probe.total_size = int(response.headers.get('content-length', 0) or 0)
+                probe.accept_ranges = False
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.debug(f"Range探测失败 {url}: {str(e)}")
+
+    return probe
+
+
+def plan_segments(ranges: List[Tuple[int, int]], connections: int, min_segment_size: int) -> List[Segment]:
+    """将待下载区间切分为分段
+
+    每个待下载区间至少一段，段数不足连接数时反复对半拆分最大的段，
+    拆分后每段不小于min_segment_size
+    """
+    segments = [Segment(start=start, end=end, pos=start) for start, end in ranges if end > start]
+    while segments and len(segments) < connections:
+        largest = max(segments, key=lambda seg: seg.remaining)
+        if largest.remaining < min_segment_size * 2:
+            break
+        mid = largest.start + largest.remaining // 2
+        segments.append(Segment(start=mid, end=largest.end, pos=mid))
+        largest.end = mid
+    segments.sort(key=lambda seg: seg.start)
+    return segments
+
+
+class SegmentedDownloader:
+    """分段并行下载器
+
+    各连接共享一个预分配的文件，每个区间作为独立写入流按偏移合并写入，
+    连接空闲时从预计最晚完成的区间拆出后半段继续下载；
+    传入进度日志时只下载日志中缺失的区间，并把实际落盘的区间记入日志；
+    传入mirrors时每个区间向选中的镜像请求，出错的镜像由其他镜像接着拉取剩余部分；
+    连接停滞时剩余部分退回待下载队列重新连接，可被空闲连接再次拆分，
+    连续max_reconnects次重连都没有收到数据时按失败处理
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        temp_file: Path,
+        total_size: int,
+        headers: Optional[Dict[str, str]] = None,
+        connections: int = 4,
+        chunk_size: int = 1048576,
+        min_segment_size: int = 4194304,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+        throttle: Optional[Callable[[int], Awaitable[None]]] = None,
+        should_continue: Optional[Callable[[], bool]] = None,
+        journal: Optional[ProgressJournal] = None,
+        writer: Optional[DiskWriter] = None,
+        hasher: Optional[StreamingHasher] = None,
+        sniffer: Optional[ContentSniffer] = None,
+        mirrors: Optional[MirrorPool] = None,
+        timeouts: Optional[PhaseTimeouts] = None,
+        stall_min_speed: int = 0,
+        stall_window: float = 20,
+        max_reconnects: int = 5,
+        on_reconnect: Optional[Callable[[BaseException], None]] = None
+    ):
+        self.session = session
+        self.url = url
+        # 单一URL时出错即失败，由任务级重试处理
+        self.mirrors = mirrors or MirrorPool([url], connections_per_mirror=connections, max_errors=1)
+        self.temp_file = Path(temp_file)
+        self.total_size = total_size
+        self.headers = dict(headers or {})
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self.min_segment_size = max(min_segment_size, chunk_size)
+        self.on_progress = on_progress
+        self.throttle = throttle
+        self.should_continue = should_continue or (lambda: True)
+        self.journal = journal
+        self.writer = writer or DiskWriter()
+        self.hasher = hasher
+        self.sniffer = sniffer
+        self.timeouts = timeouts or PhaseTimeouts()
+        self.stall_min_speed = stall_min_speed
+        self.stall_window = stall_window
+        self.max_reconnects = max_reconnects
+        self.on_reconnect = on_reconnect
+        self.reconnects = 0
+        self._idle_reconnects = 0  # 连续未收到数据的重连次数
+        self._file: Optional[WriterFile] = None
+        missing = journal.completed.missing(total_size) if journal else [(0, total_size)]
+        self._base_completed = total_size - sum(end - start for start, end in missing)
+        self.segments: List[Segment] = plan_segments(missing, self.connections, self.min_segment_size)
+        self._pending: List[Segment] = list(self.segments)
+        self._aborted = False
+
+    @property
+    def downloaded_bytes(self) -> int:
+        return self._base_completed + sum(seg.pos - seg.start for seg in self.segments)
+
+    @property
+    def active_connections(self) -> int:
+        """正在拉取区间的连接数"""
+        return sum(1 for seg in self.segments if seg.lease is not None)
+
+    def _eta(self, segment: Segment) -> float:
+        """区间按当前镜像速度预计还需的时间(未测速时按最快镜像估计)"""
+        rate = segment.lease.mirror.rate if segment.lease else None
+        return segment.remaining / (rate or self.mirrors.best_rate or 1.0)
+
+    def _next_segment(self) -> Optional[Segment]:
+        """取下一个待下载区间，没有时拆分预计最晚完成的区间"""
+        if self._pending:
+            return self._pending.pop(0)
+
+        active = [seg for seg in self.segments if not seg.done]
+        if not active:
+            return None
+        largest = max(active, key=self._eta)
+        if largest.remaining < self.min_segment_size * 2:
+            return None
+
+        mid = largest.pos + largest.remaining // 2
+        new_segment = Segment(start=mid, end=largest.end, pos=mid)
+        largest.end = mid
+        self.segments.append(new_segment)
+        sampled_logger.debug(self.url, "拆分区间 %d-%d 供空闲连接下载", mid, new_segment.end)
+        return new_segment
+
+    def _record_flushed(self, start: int, end: int):
+        if self.journal:
+            self.journal.record(start, end)
+
+    async def _fetch_segment(self, segment: Segment, lease: MirrorLease):
+        """从选中的镜像拉取单个区间；区间被拆分后读到新的end即停止，
+        所在镜像变为慢速且有更快的镜像空闲时提前返回，剩余部分交给其他镜像
+        """
+        headers = dict(self.headers)
+        headers['Range'] = f'bytes={segment.pos}-{segment.end - 1}'
+        response = await open_response(
+            self.session, lease.mirror.url, self.timeouts.first_byte, headers=headers
+        )
+        async with response:
+            if response.status != 206:
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=f"区间请求未返回206: HTTP {response.status}",
+                    headers=response.headers
+                )
+            match = _CONTENT_RANGE_RE.match(response.headers.get('content-range', ''))
+            if match and match.group(3) != '*' and int(match.group(3)) != self.total_size:
+                raise MirrorMismatch(f"镜像文件大小不一致: {match.group(3)} != {self.total_size}")
+            stream = self._file.stream(segment.pos, on_flushed=self._record_flushed, hasher=self.hasher)
+            try:
+                # 按连接实测吞吐调整每次读取的大小，chunk_size为上限
+                sizer = AdaptiveChunkSizer(self.chunk_size)
+                detector = StallDetector(self.timeouts.read_idle, self.stall_min_speed, self.stall_window)
+                while True:
+                    chunk = await detector.read(response.content, sizer.size)
+                    if not chunk:
+                        break
+                    sizer.observe(len(chunk))
+                    if not self.should_continue():
+                        self._aborted = True
+                        return
+                    # 区间可能已被拆分，截断超出部分
+                    chunk = chunk[:segment.end - segment.pos]
+                    if chunk:
+                        if self.sniffer is not None:
+                            self.sniffer.feed(segment.pos, chunk)
+                        await stream.write(chunk)
+                        if self.journal:
+                            await self.journal.maybe_checkpoint()
+                        segment.pos += len(chunk)
+                        self.mirrors.record(lease, len(chunk))
+                        if self.on_progress:
+                            await self.on_progress(self.downloaded_bytes)
+                        if self.throttle:
+                            await self.throttle(len(chunk), lease.mirror.host)
+                    if segment.done or self.mirrors.should_abandon(lease):
+                        return
+            finally:
+                # 已收到的数据都是有效的，中断时同样写出
+                await stream.flush()
+        if not segment.done:
+            raise aiohttp.ClientPayloadError(
+                f"区间 {segment.start}-{segment.end} 提前结束于 {segment.pos}"
+            )
+
+    async def _worker(self):
+        """单个连接的工作循环：每个区间重新选择镜像，镜像出错时区间退回待下载队列"""
+        while not self._aborted:
+            segment = self._next_segment()
+            if segment is None:
+                return
+            lease = self.mirrors.acquire()
+            if lease is None:
+                if not self.mirrors.usable:
+                    raise self.mirrors.last_error or aiohttp.ClientError("没有可用的镜像")
+                # 可用镜像的连接都已满，减少一个连接
+                self._pending.insert(0, segment)
+                return
+            segment.lease = lease
+            started = segment.pos
+            try:
+                await self._fetch_segment(segment, lease)
+            except StallError as e:
+                # 只有一个地址时停滞不计为镜像错误，直接重新连接
+                self.mirrors.release(lease, error=e if len(self.mirrors) > 1 else None)
+                segment.lease = None
+                self._reconnect(segment, e, segment.pos > started)
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.mirrors.release(lease, error=e, fatal=isinstance(e, MirrorMismatch))
+                segment.lease = None
+                if not self.mirrors.usable:
+                    raise
+                logger.warning(f"镜像 {lease.mirror.url} 下载区间失败，改由其他镜像继续: {str(e)}")
+                self._reconnect(segment, e, segment.pos > started)
+                continue
+            self.mirrors.release(lease)
+            segment.lease = None
+            if not segment.done and not self._aborted:
+                # 从慢速镜像上撤下的区间
+                self._pending.insert(0, segment)
+                continue
+            if self.hasher and self.journal and segment.done:
+                # 连续前缀可能已推进，趁数据仍在页缓存中补算哈希
+                await self.writer.call(
+                    self.hasher.catch_up, self.temp_file, self.journal.completed.contiguous_prefix()
+                )
+
+    def _reconnect(self, segment: Segment, error: BaseException, progressed: bool):
+        """区间剩余部分退回队列，由下一个连接从当前偏移继续"""
+        self.reconnects += 1
+        self._idle_reconnects = 0 if progressed else self._idle_reconnects + 1
+        if self.on_reconnect:
+            self.on_reconnect(error)
+        if self._idle_reconnects > self.max_reconnects:
+            raise error
+        sampled_logger.info(self.url, "区间 %d-%d 重新连接: %s", segment.pos, segment.end, error)
+        self._pending.insert(0, segment)
+
+    async def run(self) -> bool:
+        """执行下载，全部区间完成返回True，被暂停/取消返回False"""
+        # 预分配到目标大小，各连接按偏移写入，续传时保留已有数据
+        self._file = await self.writer.open(self.temp_file, size=self.total_size)
+
+        workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(min(self.connections, len(self.segments)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            await self._file.close()
+            if self.journal:
+                await self.journal.checkpoint()
+
+        if self._aborted:
+            return False
+        return all(seg.done for seg in self.segments)
+
+
+__all__ = [
+    'MirrorMismatch',
+    'RangeProbe',
+    'Segment',
+    'SegmentedDownloader',
+    'plan_segments',
+    'probe_range_support'
+]
@@ -0,0 +1,148 @@
+"""
+连接停滞检测模块
+下载请求不再设置总超时，改为分阶段超时：建立连接、收到响应头(首字节)、两次读取之间的空闲；
+首字节计时从取得连接开始，在共享连接池中排队等待的时间不计入；
+另按连接的实测吞吐检测低速停滞，停滞的连接由调用方断开后从当前偏移重新连接
+"""
+
+import time
+import asyncio
+import aiohttp
+from dataclasses import dataclass
+from typing import Optional
+
+
+class StallError(aiohttp.ClientError):
+    """连接超时或速度长期过低"""
+
+
+@dataclass(frozen=True)
+class PhaseTimeouts:
+    """分阶段超时(秒)，0表示不限制"""
+    connect: float = 15
+    first_byte: float = 30
+    read_idle: float = 60
+
+    def client_timeout(self) -> aiohttp.ClientTimeout:
+        """会话级超时：不限制总时长，套接字读取按各阶段较大值的两倍兜底探测等其他请求，
+        下载的首字节和空闲超时由open_response和StallDetector在此之前判定
+        """
+        backstop = max(self.first_byte, self.read_idle) * 2
+        return aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=self.connect or None,
+            sock_read=backstop or None
+        )
+
+
+class _ConnectionClock:
+    """单个请求的首字节计时起点，由追踪钩子在取得连接时标记"""
+
+    __slots__ = ("acquired",)
+
+    def __init__(self):
+        self.acquired = asyncio.Event()
+
+
+async def mark_connection_acquired(session, context, params):
+    """追踪钩子(on_connection_create_end/on_connection_reuseconn)：
+    请求取得连接(新建或复用)，首字节计时从此开始
+    """
+    clock = getattr(context, "trace_request_ctx", None)
+    if isinstance(clock, _ConnectionClock):
+        clock.acquired.set()
+
+
+async def open_response(
+    session: aiohttp.ClientSession,
+    url: str,
+    first_byte_timeout: float,
+    **kwargs
+) -> aiohttp.ClientResponse:
+    """发起GET请求，取得连接后超过first_byte_timeout秒仍未收到响应头时抛出StallError
+
+    等待连接池空位不计入首字节超时；会话需在追踪配置中注册mark_connection_acquired，
+    否则无法得知取得连接的时刻，只受会话级超时限制。
+    返回的响应需由调用方用async with释放
+    """
+    if not first_byte_timeout:
+        return await session.get(url, **kwargs)
+    clock = _ConnectionClock()
+    request = asyncio.ensure_future(session.get(url, trace_request_ctx=clock, **kwargs))
+    acquired = asyncio.ensure_future(clock.acquired.wait())
+    try:
+        await asyncio.wait({request, acquired}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        if request.done() and not request.cancelled() and request.exception() is None:
+            request.result().release()
+        request.cancel()
+        raise
+    finally:
+        acquired.cancel()
+    if request.done():
+        return request.result()
+    try:
+        return await asyncio.wait_for(request, first_byte_timeout)
+    except aiohttp.ClientError:
+        raise
+    except asyncio.TimeoutError:
+        raise StallError(f"{first_byte_timeout:g}秒内未收到响应") from None
+
+
+class StallDetector:
+    """单个连接的读取停滞检测
+
+    每次读取最多等待read_idle秒；只统计等待数据的时间(不含限速、落盘等待)，
+    累计满window秒后平均速度低于min_speed即判定停滞。
+    判定停滞前已读到的数据照常返回，下一次读取时才抛出StallError
+
+    Args:
+        read_idle: 单次读取的空闲超时(秒)，0表示不限制
+        min_speed: 最低速度(字节/秒)，0表示不检测低速
+        window: 速度统计窗口(秒)
+    """
+
+    def __init__(self, read_idle: float = 60, min_speed: int = 0, window: float = 20):
+        self.read_idle = read_idle
+        self.min_speed = min_speed
+        self.window = max(window, 1e-3)
+        self._bytes = 0
+        self._time = 0.0
+        self._stalled: Optional[str] = None
+
+    async def read(self, content: aiohttp.StreamReader, size: int) -> bytes:
+        if self._stalled is not None:
+            raise StallError(self._stalled)
+        # 已缓冲的数据直接取出，不计入等待时间
+        chunk = content.read_nowait(size)
+        if chunk or content.at_eof():
+            return chunk
+
+        started = time.monotonic()
+        try:
+            if self.read_idle:
+                chunk = await asyncio.wait_for(content.read(size), self.read_idle)
+            else:
+                chunk = await content.read(size)
+        except aiohttp.ClientError:
+            raise
+        except asyncio.TimeoutError:
+            raise StallError(f"{self.read_idle:g}秒内未收到数据") from None
+        self._observe(len(chunk), time.monotonic() - started)
+        return chunk
+
+    def _observe(self, nbytes: int, elapsed: float):
+        if not self.min_speed:
+            return
+        self._bytes += nbytes
+        self._time += elapsed
+        if self._time < self.window:
+            return
+        speed = self._bytes / self._time
+        if speed < self.min_speed:
+            self._stalled = f"速度过低: {int(speed)}B/s 持续{self._time:.0f}秒"
+        self._bytes = 0
+        self._time = 0.0
+
+
+__all__ = ['PhaseTimeouts', 'StallDetector', 'StallError', 'mark_connection_acquired', 'open_response']
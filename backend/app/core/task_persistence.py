@@ -0,0 +1,196 @@
+"""
+任务持久化模块
+每个任务在download_tasks表中占一行，内存中记录变更过的任务ID，
+保存时只批量upsert变更行，不再整体重写configs表中的JSON
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.config import Config
+from app.models.download import DownloadTask as DownloadTaskModel
+from app.schemas.download import DownloadTask
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 旧版本整体保存在configs表中的键
+LEGACY_ACTIVE_KEY = "active_download_tasks"
+LEGACY_HISTORY_KEY = "download_history"
+
+UPSERT_BATCH_SIZE = 500
+
+
+def _json_safe(obj):
+    """递归转换datetime对象为字符串"""
+    if isinstance(obj, dict):
+        return {k: _json_safe(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_json_safe(v) for v in obj]
+    elif isinstance(obj, datetime):
+        return obj.isoformat()
+    return obj
+
+
+def _to_timestamp(value) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def task_to_row(task: DownloadTask, archived: bool) -> Dict:
+    """任务模型转换为表行"""
+    payload = _json_safe(task.dict())
+    created_at = _to_timestamp(task.created_at) or _to_timestamp(task.start_time)
+    return {
+        "id": task.id,
+        "url": task.url,
+        "file_path": task.file_path,
+        "filename": task.filename,
+        "size": task.total_size,
+        "downloaded": task.downloaded_size,
+        "progress": task.progress,
+        "speed": task.download_speed,
+        "status": str(getattr(task.status, 'value', task.status)),
+        "type": str(getattr(task.download_type, 'value', task.download_type)),
+        "category": task.category,
+        "priority": str(getattr(task.priority, 'value', task.priority)),
+        "archived": archived,
+        "payload": payload,
+        "created_at": datetime.fromtimestamp(created_at) if created_at else datetime.now(),
+        "updated_at": datetime.now(),
+        "error": task.error
+    }
+
+
+def payload_to_task(payload: Dict) -> DownloadTask:
+    """表行中的任务数据转换为任务模型，兼容缺失字段和字符串时间"""
+    data = dict(payload)
+    for field in ('start_time', 'end_time', 'created_at'):
+        if field in data:
+            data[field] = _to_timestamp(data[field])
+    data = {k: v for k, v in data.items() if k in DownloadTask.__fields__ and v is not None}
+    return DownloadTask(**data)
+
+
+class TaskPersistence:
+    """行级任务持久化，记录脏任务并批量写入"""
+
+    def __init__(self):
+        self._dirty: Set[str] = set()
+
+    def mark_dirty(self, task_id: str):
+        self._dirty.add(task_id)
+
+    def mark_all_dirty(self, task_ids: Iterable[str]):
+        self._dirty.update(task_ids)
+
+    def is_dirty(self, task_id: str) -> bool:
+        return task_id in self._dirty
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def flush(self, db: Session, resolve: Callable[[str], Optional[tuple]]) -> int:
+        """批量upsert变更过的任务
+
+        Args:
+            resolve: 根据任务ID返回 (任务, 是否已归档)，任务已不存在时返回None
+        Returns:
+            写入的行数
+        """
+        if not self._dirty:
+            return 0
+
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for task_id in dirty:
+            resolved = resolve(task_id)
+            if resolved is not None:
+                task, archived = resolved
+                rows.append(task_to_row(task, archived))
+
+        try:
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                self._upsert(db, rows[i:i + UPSERT_BATCH_SIZE])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # 写入失败的任务留待下次保存
+            self._dirty.update(dirty)
+            raise
+        return len(rows)
+
+    def _upsert(self, db: Session, rows: List[Dict]):
+        if not rows:
+            return
+        dialect = db.bind.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(DownloadTaskModel).values(rows)
+            update_columns = {
+                key: stmt.excluded[key]
+                for key in rows[0].keys()
+                if key not in ("id", "created_at")
+            }
+            db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=update_columns))
+        else:
+            for row in rows:
+                db.merge(DownloadTaskModel(**row))
+
+    def load(self, db: Session, archived: bool) -> List[DownloadTask]:
+        """加载活跃任务(archived=False)或历史任务(archived=True)"""
+        tasks = []
+        query = (
+            db.query(DownloadTaskModel.id, DownloadTaskModel.payload)
+            .filter(DownloadTaskModel.archived == archived)
+            .order_by(DownloadTaskModel.created_at)
+        )
+        for task_id, payload in query:
+            try:
+                tasks.append(payload_to_task(payload))
+            except Exception as e:
+                logger.error(f"加载任务{task_id}失败: {str(e)}")
+        return tasks
+
+    def migrate_legacy(self, db: Session) -> int:
+        """将旧版configs表中的JSON任务数据一次性迁移为行存储"""
+        legacy = {
+            row.key: row.value
+            for row in db.query(Config).filter(Config.key.in_([LEGACY_ACTIVE_KEY, LEGACY_HISTORY_KEY]))
+        }
+        if not legacy:
+            return 0
+
+        migrated = 0
+        if not db.query(func.count(DownloadTaskModel.id)).scalar():
+            rows = []
+            for key, archived in ((LEGACY_ACTIVE_KEY, False), (LEGACY_HISTORY_KEY, True)):
+                for task_id, task_data in (legacy.get(key) or {}).items():
+                    try:
+                        rows.append(task_to_row(payload_to_task(task_data), archived))
+                    except Exception as e:
+                        logger.warning(f"迁移任务{task_id}失败: {str(e)}")
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                self._upsert(db, rows[i:i + UPSERT_BATCH_SIZE])
+            migrated = len(rows)
+
+        db.query(Config).filter(Config.key.in_(list(legacy.keys()))).delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"已将{migrated}个旧版任务迁移到download_tasks表")
+        return migrated
+
+
+__all__ = ['TaskPersistence', 'task_to_row', 'payload_to_task']
@@ -0,0 +1,207 @@
+"""
+内存任务存储模块
+在任务字典之上维护按状态、下载类型的二级索引，
+以及按开始/创建时间倒序的有序索引，支持稳定的游标分页，
+列出一页任务的开销与任务总数无关
+"""
+
+import json
+import base64
+import bisect
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.schemas.download import DownloadTask
+
+SortKey = Tuple[float, str]
+
+
+def _value(field) -> Optional[str]:
+    return getattr(field, 'value', field)
+
+
+def sort_key(task: DownloadTask) -> SortKey:
+    """按开始时间(未开始则按创建时间)倒序，任务ID保证顺序稳定"""
+    return (-(task.start_time or task.created_at or 0.0), task.id)
+
+
+def encode_cursor(*values) -> str:
+    """将排序键编码为不透明的分页游标"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """解码分页游标，格式错误时抛出ValueError"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+class _OrderedIndex:
+    """按排序键有序的任务ID集合"""
+
+    def __init__(self):
+        self._keys: List[SortKey] = []
+
+    def add(self, key: SortKey):
+        bisect.insort(self._keys, key)
+
+    def remove(self, key: SortKey):
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def iter_from(self, after: Optional[SortKey] = None, offset: int = 0) -> Iterator[SortKey]:
+        start = bisect.bisect_right(self._keys, after) if after is not None else 0
+        for i in range(start + offset, len(self._keys)):
+            yield self._keys[i]
+
+
+class TaskStore(MutableMapping):
+    """带索引的任务存储，可按字典方式使用
+
+    任务状态或开始时间是直接修改模型属性的，
+    变更后需调用reindex(任务状态变化时统一在通知入口调用)
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, DownloadTask] = {}
+        self._indexed: Dict[str, Tuple[SortKey, Optional[str], Optional[str]]] = {}  # task_id: (排序键, 状态, 类型)
+        self._all = _OrderedIndex()
+        self._by_status: Dict[str, _OrderedIndex] = {}
+        self._by_type: Dict[str, _OrderedIndex] = {}
+
+    # 字典接口
+    def __getitem__(self, task_id: str) -> DownloadTask:
+        return self._tasks[task_id]
+
+    def __setitem__(self, task_id: str, task: DownloadTask):
+        if task_id in self._tasks:
+            self._unindex(task_id)
+        self._tasks[task_id] = task
+        self._index(task_id, task)
+
+    def __delitem__(self, task_id: str):
+        del self._tasks[task_id]
+        self._unindex(task_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tasks)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id) -> bool:
+        return task_id in self._tasks
+
+    def clear(self):
+        self._tasks.clear()
+        self._indexed.clear()
+        self._all = _OrderedIndex()
+        self._by_status.clear()
+        self._by_type.clear()
+
+    # 索引维护
+    def _index(self, task_id: str, task: DownloadTask):
+        key = sort_key(task)
+        task_status = _value(task.status)
+        download_type = _value(task.download_type)
+        self._indexed[task_id] = (key, task_status, download_type)
+        self._all.add(key)
+        self._by_status.setdefault(task_status, _OrderedIndex()).add(key)
+        self._by_type.setdefault(download_type, _OrderedIndex()).add(key)
+
+    def _unindex(self, task_id: str):
+        entry = self._indexed.pop(task_id, None)
+        if entry is None:
+            return
+        key, task_status, download_type = entry
+        self._all.remove(key)
+        for buckets, value in ((self._by_status, task_status), (self._by_type, download_type)):
+            bucket = buckets.get(value)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[value]
+
+    def reindex(self, task_id: str):
+        """任务状态、类型或时间变化后更新索引"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        entry = self._indexed.get(task_id)
+        if entry == (sort_key(task), _value(task.status), _value(task.download_type)):
+            return
+        self._unindex(task_id)
+        self._index(task_id, task)
+
+    # 查询
+    def count(self, status: Optional[str] = None, download_type: Optional[str] = None) -> int:
+        if status is None and download_type is None:
+            return len(self._tasks)
+        if download_type is None:
+            return len(self._by_status.get(_value(status), ()))
+        if status is None:
+            return len(self._by_type.get(_value(download_type), ()))
+        # 两个条件同时存在时遍历较小的索引
+        status, download_type = _value(status), _value(download_type)
+        by_status = self._by_status.get(status)
+        by_type = self._by_type.get(download_type)
+        if not by_status or not by_type:
+            return 0
+        if len(by_status) <= len(by_type):
+            return sum(1 for key in by_status.iter_from() if self._indexed[key[1]][2] == download_type)
+        return sum(1 for key in by_type.iter_from() if self._indexed[key[1]][1] == status)
+
+    def page(
+        self,
+        status: Optional[str] = None,
+        download_type: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[DownloadTask], Optional[str]]:
+        """按开始/创建时间倒序分页
+
+        传入cursor时从游标之后开始(offset在游标之后再跳过)，
+        返回 (本页任务, 下一页游标)
+        """
+        status, download_type = _value(status), _value(download_type)
+        if status is not None:
+            index = self._by_status.get(status)
+        elif download_type is not None:
+            index = self._by_type.get(download_type)
+        else:
+            index = self._all
+        if not index or limit <= 0:
+            return [], None
+
+        after = None
+        if cursor:
+            value, task_id = decode_cursor(cursor)
+            after = (float(value), str(task_id))
+        need_filter = status is not None and download_type is not None
+        # 组合条件时offset需要按过滤后的结果计算
+        skip = offset if need_filter else 0
+        items: List[DownloadTask] = []
+        last_key = None
+        for key in index.iter_from(after, 0 if need_filter else offset):
+            if need_filter and self._indexed[key[1]][2] != download_type:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if len(items) == limit:
+                return items, encode_cursor(*last_key)
+            items.append(self._tasks[key[1]])
+            last_key = key
+        return items, None
+
+
+__all__ = ['TaskStore', 'encode_cursor', 'decode_cursor', 'sort_key']
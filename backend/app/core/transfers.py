@@ -0,0 +1,72 @@
+"""
+运行中传输登记模块
+每个正在执行的下载在独立的协程中运行并登记取消句柄，
+暂停或取消时直接取消该协程，正在等待的读取立即中断、响应随之关闭，
+不必等到下一块数据到达；已收到的数据照常落盘
+"""
+
+import asyncio
+from typing import Callable, Dict, Optional, Any
+
+
+class TransferHandle:
+    """一次运行中传输的取消句柄"""
+
+    __slots__ = ("task_id", "runner", "connections", "aborted")
+
+    def __init__(self, task_id: str, runner: asyncio.Future):
+        self.task_id = task_id
+        self.runner = runner
+        self.connections: Callable[[], int] = lambda: 1  # 当前占用的连接数，分段下载时由下载器提供
+        self.aborted = False
+
+    def abort(self) -> bool:
+        """取消传输协程，已结束时返回False"""
+        if self.runner.done():
+            return False
+        self.aborted = True
+        return self.runner.cancel()
+
+
+class TransferRegistry:
+    """任务ID -> 运行中传输"""
+
+    def __init__(self):
+        self._handles: Dict[str, TransferHandle] = {}
+        self.aborted = 0
+
+    def register(self, task_id: str, runner: asyncio.Future) -> TransferHandle:
+        handle = TransferHandle(task_id, runner)
+        self._handles[task_id] = handle
+        return handle
+
+    def get(self, task_id: str) -> Optional[TransferHandle]:
+        return self._handles.get(task_id)
+
+    def discard(self, handle: TransferHandle):
+        if self._handles.get(handle.task_id) is handle:
+            del self._handles[handle.task_id]
+
+    def abort(self, task_id: str) -> int:
+        """立即中止任务的传输，返回释放的连接数(没有运行中的传输时为0)"""
+        handle = self._handles.get(task_id)
+        if handle is None or handle.runner.done():
+            return 0
+        connections = handle.connections()
+        if not handle.abort():
+            return 0
+        self.aborted += 1
+        return connections
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._handles
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._handles),
+            "connections": sum(handle.connections() for handle in self._handles.values()),
+            "aborted": self.aborted
+        }
+
+
+__all__ = ['TransferHandle', 'TransferRegistry']
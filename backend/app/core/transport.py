@@ -0,0 +1,109 @@
+"""
+共享HTTP传输层模块
+由DownloadManager持有一个长期存活的TCPConnector，
+所有下载任务复用其连接池、DNS缓存和keep-alive连接，
+并统计新建/复用连接数等连接池指标
+"""
+
+import aiohttp
+from typing import Dict, Optional
+
+from app.core.stall import mark_connection_acquired
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DownloadTransport:
+    """共享连接池传输层
+
+    每个任务通过session()获得一个轻量ClientSession，
+    会话本身不持有连接器(connector_owner=False)，关闭会话不会断开池中连接
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 8,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._counters: Dict[str, int] = {
+            "created": 0,
+            "reused": 0,
+            "queued": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0
+        }
+        self._trace_config = self._build_trace_config()
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """通过aiohttp追踪钩子统计连接复用情况，并标记首字节计时的起点"""
+        trace_config = aiohttp.TraceConfig()
+
+        def counter(name: str):
+            async def _inc(session, context, params):
+                self._counters[name] += 1
+            return _inc
+
+        trace_config.on_connection_create_end.append(counter("created"))
+        trace_config.on_connection_reuseconn.append(counter("reused"))
+        trace_config.on_connection_queued_start.append(counter("queued"))
+        trace_config.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        trace_config.on_connection_create_end.append(mark_connection_acquired)
+        trace_config.on_connection_reuseconn.append(mark_connection_acquired)
+        return trace_config
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        """懒加载连接器，保证在事件循环内创建"""
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+        return self._connector
+
+    def session(self, **kwargs) -> aiohttp.ClientSession:
+        """创建复用共享连接池的会话"""
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            trace_configs=[self._trace_config],
+            **kwargs
+        )
+
+    async def close(self):
+        """关闭连接池"""
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+
+    def stats(self) -> Dict[str, int]:
+        """连接池统计信息"""
+        idle = 0
+        in_use = 0
+        connector = self._connector
+        if connector is not None and not connector.closed:
+            idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+            in_use = len(getattr(connector, '_acquired', ()))
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "open": idle + in_use,
+            "idle": idle,
+            "in_use": in_use,
+            **self._counters
+        }
+
+
+__all__ = ['DownloadTransport']
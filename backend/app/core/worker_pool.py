@@ -0,0 +1,124 @@
+"""
+下载工作池模块
+按max_concurrent_downloads启动固定数量的工作协程消费下载队列，
+支持运行时扩缩容，工作协程异常退出时自动重启
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DownloadWorkerPool:
+    """受监管的下载工作池
+
+    每个工作协程循环从队列取任务并交给handler执行，
+    缩容时空闲协程立即退出，忙碌协程完成当前任务后退出
+    """
+
+    def __init__(self, queue_getter: Callable[[], Awaitable[Any]], handler: Callable[[Any], Awaitable[None]]):
+        self._queue_getter = queue_getter
+        self._handler = handler
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._busy: Dict[int, Any] = {}  # worker_id: 正在处理的任务
+        self._retiring: set = set()
+        self._next_worker_id = 0
+        self._target_size = 0
+        self._running = False
+
+    @property
+    def size(self) -> int:
+        return self._target_size
+
+    def start(self, size: int):
+        """启动工作池"""
+        self._running = True
+        self.resize(size)
+        logger.info(f"下载工作池已启动，工作协程数: {self._target_size}")
+
+    def resize(self, size: int):
+        """调整工作协程数量，立即生效"""
+        size = max(1, int(size or 1))
+        old_size = self._target_size
+        self._target_size = size
+        if not self._running:
+            return
+
+        active = [wid for wid in self._workers if wid not in self._retiring]
+        if len(active) < size:
+            for _ in range(size - len(active)):
+                self._spawn()
+        elif len(active) > size:
+            # 优先让空闲协程退出
+            extra = len(active) - size
+            candidates = sorted(active, key=lambda wid: wid in self._busy)
+            for wid in candidates[:extra]:
+                self._retiring.add(wid)
+                if wid not in self._busy:
+                    self._workers[wid].cancel()
+
+        if old_size != size:
+            logger.info(f"下载工作池大小调整: {old_size} -> {size}")
+
+    async def stop(self):
+        """停止所有工作协程"""
+        self._running = False
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._busy.clear()
+        self._retiring.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """工作池统计信息"""
+        total = len(self._workers)
+        busy = len(self._busy)
+        return {
+            "size": self._target_size,
+            "workers": total,
+            "busy": busy,
+            "idle": total - busy,
+            "retiring": len(self._retiring)
+        }
+
+    def _spawn(self):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        worker = asyncio.create_task(self._worker_loop(worker_id))
+        worker.add_done_callback(lambda t, wid=worker_id: self._on_worker_done(wid, t))
+        self._workers[worker_id] = worker
+
+    def _on_worker_done(self, worker_id: int, worker: asyncio.Task):
+        """监管：非预期退出的协程自动补齐"""
+        self._workers.pop(worker_id, None)
+        self._busy.pop(worker_id, None)
+        retired = worker_id in self._retiring
+        self._retiring.discard(worker_id)
+
+        if not worker.cancelled() and worker.exception() is not None:
+            logger.error(f"下载工作协程{worker_id}异常退出: {worker.exception()}")
+        if self._running and not retired:
+            active = len(self._workers) - len(self._retiring)
+            if active < self._target_size:
+                self._spawn()
+
+    async def _worker_loop(self, worker_id: int):
+        while self._running and worker_id not in self._retiring:
+            item = await self._queue_getter()
+            self._busy[worker_id] = item
+            try:
+                await self._handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"处理下载任务{item}失败: {str(e)}")
+            finally:
+                self._busy.pop(worker_id, None)
+
+
+__all__ = ['DownloadWorkerPool']
@@ -1,11 +1,14 @@
 from app.db.base import Base
 from app.db.session import engine, SessionLocal
+from app.db.migrations import run_migrations
 from app.models import *  # 确保所有模型都被注册
 from app.core.config import settings
 
 def init_db():
     """初始化数据库"""
     Base.metadata.create_all(bind=engine)
+    # 补齐已有表的结构变化
+    run_migrations(engine)
     
     # 初始化动态配置示例
     db = SessionLocal()
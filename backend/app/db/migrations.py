@@ -0,0 +1,137 @@
+"""
+数据库结构迁移模块
+项目没有alembic迁移脚本，create_all只会创建缺失的表而不会修改已有表；
+已有表的结构变化在这里以幂等步骤补齐，由init_db在create_all之后执行
+"""
+
+from typing import Dict, Optional
+
+from sqlalchemy import MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.task_persistence import payload_to_task, task_to_row
+from app.models.download import DownloadTask as DownloadTaskModel
+from app.schemas.download import DownloadStatus, DownloadType
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 新版本加入已有表的列: 表名 -> [(列名, 列类型及默认值)]
+ADDED_COLUMNS = {
+    "download_configs": [
+        ("download_rate_limit", "INTEGER DEFAULT 0"),
+        ("host_download_rate_limit", "INTEGER DEFAULT 0"),
+        ("task_download_rate_limit", "INTEGER DEFAULT 0"),
+    ]
+}
+
+# 旧版download_tasks表改名后暂存的表名，迁移中断时下次启动继续复制
+LEGACY_TASKS_TABLE = "download_tasks_legacy"
+
+# 旧版表中结束状态的任务迁移为历史记录
+ARCHIVED_STATUSES = {
+    DownloadStatus.COMPLETED.value,
+    DownloadStatus.CANCELLED.value,
+    DownloadStatus.DELETED.value
+}
+
+
+def _legacy_priority(value) -> str:
+    """旧版整数优先级(默认5)转换为优先级等级"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return "normal"
+    if value < 5:
+        return "low"
+    if value > 5:
+        return "high"
+    return "normal"
+
+
+def _legacy_task_row(row) -> Optional[Dict]:
+    """旧版表中的一行转换为新表行，无法转换时返回None"""
+    status = row["status"] if row["status"] in {s.value for s in DownloadStatus} else DownloadStatus.QUEUED.value
+    download_type = row["type"] if row["type"] in {t.value for t in DownloadType} else DownloadType.HTTP.value
+    created_at = row["created_at"].timestamp() if row["created_at"] else None
+    payload = {
+        "id": row["id"],
+        "url": row["url"],
+        "download_type": download_type,
+        "filename": row["filename"],
+        "file_path": row["file_path"],
+        "priority": _legacy_priority(row["priority"]),
+        "status": status,
+        "progress": row["progress"] or 0.0,
+        "total_size": row["size"] or 0,
+        "downloaded_size": row["downloaded"] or 0,
+        "download_speed": row["speed"] or 0.0,
+        "category": row["category"],
+        "error": row["error"],
+        "created_at": created_at,
+        "start_time": created_at
+    }
+    try:
+        new_row = task_to_row(payload_to_task(payload), status in ARCHIVED_STATUSES)
+    except Exception as e:
+        logger.warning(f"迁移任务{row['id']}失败: {str(e)}")
+        return None
+    new_row["config_id"] = row["config_id"]
+    if row["updated_at"]:
+        new_row["updated_at"] = row["updated_at"]
+    return new_row
+
+
+def _rebuild_download_tasks(conn: Connection):
+    """旧版download_tasks表没有payload和archived列，且列类型和索引不同；
+    改名保留后按新结构建表，逐行补全任务数据复制过去，复制完成后删除旧表
+    """
+    inspector = inspect(conn)
+    if inspector.has_table("download_tasks"):
+        columns = {column["name"] for column in inspector.get_columns("download_tasks")}
+        if not {"payload", "archived"} <= columns:
+            if inspector.has_table(LEGACY_TASKS_TABLE):
+                raise RuntimeError(f"{LEGACY_TASKS_TABLE}表已存在，无法迁移download_tasks表")
+            conn.execute(text(f"ALTER TABLE download_tasks RENAME TO {LEGACY_TASKS_TABLE}"))
+    elif not inspector.has_table(LEGACY_TASKS_TABLE):
+        return
+    if not inspect(conn).has_table(LEGACY_TASKS_TABLE):
+        return
+
+    DownloadTaskModel.__table__.create(conn, checkfirst=True)
+    legacy = Table(LEGACY_TASKS_TABLE, MetaData(), autoload_with=conn)
+    existing = set(conn.execute(select(DownloadTaskModel.id)).scalars())
+    rows = []
+    for row in conn.execute(select(legacy)).mappings():
+        if row["id"] in existing:
+            continue
+        new_row = _legacy_task_row(row)
+        if new_row is not None:
+            rows.append(new_row)
+    if rows:
+        conn.execute(DownloadTaskModel.__table__.insert(), rows)
+    conn.execute(text(f"DROP TABLE {LEGACY_TASKS_TABLE}"))
+    logger.info(f"已将{len(rows)}个任务迁移到新的download_tasks表")
+
+
+def _add_missing_columns(conn: Connection):
+    """为已有表补充新增的列，已有行取列的默认值"""
+    inspector = inspect(conn)
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, definition in columns:
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+                logger.info(f"已为{table}表添加列{name}")
+
+
+def run_migrations(engine: Engine):
+    """执行全部迁移步骤，每一步都可以重复执行"""
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
+        _rebuild_download_tasks(conn)
+
+
+__all__ = ['run_migrations']
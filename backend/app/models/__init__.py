@@ -1,5 +1,5 @@
 # 确保所有模型被正确导入和注册
 from .config import Config, DownloadConfig
-from .download import DownloadTask
+from .download import DownloadTask, CachedDownload
 
-__all__ = ['Config', 'DownloadConfig', 'DownloadTask']
+__all__ = ['Config', 'DownloadConfig', 'DownloadTask', 'CachedDownload']
@@ -31,6 +31,9 @@ class DownloadConfig(Base):
     timeout = Column(Integer, default=60)
     category_subdirs = Column(Boolean, default=True)
     file_recognition_method = Column(String(50), default="extension")
+    download_rate_limit = Column(Integer, default=0)
+    host_download_rate_limit = Column(Integer, default=0)
+    task_download_rate_limit = Column(Integer, default=0)
     bt_listen_port = Column(Integer, default=6881)
     bt_max_connections = Column(Integer, default=100)
     bt_max_uploads = Column(Integer, default=10)
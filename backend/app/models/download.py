@@ -1,27 +1,55 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, DateTime, ForeignKey, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 class DownloadTask(Base):
-    """下载任务表"""
+    """下载任务表(每个任务一行)"""
     __tablename__ = "download_tasks"
+    __table_args__ = (
+        # 历史记录按状态/分类/时间分页查询
+        Index("ix_download_tasks_archived_created", "archived", "created_at"),
+        Index("ix_download_tasks_archived_status_created", "archived", "status", "created_at"),
+        Index("ix_download_tasks_archived_category_created", "archived", "category", "created_at"),
+    )
 
     id = Column(String(36), primary_key=True)
-    url = Column(String(512), nullable=False)
+    url = Column(Text, nullable=False)
     file_path = Column(String(512))
     filename = Column(String(255))
-    size = Column(Integer, default=0)
-    downloaded = Column(Integer, default=0)
+    size = Column(BigInteger, default=0)
+    downloaded = Column(BigInteger, default=0)
     progress = Column(Float, default=0.0)
     speed = Column(Float, default=0.0)
-    status = Column(String(20), default="queued")  # queued, downloading, paused, completed, failed
+    status = Column(String(20), default="queued", index=True)  # queued, downloading, paused, completed, failed, cancelled
     type = Column(String(20), default="http")  # http, ftp, bt
     category = Column(String(50))
-    priority = Column(Integer, default=5)
-    created_at = Column(DateTime, default=datetime.now)
+    priority = Column(String(10), default="normal")  # low, normal, high
+    archived = Column(Boolean, default=False, index=True)  # 是否已移入历史记录
+    payload = Column(JSON, nullable=False)  # 完整任务数据
+    created_at = Column(DateTime, default=datetime.now, index=True)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
-    error = Column(String(512))
+    error = Column(Text)
     config_id = Column(Integer, ForeignKey("download_configs.id"))
-    
+
     config = relationship("DownloadConfig", back_populates="tasks")
+
+
+class CachedDownload(Base):
+    """已完成下载的缓存索引，按URL和内容摘要查找可复用的文件"""
+    __tablename__ = "download_cache"
+    __table_args__ = (
+        Index("ix_download_cache_digest", "checksum_algorithm", "digest"),
+    )
+
+    url_key = Column(String(2048), primary_key=True)  # 规范化后的URL
+    url = Column(Text, nullable=False)
+    file_path = Column(String(512), nullable=False)
+    size = Column(BigInteger, default=0)
+    mtime = Column(Float, default=0.0)  # 记录时的文件修改时间，变化说明文件已被改动
+    etag = Column(String(255))
+    last_modified = Column(String(64))
+    checksum_algorithm = Column(String(16))
+    digest = Column(String(128))
+    created_at = Column(DateTime, default=datetime.now)
+    last_used_at = Column(DateTime, default=datetime.now)
@@ -20,6 +20,11 @@ class ConfigUpdate(BaseModel):
     category_subdirs: Optional[bool] = None
     file_recognition_method: Optional[Literal["extension", "content", "extension_and_content"]] = None
     
+    # 限速配置(KB/s，0表示无限制)
+    download_rate_limit: Optional[int] = None
+    host_download_rate_limit: Optional[int] = None
+    task_download_rate_limit: Optional[int] = None
+    
     # BT配置
     bt_max_connections: Optional[int] = None
     bt_max_uploads: Optional[int] = None
@@ -51,6 +56,9 @@ class ConfigData(BaseModel):
     timeout: int
     category_subdirs: bool
     file_recognition_method: str
+    download_rate_limit: int = 0
+    host_download_rate_limit: int = 0
+    task_download_rate_limit: int = 0
     bt_max_connections: int
     bt_max_uploads: int
     bt_download_rate_limit: int
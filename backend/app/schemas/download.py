@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 from enum import Enum
 from datetime import datetime
@@ -33,6 +33,12 @@ class DownloadStatus(str, Enum):
     CANCELLED = "cancelled"
     DELETED = "deleted"
 
+class ChecksumAlgorithm(str, Enum):
+    """校验和算法枚举"""
+    MD5 = "md5"
+    SHA1 = "sha1"
+    SHA256 = "sha256"
+
 class PriorityLevel(str, Enum):
     """任务优先级枚举"""
     LOW = "low"
@@ -55,6 +61,7 @@ class DownloadTask(BaseModel):
     total_size: int = 0
     downloaded_size: int = 0
     start_from: int = 0
+    created_at: Optional[float] = None
     start_time: Optional[float] = None
     start_time_str: Optional[str] = None
     end_time: Optional[float] = None
@@ -75,6 +82,19 @@ class DownloadTask(BaseModel):
     files: List[Dict[str, Any]] = []
     downloaded_files: List[Dict[str, Any]] = []
     temp_file: Optional[str] = None
+    checksum_algorithm: Optional[ChecksumAlgorithm] = None
+    expected_checksum: Optional[str] = None
+    actual_checksum: Optional[str] = None
+    checksum_verified: Optional[bool] = None  # None表示未提供期望校验和或尚未校验
+    etag: Optional[str] = None  # 下载时服务器返回的ETag，用于再次下载时确认内容是否变化
+    last_modified: Optional[str] = None
+    cache_hit: Optional[str] = None  # 复用已有文件完成时的依据: revalidated、digest或coalesced
+    leader_id: Optional[str] = None  # 与之合并传输的主任务ID，仅跟随任务有值
+    mirrors: List[str] = []  # 除url外的镜像地址
+    mirror_stats: List[Dict[str, Any]] = []  # 各镜像的状态、下载量和速度
+    stall_count: int = 0  # 检测到的连接停滞(超时或速度过低)次数
+    reconnect_count: int = 0  # 下载过程中断开后重新连接的次数
+    next_retry_at: Optional[float] = None  # 等待重试的任务下次入队的时间
 
     @staticmethod
     def get_file_type(filename: str) -> FileType:
@@ -139,6 +159,17 @@ class DownloadTaskDetail(BaseModel):
     download_type_display: Optional[str] = ""
     status_display: Optional[str] = ""
     file_type: str = "other"
+    checksum_algorithm: Optional[str] = None
+    expected_checksum: Optional[str] = None
+    actual_checksum: Optional[str] = None
+    checksum_verified: Optional[bool] = None
+    cache_hit: Optional[str] = None
+    leader_id: Optional[str] = None
+    mirrors: List[str] = []
+    mirror_stats: List[Dict[str, Any]] = []
+    stall_count: int = 0
+    reconnect_count: int = 0
+    next_retry_at: Optional[float] = None
 
     @classmethod
     def from_task(cls, task: DownloadTask):
@@ -190,17 +221,29 @@ class DownloadTaskDetail(BaseModel):
             downloaded_files=task.downloaded_files,
             download_type_display=type_display_map.get(task.download_type, task.download_type),
             status_display=status_display_map.get(task.status, task.status),
-            file_type=task.file_type if hasattr(task, 'file_type') else 'other'
+            file_type=task.file_type if hasattr(task, 'file_type') else 'other',
+            checksum_algorithm=task.checksum_algorithm,
+            expected_checksum=task.expected_checksum,
+            actual_checksum=task.actual_checksum,
+            checksum_verified=task.checksum_verified,
+            cache_hit=task.cache_hit,
+            leader_id=task.leader_id,
+            mirrors=task.mirrors,
+            mirror_stats=task.mirror_stats,
+            stall_count=task.stall_count,
+            reconnect_count=task.reconnect_count,
+            next_retry_at=task.next_retry_at
         )
 
 class DownloadTaskListResponse(BaseModel):
     """下载任务列表响应模型"""
     items: List[DownloadTaskDetail]
     total: int
+    next_cursor: Optional[str] = None
 
 class DownloadRequest(BaseModel):
     """创建下载任务请求模型"""
-    url: str
+    url: Optional[str] = None  # 提供metalink时可省略，使用其中优先级最高的地址
     download_type: Optional[DownloadType] = None
     filename: Optional[str] = None
     priority: PriorityLevel = PriorityLevel.NORMAL
@@ -209,3 +252,17 @@ class DownloadRequest(BaseModel):
     start_from: Optional[int] = 0
     category: Optional[str] = None
     selected_files: Optional[List[int]] = None  # 保留字段但不使用
+    checksum_algorithm: Optional[ChecksumAlgorithm] = None  # 与checksum一起提供时下载完成后校验
+    checksum: Optional[str] = None  # 期望的十六进制摘要
+    mirrors: List[str] = []  # 同一文件的其他镜像地址，分段从多个镜像并行下载
+    metalink: Optional[str] = None  # Metalink(.meta4/.metalink)文档内容
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if not self.url and not self.metalink:
+            raise ValueError("需要提供url或metalink")
+        return self
+
+class PriorityUpdate(BaseModel):
+    """调整任务优先级请求模型"""
+    priority: PriorityLevel
@@ -1,34 +1,194 @@
+"""
+日志模块
+所有记录器共用一个队列：调用方只把记录放入队列，
+由后台线程写控制台和按大小轮转的日志文件，磁盘写入和轮转都不在事件循环中进行；
+队列满时丢弃新记录而不阻塞调用方。热点路径的日志通过SampledLogger限频
+"""
+
+import json
+import time
+import queue
+import atexit
 import logging
-import os
-from pathlib import Path
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
 from app.core.config import settings
 
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# LogRecord自带的属性，其余属性视为通过extra传入的结构化字段
+_RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行JSON，extra传入的字段一并输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃记录并计数，不阻塞调用方；
+    写入线程停止后改为由调用方直接交给控制台和文件处理器
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.direct: Optional[List[logging.Handler]] = None
+
+    def emit(self, record: logging.LogRecord):
+        direct = self.direct
+        if direct is None:
+            super().emit(record)
+            return
+        for handler in direct:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _formatter() -> logging.Formatter:
+    if settings.log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt=DATE_FORMAT
+    )
+
+
+def _queue_handler() -> _NonBlockingQueueHandler:
+    """首次使用时创建共享队列并启动后台写入线程"""
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            log_queue = queue.Queue(max(1, settings.log_queue_size))
+            formatter = _formatter()
+
+            # 控制台处理器
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+
+            # 文件处理器，超过大小后在写入线程中轮转
+            file_handler = RotatingFileHandler(
+                str(settings.log_dir / "app.log"),
+                maxBytes=settings.log_max_bytes,
+                backupCount=settings.log_backup_count,
+                encoding='utf-8'
+            )
+            file_handler.setFormatter(formatter)
+
+            _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+            _listener.start()
+            _handler = _NonBlockingQueueHandler(log_queue)
+            atexit.register(shutdown_logging)
+        return _handler
+
 
 def setup_logger(name: str) -> logging.Logger:
     """设置日志记录器"""
     # 创建日志记录器
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    
+
     # 避免重复添加处理器
     if logger.handlers:
         return logger
-    
-    # 日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # 控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # 文件处理器
-    log_file = settings.log_dir / "app.log"
-    file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
+    logger.addHandler(_queue_handler())
     return logger
+
+
+def shutdown_logging():
+    """写完队列中剩余的记录并停止写入线程
+
+    之后的记录由各记录器直接写控制台和文件，不再丢失；
+    处理器在解释器退出时由logging统一关闭
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            # 先切换为直接写入，停止期间产生的记录也不会留在队列中
+            _handler.direct = list(_listener.handlers)
+            _listener.stop()
+            _listener = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """日志队列积压和丢弃的记录数"""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+class SampledLogger:
+    """热点路径日志限频
+
+    同一key每interval秒最多输出一条，期间跳过的条数附在下一条输出之后；
+    参数按logging的%格式传入，被跳过的记录不做格式化
+
+    Args:
+        logger: 实际输出的记录器
+        interval: 同一key的最短输出间隔(秒)，默认取log_sample_interval
+        max_keys: 记录的key数量上限，超出时清空重新计数
+    """
+
+    def __init__(self, logger: logging.Logger, interval: Optional[float] = None, max_keys: int = 1024):
+        self.logger = logger
+        self.interval = settings.log_sample_interval if interval is None else interval
+        self.max_keys = max_keys
+        self._state: Dict[Any, list] = {}  # key: [上次输出时间, 跳过条数]
+
+    def log(self, level: int, key: Any, msg: str, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        state = self._state.get(key)
+        if state is not None and now - state[0] < self.interval:
+            state[1] += 1
+            return
+        skipped = state[1] if state is not None else 0
+        if state is None and len(self._state) >= self.max_keys:
+            self._state.clear()
+        self._state[key] = [now, 0]
+        if skipped:
+            msg = f"{msg} (此前{self.interval:g}秒内省略{skipped}条)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key: Any, msg: str, *args):
+        self.log(logging.DEBUG, key, msg, *args)
+
+    def info(self, key: Any, msg: str, *args):
+        self.log(logging.INFO, key, msg, *args)
+
+    def warning(self, key: Any, msg: str, *args):
+        self.log(logging.WARNING, key, msg, *args)
+
+    def error(self, key: Any, msg: str, *args):
+        self.log(logging.ERROR, key, msg, *args)
+
+
+__all__ = ['JsonFormatter', 'SampledLogger', 'logging_stats', 'setup_logger', 'shutdown_logging']
@@ -1,16 +1,123 @@
 from fastapi import WebSocket, WebSocketDisconnect, status, HTTPException
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Hashable, Set
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
 from app.core.config import settings
 from app.api.auth import get_current_user
 from datetime import datetime
+import itertools
+import asyncio
 import logging
+import json
 
 logger = logging.getLogger(__name__)
 
+
+class ClientConnection:
+    """单个WebSocket连接的发送队列
+
+    消息由独立的发送协程逐条发出，广播方只负责入队不等待发送；
+    同一任务尚未发出的进度消息被新消息覆盖(合并)，
+    队列满时丢弃最旧的消息，慢客户端不会拖慢其他连接
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max(1, max_queue)
+        self._queue: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def start(self, on_error):
+        self._sender = asyncio.create_task(self._send_loop(on_error))
+
+    def stop(self):
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        self._queue.clear()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, text: str, coalesce_key: Optional[Hashable] = None):
+        """消息入队，不阻塞"""
+        if coalesce_key is not None and coalesce_key in self._queue:
+            # 覆盖尚未发出的旧状态，保留其排队位置
+            self._queue[coalesce_key] = text
+            self.coalesced += 1
+            return
+        if len(self._queue) >= self.max_queue:
+            self._queue.popitem(last=False)
+            self.dropped += 1
+        key = coalesce_key if coalesce_key is not None else ("seq", next(self._seq))
+        self._queue[key] = text
+        self._ready.set()
+
+    async def _send_loop(self, on_error):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    _, text = self._queue.popitem(last=False)
+                    await self.websocket.send_text(text)
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not isinstance(e, WebSocketDisconnect):
+                logger.error(f"Broadcast error: {e}")
+            on_error(self.websocket)
+
+
+# 任务进入这些状态后不再产生更新，从状态索引中移除
+TERMINAL_STATUSES = {"completed", "cancelled", "deleted"}
+
+
+@dataclass
+class Subscription:
+    """连接的订阅条件
+
+    默认订阅全部任务；指定task_ids/statuses后只接收匹配任务的消息，
+    aggregate为True时只接收汇总消息
+    """
+    task_ids: Set[str] = field(default_factory=set)
+    statuses: Set[str] = field(default_factory=set)
+    aggregate: bool = False
+
+    @property
+    def receives_all(self) -> bool:
+        return not (self.task_ids or self.statuses or self.aggregate)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_ids": sorted(self.task_ids),
+            "statuses": sorted(self.statuses),
+            "aggregate": self.aggregate
+        }
+
+
 class WebSocketManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}  # token: websocket
         self.connection_times: Dict[str, datetime] = {}  # token: connect_time
+        self.clients: Dict[str, ClientConnection] = {}  # token: 发送队列
+        self.subscriptions: Dict[str, Subscription] = {}  # token: 订阅条件
+        # 订阅索引，路由时只查找匹配的连接
+        self._all_subscribers: Set[str] = set()
+        self._aggregate_subscribers: Set[str] = set()
+        self._task_subscribers: Dict[str, Set[str]] = defaultdict(set)
+        self._status_subscribers: Dict[str, Set[str]] = defaultdict(set)
+        self._task_status: Dict[str, str] = {}  # task_id: 最近一次推送的状态
+        self._dropped_total = 0
+        self._coalesced_total = 0
+        self._sent_total = 0
 
     async def connect(self, websocket: WebSocket, token: Optional[str] = None):
         if not token:
@@ -20,7 +127,10 @@ class WebSocketManager:
         try:
             username = await get_current_user(token)
             await websocket.accept()
-            
+
+            # 同一token重连时先关闭旧连接，旧连接不占用连接数
+            await self._replace(token)
+
             # Check max connections
             if len(self.active_connections) >= settings.websocket_max_connections:
                 await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
@@ -28,8 +138,12 @@ class WebSocketManager:
 
             self.active_connections[token] = websocket
             self.connection_times[token] = datetime.now()
+            client = ClientConnection(websocket, settings.websocket_send_queue_size)
+            client.start(self.disconnect)
+            self.clients[token] = client
+            self._set_subscription(token, Subscription())
             logger.info(f"WebSocket connected: {username}")
-            
+
         except HTTPException as e:
             if e.status_code == status.HTTP_401_UNAUTHORIZED:
                 error_detail = e.detail
@@ -39,7 +153,7 @@ class WebSocketManager:
                 else:
                     reason = str(error_detail)
                     code = 40102
-                
+
                 await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
                 raise WebSocketDisconnect(reason=f"{reason} (code: {code})")
             else:
@@ -49,29 +163,231 @@ class WebSocketManager:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             raise WebSocketDisconnect(reason="Internal server error")
 
+    async def _replace(self, token: str):
+        """移除同一token的旧连接并关闭其WebSocket，旧页面的接收循环随之结束"""
+        old_websocket = self.active_connections.pop(token, None)
+        self.connection_times.pop(token, None)
+        old_client = self.clients.pop(token, None)
+        if old_client is not None:
+            self._retire_client(old_client)
+        self._remove_subscription(token)
+        if old_websocket is None:
+            return
+        try:
+            await old_websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Replaced by a new connection")
+        except Exception:
+            # 旧连接可能已经断开
+            pass
+        logger.info(f"WebSocket replaced: {token[:8]}...")
+
+    def _retire_client(self, client: ClientConnection):
+        """停止发送协程并累计其统计"""
+        client.stop()
+        self._dropped_total += client.dropped
+        self._coalesced_total += client.coalesced
+        self._sent_total += client.sent
+
     def disconnect(self, websocket: WebSocket):
         for token, ws in list(self.active_connections.items()):
             if ws == websocket:
                 self.active_connections.pop(token, None)
                 self.connection_times.pop(token, None)
+                client = self.clients.pop(token, None)
+                if client is not None:
+                    self._retire_client(client)
+                self._remove_subscription(token)
                 logger.info(f"WebSocket disconnected: {token[:8]}...")
                 break
 
+    def _remove_subscription(self, token: str):
+        subscription = self.subscriptions.pop(token, None)
+        if subscription is None:
+            return
+        self._all_subscribers.discard(token)
+        self._aggregate_subscribers.discard(token)
+        for task_id in subscription.task_ids:
+            subscribers = self._task_subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(token)
+                if not subscribers:
+                    del self._task_subscribers[task_id]
+        for task_status in subscription.statuses:
+            subscribers = self._status_subscribers.get(task_status)
+            if subscribers is not None:
+                subscribers.discard(token)
+                if not subscribers:
+                    del self._status_subscribers[task_status]
+
+    def _set_subscription(self, token: str, subscription: Subscription):
+        """替换连接的订阅条件并更新索引"""
+        self._remove_subscription(token)
+        self.subscriptions[token] = subscription
+        if subscription.receives_all:
+            self._all_subscribers.add(token)
+        if subscription.aggregate:
+            self._aggregate_subscribers.add(token)
+        for task_id in subscription.task_ids:
+            self._task_subscribers[task_id].add(token)
+        for task_status in subscription.statuses:
+            self._status_subscribers[task_status].add(token)
+
+    def _send_to(self, token: str, message: dict):
+        client = self.clients.get(token)
+        if client is not None:
+            client.enqueue(json.dumps(message, ensure_ascii=False, default=str))
+
+    async def handle_client_message(self, token: str, data: str, websocket: Optional[WebSocket] = None):
+        """处理客户端发来的消息
+
+        支持的消息：
+        - {"type": "ping"}
+        - {"type": "subscribe", "task_ids": [...], "statuses": [...], "aggregate": false}
+        - {"type": "unsubscribe"}  恢复为接收全部任务
+        传入websocket时只处理该token当前连接的消息，已被替换的旧连接的消息忽略
+        """
+        if websocket is not None and self.active_connections.get(token) is not websocket:
+            return
+        try:
+            message = json.loads(data)
+            if not isinstance(message, dict):
+                raise ValueError("message must be an object")
+        except ValueError:
+            self._send_to(token, {"type": "error", "message": "Invalid message format"})
+            return
+
+        message_type = message.get("type")
+        if message_type == "ping":
+            self._send_to(token, {"type": "pong", "timestamp": datetime.now().isoformat()})
+        elif message_type == "subscribe":
+            subscription = Subscription(
+                task_ids={str(task_id) for task_id in message.get("task_ids") or []},
+                statuses={str(task_status) for task_status in message.get("statuses") or []},
+                aggregate=bool(message.get("aggregate", False))
+            )
+            self._set_subscription(token, subscription)
+            self._send_to(token, {"type": "subscribed", "subscription": subscription.to_dict()})
+        elif message_type == "unsubscribe":
+            self._set_subscription(token, Subscription())
+            self._send_to(token, {"type": "subscribed", "subscription": Subscription().to_dict()})
+        else:
+            self._send_to(token, {"type": "error", "message": f"Unsupported message type: {message_type}"})
+
+    def _task_recipients(self, task_id: str, statuses: Iterable[Optional[str]]) -> Set[str]:
+        """订阅了全部任务、该任务或其状态的连接"""
+        recipients = set(self._all_subscribers)
+        recipients.update(self._task_subscribers.get(task_id, ()))
+        for task_status in statuses:
+            if task_status is not None:
+                recipients.update(self._status_subscribers.get(task_status, ()))
+        return recipients
+
+    @staticmethod
+    def _coalesce_key(message: dict) -> Optional[Hashable]:
+        """同一任务的进度消息可合并，只保留最新一条"""
+        payload = message.get("payload")
+        if message.get("type") == "downloads" and isinstance(payload, dict) and payload.get("task_id"):
+            return ("downloads", payload["task_id"])
+        return None
+
     async def broadcast(self, message: dict):
-        for token, connection in list(self.active_connections.items()):
-            try:
-                if message.get("type") == "ping":
-                    # Handle ping message from client
-                    await connection.send_json({"type": "pong", "timestamp": datetime.now().isoformat()})
-                else:
-                    await connection.send_json(message)
-            except WebSocketDisconnect:
-                self.disconnect(connection)
-            except Exception as e:
-                logger.error(f"Broadcast error: {e}")
-                self.disconnect(connection)
+        """广播消息：只编码一次并放入各连接的发送队列，不等待发送完成"""
+        if not self.clients:
+            return
+        text = json.dumps(message, ensure_ascii=False, default=str)
+        coalesce_key = self._coalesce_key(message)
+        for client in list(self.clients.values()):
+            client.enqueue(text, coalesce_key)
+
+    async def publish_task_update(self, message: dict, task_id: str, task_status: str):
+        """推送单个任务的状态变化，只发给匹配的订阅者
+
+        状态订阅者同时收到任务离开和进入该状态的消息
+        """
+        if not self.clients:
+            self._track_status(task_id, task_status)
+            return
+        previous_status = self._task_status.get(task_id)
+        recipients = self._task_recipients(task_id, (previous_status, task_status))
+        self._track_status(task_id, task_status)
+        if not recipients:
+            return
+        text = json.dumps(message, ensure_ascii=False, default=str)
+        coalesce_key = self._coalesce_key(message)
+        for token in recipients:
+            client = self.clients.get(token)
+            if client is not None:
+                client.enqueue(text, coalesce_key)
+
+    def _track_status(self, task_id: str, task_status: str):
+        if task_status in TERMINAL_STATUSES:
+            self._task_status.pop(task_id, None)
+        else:
+            self._task_status[task_id] = task_status
+
+    async def publish_progress_batch(self, deltas: List[Dict[str, Any]], timestamp: float):
+        """按订阅条件拆分批量进度消息
+
+        订阅全部任务的连接共享同一份编码结果，
+        其余连接只会收到其订阅任务的增量
+        """
+        if not self.clients or not deltas:
+            return
+
+        if self._all_subscribers:
+            text = json.dumps(
+                {"type": "downloads_batch", "payload": {"tasks": deltas, "timestamp": timestamp}},
+                ensure_ascii=False, default=str
+            )
+            for token in self._all_subscribers:
+                client = self.clients.get(token)
+                if client is not None:
+                    client.enqueue(text)
+
+        if not (self._task_subscribers or self._status_subscribers):
+            return
+        routed: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for delta in deltas:
+            task_id = delta.get("task_id")
+            recipients = set(self._task_subscribers.get(task_id, ()))
+            recipients.update(self._status_subscribers.get(self._task_status.get(task_id), ()))
+            for token in recipients - self._all_subscribers:
+                routed[token].append(delta)
+        for token, tasks in routed.items():
+            self._send_to(token, {"type": "downloads_batch", "payload": {"tasks": tasks, "timestamp": timestamp}})
+
+    @property
+    def has_aggregate_subscribers(self) -> bool:
+        return bool(self._aggregate_subscribers)
+
+    async def publish_summary(self, summary: Dict[str, Any]):
+        """向只订阅汇总的连接推送汇总消息"""
+        if not self._aggregate_subscribers:
+            return
+        text = json.dumps({"type": "downloads_summary", "payload": summary}, ensure_ascii=False, default=str)
+        for token in self._aggregate_subscribers:
+            client = self.clients.get(token)
+            if client is not None:
+                client.enqueue(text, "downloads_summary")
 
     def get_connection_count(self) -> int:
         return len(self.active_connections)
 
+    def stats(self) -> Dict[str, int]:
+        """发送队列统计信息"""
+        clients = list(self.clients.values())
+        return {
+            "connections": len(clients),
+            "queued": sum(client.queued for client in clients),
+            "max_queue": settings.websocket_send_queue_size,
+            "sent": self._sent_total + sum(client.sent for client in clients),
+            "dropped": self._dropped_total + sum(client.dropped for client in clients),
+            "coalesced": self._coalesced_total + sum(client.coalesced for client in clients),
+            "subscriptions": {
+                "all": len(self._all_subscribers),
+                "aggregate": len(self._aggregate_subscribers),
+                "tasks": len(self._task_subscribers),
+                "statuses": len(self._status_subscribers)
+            }
+        }
+
 websocket_manager = WebSocketManager()
@@ -21,11 +21,13 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
         await websocket_manager.connect(websocket, token)
         try:
             while True:
+                # 客户端消息只用于心跳和订阅，不再转发给其他连接
                 data = await websocket.receive_text()
-                if websocket.client_state == WebSocketState.CONNECTED:
-                    await websocket_manager.broadcast({"message": data})
+                await websocket_manager.handle_client_message(token, data, websocket)
         except WebSocketDisconnect as e:
             logger.info(f"WebSocket disconnected: {e.reason}")
+        finally:
+            websocket_manager.disconnect(websocket)
     except WebSocketDisconnect as e:
         logger.warning(f"WebSocket connection failed: {e.reason}")
     except Exception as e:
@@ -92,6 +92,10 @@ class WebSocketClient {
       const data = JSON.parse(event.data)
       if (data.type === 'downloads') {
         this.callbacks.downloads.forEach(cb => cb(data.payload))
+      } else if (data.type === 'downloads_batch') {
+        data.payload.tasks.forEach(task => {
+          this.callbacks.downloads.forEach(cb => cb(task))
+        })
       }
     }
 